@@ -1,11 +1,13 @@
 from django.contrib import admin
+from pizza_api.admin import LargeTableAdmin
 from .models import CustomerProfile, Address
 
 
 @admin.register(CustomerProfile)
-class CustomerProfileAdmin(admin.ModelAdmin):
+class CustomerProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'phone_number', 'date_of_birth']
-    search_fields = ['user__username', 'phone_number']
+    list_select_related = ['user']
+    search_fields = ['^user__username', '^phone_number']
     list_filter = ['date_of_birth']
     readonly_fields = ['user']
     fieldsets = (
@@ -22,9 +24,12 @@ class CustomerProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(Address)
-class AddressAdmin(admin.ModelAdmin):
+class AddressAdmin(LargeTableAdmin):
     list_display = ['customer', 'street', 'city', 'zip_code', 'is_default', 'address_type']
-    search_fields = ['customer__username', 'street', 'city', 'zip_code']
+    list_select_related = ['customer']
+    # Street and city keep matching anywhere in the value; no index serves those, so they scan the table
+    search_fields = ['^customer__username', '^zip_code', 'street', 'city']
+    raw_id_fields = ['customer']
     list_filter = ['is_default', 'address_type']
     fieldsets = (
         (None, {
@@ -32,5 +37,8 @@ class AddressAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        obj.save_default_aware()
+
     def has_delete_permission(self, request, obj=None):
         return False
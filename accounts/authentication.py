@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    Process-local LRU cache of active users by token user id, whose entries expire after AUTH_USER_CACHE_TTL
+    seconds.
+
+    Entries hold field values rather than instances, so every hit returns a fresh User that a request may modify
+    or cache related objects on without affecting other requests. Saving or deleting a user drops its entry in
+    this process (see accounts.signals); other processes see the change once their entry expires.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_pk = {}
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        return self._maxsize if self._maxsize is not None else settings.AUTH_USER_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.AUTH_USER_CACHE_TTL
+
+    def get(self, key):
+        """
+        Return a fresh instance of the cached user, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, pk, values = entry
+            if expires <= time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+        model = get_user_model()
+        return model.from_db(DEFAULT_DB_ALIAS, [field.attname for field in model._meta.concrete_fields], values)
+
+    def set(self, key, user):
+        values = [getattr(user, field.attname) for field in user._meta.concrete_fields]
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, user.pk, values)
+            self._keys_by_pk[user.pk] = key
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, pk):
+        """
+        Drop the entry of the user with the given primary key.
+        """
+        with self._lock:
+            key = self._keys_by_pk.get(pk)
+            if key is not None:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_pk.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self._keys_by_pk.get(entry[1]) == key:
+            del self._keys_by_pk[entry[1]]
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the token's user through `user_cache`, so a warm request runs no query.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            # Loads the user and checks it is active; only users passing the checks are cached
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
+
+
+class PrefixAuthentication(BaseAuthentication):
+    """
+    Authenticates with the classes API_AUTHENTICATION_CLASSES lists for the longest prefix of the request path.
+
+    Requests under no listed prefix are not authenticated.
+    """
+
+    def get_authenticators(self, request):
+        path = request.path_info
+        prefixes = [prefix for prefix in settings.API_AUTHENTICATION_CLASSES if path.startswith(prefix)]
+        if not prefixes:
+            return []
+        classes = settings.API_AUTHENTICATION_CLASSES[max(prefixes, key=len)]
+        return [import_string(class_path)() for class_path in classes]
+
+    def authenticate(self, request):
+        for authenticator in self.get_authenticators(request):
+            result = authenticator.authenticate(request)
+            if result is not None:
+                return result
+        return None
+
+    def authenticate_header(self, request):
+        # Like REST framework, the first class decides whether unauthenticated requests get 401 or 403
+        authenticators = self.get_authenticators(request)
+        return authenticators[0].authenticate_header(request) if authenticators else None
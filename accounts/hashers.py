@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with PASSWORD_PBKDF2_ITERATIONS iterations.
+
+    Hashes keep Django's format, so existing ones verify; a hash made with other parameters is upgraded when its
+    user next logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with the cost parameters PASSWORD_SCRYPT_WORK_FACTOR, _BLOCK_SIZE and _PARALLELISM.
+
+    Each hash needs 128 * work factor * block size bytes of memory, which bounds how many run in parallel.
+    """
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    @property
+    def maxmem(self):
+        # OpenSSL refuses more than 32 MiB by default; allow ample room for what the parameters need
+        return 256 * self.work_factor * self.block_size * self.parallelism
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with the cost parameters PASSWORD_ARGON2_TIME_COST, _MEMORY_COST (KiB) and _PARALLELISM.
+
+    Requires the argon2-cffi package.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
@@ -0,0 +1,87 @@
+import base64
+import statistics
+import time
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.authentication import CachedJWTAuthentication, user_cache
+
+# The authentication classes the API used before it only accepted JWTs
+LEGACY_AUTHENTICATION = (SessionAuthentication, BasicAuthentication, JWTAuthentication)
+
+PATH = '/api/v1/accounts/addresses/'
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the cost of authenticating one API request with the former session/basic/JWT stack and "
+            "with the JWT-only stack and its user cache. Nothing is left in the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Requests authenticated per case.")
+        parser.add_argument('--basic-requests', type=int, default=5,
+                            help="Requests authenticated with Basic auth, which hashes the password every time.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+        user_cache.clear()
+
+    def run(self, options):
+        user = User.objects.create_user(username=f"benchmark-{time.time_ns()}", password=PASSWORD)
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+
+        basic = base64.b64encode(f"{user.username}:{PASSWORD}".encode()).decode()
+        jwt = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+        requests = options['requests']
+        # (name, authentication classes, request headers, session key, requests, whether the user cache is cleared)
+        cases = [
+            ("former stack, session cookie", LEGACY_AUTHENTICATION, {}, session.session_key, requests, False),
+            ("former stack, basic auth", LEGACY_AUTHENTICATION, {'HTTP_AUTHORIZATION': f'Basic {basic}'}, None,
+             options['basic_requests'], False),
+            ("former stack, JWT", LEGACY_AUTHENTICATION, jwt, None, requests, False),
+            ("JWT, user cache cold", (CachedJWTAuthentication,), jwt, None, requests, True),
+            ("JWT, user cache warm", (CachedJWTAuthentication,), jwt, None, requests, False),
+        ]
+
+        factory = RequestFactory()
+        self.stdout.write(f"{'case':<30} {'requests':>8} {'median (us)':>12} {'mean (us)':>10} {'queries':>8}")
+        for name, classes, headers, session_key, requests, cold in cases:
+            timings = []
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(requests):
+                    if cold:
+                        user_cache.clear()
+                    request = factory.get(PATH, **headers)
+                    if session_key:
+                        request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+                    SessionMiddleware(lambda request: None).process_request(request)
+                    AuthenticationMiddleware(lambda request: None).process_request(request)
+
+                    started = time.perf_counter()
+                    authenticated = Request(request, authenticators=[cls() for cls in classes]).user
+                    timings.append(time.perf_counter() - started)
+                    if authenticated.pk != user.pk:
+                        raise CommandError(f"{name}: the request was not authenticated")
+            self.stdout.write(
+                f"{name:<30} {requests:>8} {statistics.median(timings) * 1e6:>12.1f} "
+                f"{statistics.mean(timings) * 1e6:>10.1f} {len(queries) / requests:>8.2f}"
+            )
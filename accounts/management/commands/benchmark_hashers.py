@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+PASSWORD = 'correct horse battery staple'
+# 1 GiB per hash with the default block size
+MAX_SCRYPT_WORK_FACTOR = 2 ** 20
+
+
+class Command(BaseCommand):
+    help = ("Time every configured password hasher with the current cost parameters, and suggest the parameters "
+            "that hash in --target-ms on this machine.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Timed hashes per hasher.")
+        parser.add_argument('--target-ms', type=float, default=100.0,
+                            help="Time a login may spend hashing the password, in milliseconds.")
+
+    def handle(self, *args, **options):
+        target = options['target_ms'] / 1000
+        self.stdout.write(f"{'hasher':<10} {'parameters':<44} {'median (ms)':>11} {'hashes/s/core':>14}")
+        for name, path in settings.TUNABLE_PASSWORD_HASHERS.items():
+            hasher = import_string(path)()
+            try:
+                median = self.time_hasher(hasher, options['repeat'])
+            except ValueError as error:
+                # Raised by Django when an optional hashing library is not installed
+                self.stdout.write(f"{name:<10} unavailable: {error}")
+                continue
+            self.stdout.write(f"{name:<10} {self.describe(name):<44} {median * 1000:>11.1f} {1 / median:>14.1f}")
+            suggestion = self.suggest(name, median, target, options['repeat'])
+            if suggestion:
+                self.stdout.write(f"{'':<10} for {options['target_ms']:.0f} ms: {suggestion}")
+
+    def time_hasher(self, hasher, repeat):
+        timings = []
+        for _ in range(repeat):
+            salt = hasher.salt()
+            started = time.perf_counter()
+            hasher.encode(PASSWORD, salt)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def describe(self, name):
+        if name == 'pbkdf2':
+            return f"iterations={settings.PASSWORD_PBKDF2_ITERATIONS}"
+        if name == 'scrypt':
+            return (f"work_factor={settings.PASSWORD_SCRYPT_WORK_FACTOR} "
+                    f"block_size={settings.PASSWORD_SCRYPT_BLOCK_SIZE} "
+                    f"parallelism={settings.PASSWORD_SCRYPT_PARALLELISM}")
+        return (f"time_cost={settings.PASSWORD_ARGON2_TIME_COST} memory_cost={settings.PASSWORD_ARGON2_MEMORY_COST}"
+                f" parallelism={settings.PASSWORD_ARGON2_PARALLELISM}")
+
+    def suggest(self, name, median, target, repeat):
+        """
+        Return the setting that makes the hasher take about `target` seconds, measured where it is not linear.
+        """
+        if name == 'pbkdf2':
+            # Time grows linearly with the iterations
+            iterations = int(settings.PASSWORD_PBKDF2_ITERATIONS * target / median) // 1000 * 1000
+            return f"PASSWORD_PBKDF2_ITERATIONS={max(iterations, 1000)}"
+        if name == 'scrypt':
+            # The work factor must be a power of two; take the largest that stays within the target
+            work_factor = 2 ** 10
+            while work_factor < MAX_SCRYPT_WORK_FACTOR:
+                if self.time_hasher(self.scrypt_hasher(work_factor * 2), repeat) > target:
+                    break
+                work_factor *= 2
+            memory = 128 * work_factor * settings.PASSWORD_SCRYPT_BLOCK_SIZE // 2 ** 20
+            return f"PASSWORD_SCRYPT_WORK_FACTOR={work_factor} ({memory} MiB per hash)"
+        return None
+
+    def scrypt_hasher(self, work_factor):
+        """
+        Return a scrypt hasher with the given work factor and the configured block size and parallelism.
+        """
+        hasher = ScryptPasswordHasher()
+        hasher.work_factor = work_factor
+        hasher.block_size = settings.PASSWORD_SCRYPT_BLOCK_SIZE
+        hasher.parallelism = settings.PASSWORD_SCRYPT_PARALLELISM
+        # OpenSSL refuses more than 32 MiB by default, as in TunableScryptPasswordHasher
+        hasher.maxmem = 256 * work_factor * hasher.block_size * hasher.parallelism
+        return hasher
@@ -0,0 +1,80 @@
+import statistics
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import RevokedToken
+from accounts.revocation import BloomFilter, RevocationList
+from accounts.tokens import RevocableAccessToken
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the per-request cost of checking access tokens against the revocation list, kept as a set "
+            "and as Bloom filters, with --revoked revoked tokens. Nothing is left in the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revoked', type=int, default=100000, help="Revoked tokens in the table.")
+        parser.add_argument('--requests', type=int, default=20000, help="Tokens verified per case.")
+        parser.add_argument('--error-rates', type=float, nargs='+', default=[0.0, 0.01, 0.001, 0.0001],
+                            help="False positive rates to compare; 0 keeps a set.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        user = User.objects.create_user(username=f"benchmark-{time.time_ns()}")
+        expires_at = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.bulk_create(
+            (RevokedToken(jti=uuid.uuid4().hex, expires_at=expires_at) for _ in range(options['revoked'])),
+            batch_size=5000,
+        )
+        # Valid tokens, each with its own jti, as the requests of different clients carry
+        tokens = [str(AccessToken.for_user(user)) for _ in range(min(options['requests'], 1000))]
+        requests = options['requests']
+
+        self.stdout.write(f"{'case':<22} {'memory (KiB)':>12} {'median (us)':>12} {'overhead (us)':>14} "
+                          f"{'false positives':>16} {'queries':>8}")
+        # Warm up, so the first case measured does not pay for it
+        self.time_tokens(AccessToken, tokens, len(tokens))
+        baseline = self.time_tokens(AccessToken, tokens, requests)
+        self.stdout.write(f"{'no revocation check':<22} {'':>12} {baseline * 1e6:>12.2f}")
+        for error_rate in options['error_rates']:
+            revocation_list = RevocationList(capacity=options['revoked'], error_rate=error_rate, sync_interval=3600)
+            revocation_list.sync()
+            # A Bloom filter does not count the keys it reported present already
+            if len(revocation_list) != options['revoked'] and not error_rate:
+                raise CommandError("The revocation list did not load every revoked token")
+            token_class = type('BenchmarkAccessToken', (RevocableAccessToken,), {'revocation_list': revocation_list})
+            with CaptureQueriesContext(connection) as queries:
+                median = self.time_tokens(token_class, tokens, requests)
+            false_positives = sum(uuid.uuid4().hex in revocation_list.revoked for _ in range(requests))
+            name = f"bloom filter, p={error_rate:g}" if error_rate else "set"
+            self.stdout.write(
+                f"{name:<22} {self.memory(revocation_list.revoked) / 1024:>12.0f} {median * 1e6:>12.2f} "
+                f"{(median - baseline) * 1e6:>14.2f} {false_positives / requests:>16.5f} "
+                f"{len(queries) / requests:>8.4f}"
+            )
+
+    def time_tokens(self, token_class, tokens, requests):
+        timings = []
+        for index in range(requests):
+            raw = tokens[index % len(tokens)]
+            started = time.perf_counter()
+            token_class(raw)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def memory(self, revoked):
+        if isinstance(revoked, BloomFilter):
+            return revoked.nbytes
+        return sys.getsizeof(revoked) + sum(sys.getsizeof(jti) for jti in revoked)
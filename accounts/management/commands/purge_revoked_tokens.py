@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import purge_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete revoked tokens that have expired."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {purge_revoked_tokens()} expired revoked tokens")
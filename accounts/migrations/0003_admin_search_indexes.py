@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.db import migrations
+
+from pizza_api.db import search_index_operation
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0002_address"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Admin searches of addresses, profiles and orders by "^customer__username" / "^user__username"
+        search_index_operation("auth_user", "username", "accounts_user_username_search_idx"),
+        search_index_operation("accounts_address", "zip_code", "accounts_address_zip_code_search_idx"),
+        search_index_operation(
+            "accounts_customerprofile", "phone_number", "accounts_profile_phone_number_search_idx"
+        ),
+    ]
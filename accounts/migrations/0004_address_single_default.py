@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 06:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def keep_latest_default(apps, schema_editor):
+    """
+    Keep only the most recently created default address of customers that have several, so the constraint applies.
+    """
+    Address = apps.get_model("accounts", "Address")
+    defaults = Address.objects.using(schema_editor.connection.alias).filter(is_default=True)
+    duplicates = (
+        defaults.values("customer").annotate(count=Count("id"), latest=Max("id")).filter(count__gt=1)
+    )
+    for row in duplicates.iterator():
+        defaults.filter(customer=row["customer"]).exclude(id=row["latest"]).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_admin_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="address",
+            index=models.Index(
+                fields=["customer", "-is_default", "id"],
+                name="address_customer_default_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="address",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_default", True)),
+                fields=("customer",),
+                name="address_one_default_per_customer",
+            ),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.db.models.signals import post_save
@@ -16,11 +16,14 @@ class CustomerProfile(models.Model):
 
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
-    if created:
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    """
+    Create an empty profile for a new user, unless the user was given a profile to save, as UserSerializer does.
+
+    Profiles are saved on their own; saving a user does not touch its profile.
+    """
+    if created and not raw and not User.profile.is_cached(instance):
         CustomerProfile.objects.create(user=instance)
-    else:
-        instance.profile.save()
 
 
 class Address(models.Model):
@@ -39,5 +42,51 @@ class Address(models.Model):
     def __str__(self):
         return f"{self.street}, {self.city}, {self.zip_code}"
 
+    def save_default_aware(self, **kwargs):
+        """
+        Save the address, first clearing the flag of the customer's previous default if this one is the default.
+
+        Both statements run in one transaction; the clearing UPDATE matches at most one row.
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            if self.is_default:
+                siblings = Address.objects.filter(customer_id=self.customer_id, is_default=True)
+                if self.pk is not None:
+                    siblings = siblings.exclude(pk=self.pk)
+                siblings.update(is_default=False)
+            self.save(**kwargs)
+
+    def validate_constraints(self, exclude=None):
+        # A form may make another address the default: save_default_aware() clears the old one instead
+        exclude = set(exclude or ())
+        exclude.add('is_default')
+        super().validate_constraints(exclude=exclude)
+
     class Meta:
         verbose_name_plural = "Addresses"
+        constraints = [
+            # A customer has at most one default address
+            models.UniqueConstraint(fields=['customer'], condition=models.Q(is_default=True),
+                                    name='address_one_default_per_customer'),
+        ]
+        indexes = [
+            # Customers list their addresses default first
+            models.Index(fields=['customer', '-is_default', 'id'], name='address_customer_default_idx'),
+        ]
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, identified by its jti claim.
+
+    accounts.revocation loads the rows in id order into a per-process set; rows whose token expired may be deleted
+    with `python manage.py purge_revoked_tokens`.
+    """
+    id = models.BigAutoField(primary_key=True)
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
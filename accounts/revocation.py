@@ -0,0 +1,200 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+# Arbitrary key of the PostgreSQL advisory lock serializing writers of the revoked token table
+REVOCATION_LOCK_KEY = 0x6A746973
+
+SYNC_BATCH_SIZE = 2000
+
+
+class BloomFilter:
+    """
+    Set of strings answering membership in constant time and constant memory, with false positives.
+
+    Holding `capacity` keys, about `error_rate` of the keys that were never added are reported present; keys that
+    were added always are. Its length counts the keys that were not reported present yet when added.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+
+    def _positions(self, key):
+        # Double hashing: the k positions are derived from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hash_count)]
+
+    def add(self, key):
+        # Counted only when it sets a new bit: adding a key again, as a sync does after revoke_token, leaves the
+        # filter as full as it was
+        bits = self._bits
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self._count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+
+def lock_revocations(using=DEFAULT_DB_ALIAS):
+    """
+    Serialize writers of the revoked token table until the current transaction ends.
+
+    Ids must become visible in increasing order, or a process syncing between two commits would skip the lower id
+    for good. SQLite allows one writer at a time anyway; PostgreSQL takes a transaction-level advisory lock.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [REVOCATION_LOCK_KEY])
+
+
+class RevocationList:
+    """
+    Process-local set of the jti claims of revoked tokens, loaded from RevokedToken.
+
+    Every REVOKED_TOKEN_SYNC_INTERVAL seconds a check first loads the rows added since the last load, so a
+    revocation in another process takes effect here within the interval. With a REVOKED_TOKEN_ERROR_RATE the
+    jtis are kept in a BloomFilter sized for REVOKED_TOKEN_CAPACITY tokens, and a hit is confirmed with one query;
+    with an error rate of 0 they are kept in a set, which holds every jti string. Once the structure holds its
+    capacity, it is rebuilt from the tokens that have not expired. Passing `capacity`, `error_rate` or
+    `sync_interval` overrides the setting.
+    """
+
+    def __init__(self, capacity=None, error_rate=None, sync_interval=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._revoked = None
+        self._capacity = 0
+        self._version = 0
+        self._synced_at = None
+
+    @property
+    def revoked(self):
+        """
+        The set or BloomFilter checked, None before the first sync.
+        """
+        return self._revoked
+
+    def is_revoked(self, jti):
+        self.sync_if_due()
+        revoked = self._revoked
+        if revoked is None or jti not in revoked:
+            return False
+        if isinstance(revoked, BloomFilter):
+            # May be a false positive
+            return RevokedToken.objects.filter(jti=jti).exists()
+        return True
+
+    def sync_if_due(self):
+        synced_at = self._synced_at
+        interval = settings.REVOKED_TOKEN_SYNC_INTERVAL if self.sync_interval is None else self.sync_interval
+        if synced_at is None or time.monotonic() - synced_at >= interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Load the tokens revoked since the last sync.
+        """
+        with self._lock:
+            if self._revoked is None or len(self._revoked) >= self._capacity:
+                self._rebuild()
+            revoked = (
+                RevokedToken.objects.filter(id__gt=self._version).order_by('id').values_list('id', 'jti')
+            )
+            for token_id, jti in revoked.iterator(chunk_size=SYNC_BATCH_SIZE):
+                self._revoked.add(jti)
+                self._version = token_id
+            self._synced_at = time.monotonic()
+
+    def _rebuild(self):
+        # Starts over with the tokens that have not expired; later syncs continue after the latest id seen here
+        version = RevokedToken.objects.aggregate(version=Max('id'))['version'] or 0
+        revoked = RevokedToken.objects.filter(id__lte=version, expires_at__gt=timezone.now())
+        # Leave room to grow, or a table fuller than the configured capacity would be reloaded at every sync
+        capacity = settings.REVOKED_TOKEN_CAPACITY if self.capacity is None else self.capacity
+        capacity = max(capacity, 2 * revoked.count())
+        error_rate = settings.REVOKED_TOKEN_ERROR_RATE if self.error_rate is None else self.error_rate
+        # Filled before it replaces the current one, which concurrent checks keep reading meanwhile
+        rebuilt = BloomFilter(capacity, error_rate) if error_rate else set()
+        for jti in revoked.values_list('jti', flat=True).iterator(chunk_size=SYNC_BATCH_SIZE):
+            rebuilt.add(jti)
+        self._revoked, self._capacity, self._version = rebuilt, capacity, version
+
+    def add(self, jti):
+        """
+        Mark a jti revoked in this process without waiting for the next sync.
+        """
+        with self._lock:
+            if self._revoked is not None:
+                self._revoked.add(jti)
+
+    def clear(self):
+        with self._lock:
+            self._revoked = None
+            self._capacity = 0
+            self._version = 0
+            self._synced_at = None
+
+    def __len__(self):
+        return len(self._revoked) if self._revoked is not None else 0
+
+
+revocation_list = RevocationList()
+
+
+def revoke_token(token):
+    """
+    Revoke a simplejwt token until it expires.
+
+    The token is rejected in this process once the transaction commits, and in other processes after their next
+    sync.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    with transaction.atomic():
+        lock_revocations()
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, user_id=token.get(api_settings.USER_ID_CLAIM),
+                          expires_at=datetime_from_epoch(token['exp']))],
+            ignore_conflicts=True,
+        )
+    transaction.on_commit(lambda: revocation_list.add(jti))
+
+
+def purge_revoked_tokens():
+    """
+    Delete the revoked tokens that have expired, which no check can match anymore. Returns the number deleted.
+    """
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
@@ -1,6 +1,12 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth.models import User
 from .models import CustomerProfile, Address
+from .revocation import revoke_token
+from .tokens import RevocableAccessToken, RevocableRefreshToken
 
 
 class CustomerProfileSerializer(serializers.ModelSerializer):
@@ -16,7 +22,8 @@ class AddressSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = self.context.get("request").user
-        address = Address.objects.create(customer=user, **validated_data)
+        address = Address(customer=user, **validated_data)
+        self.save_address(address)
         return address
 
     def update(self, instance, validated_data):
@@ -25,11 +32,18 @@ class AddressSerializer(serializers.ModelSerializer):
         instance.zip_code = validated_data.get('zip_code', instance.zip_code)
         instance.is_default = validated_data.get('is_default', instance.is_default)
         instance.address_type = validated_data.get('address_type', instance.address_type)
-        instance.save()
-        if instance.is_default:
-            Address.objects.filter(customer=instance.customer).exclude(pk=instance.pk).update(is_default=False)
+        self.save_address(instance)
         return instance
 
+    def save_address(self, address):
+        try:
+            address.save_default_aware()
+        except IntegrityError:
+            # Another request made a different address the default between the two statements
+            raise serializers.ValidationError(
+                {'is_default': ["The default address was changed concurrently; please retry."]}
+            )
+
 
 class UserSerializer(serializers.ModelSerializer):
     profile = CustomerProfileSerializer()
@@ -61,26 +75,68 @@ class UserSerializer(serializers.ModelSerializer):
         profile_data = validated_data.pop('profile', {})
         password = validated_data.pop('password')
         user = User(**validated_data)
+        # Hash before the transaction starts, so it is not held open for the slowest step
         user.set_password(password)
-        user.save()
-
-        CustomerProfile.objects.filter(user=user).update(**profile_data)
+        # Assigned as user.profile, so the post_save receiver does not create an empty one
+        profile = CustomerProfile(user=user, **profile_data)
+        with transaction.atomic():
+            user.save()
+            profile.save()
         return user
 
     def update(self, instance, validated_data):
         profile_data = validated_data.pop('profile', {})
-        profile = instance.profile
+        password = validated_data.pop('password', None)
 
-        instance.email = validated_data.get('email', instance.email)
-        instance.username = validated_data.get('username', instance.username)
+        with transaction.atomic():
+            changed = assign_changed_fields(instance, validated_data, ['email', 'username'])
+            if password:
+                instance.set_password(password)
+                changed.append('password')
+            if changed:
+                instance.save(update_fields=changed)
 
-        password = validated_data.get('password', None)
-        if password:
-            instance.set_password(password)
-        instance.save()
-
-        profile.phone_number = profile_data.get('phone_number', profile.phone_number)
-        profile.date_of_birth = profile_data.get('date_of_birth', profile.date_of_birth)
-        profile.save()
+            profile = instance.profile
+            changed = assign_changed_fields(profile, profile_data, ['phone_number', 'date_of_birth'])
+            if changed:
+                profile.save(update_fields=changed)
 
         return instance
+
+
+def assign_changed_fields(instance, data, fields):
+    """
+    Set the `fields` of `instance` present in `data` and return the names of those whose value changed.
+    """
+    changed = []
+    for field in fields:
+        if field in data and getattr(instance, field) != data[field]:
+            setattr(instance, field, data[field])
+            changed.append(field)
+    return changed
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+
+    def validate_refresh(self, value):
+        try:
+            refresh = RevocableRefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
+        if not User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).exists():
+            raise serializers.ValidationError("The token's user does not exist.")
+        return refresh
+
+    def save(self):
+        """
+        Revoke the refresh token, and the access token the request was authenticated with, if any.
+        """
+        revoke_token(self.validated_data['refresh'])
+        request = self.context.get('request')
+        if request is not None and isinstance(request.auth, RevocableAccessToken):
+            revoke_token(request.auth)
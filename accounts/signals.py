@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .authentication import user_cache
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop a saved or deleted user from the authentication cache.
+
+    It is dropped right away, and again on commit so that a request that cached the old row before the commit
+    does not keep it.
+    """
+    pk = instance.pk
+    user_cache.invalidate(pk)
+    transaction.on_commit(lambda: user_cache.invalidate(pk))
+
+
+post_save.connect(invalidate_cached_user, sender=User, dispatch_uid='invalidate_cached_user_save')
+post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid='invalidate_cached_user_delete')
@@ -1,9 +1,22 @@
-from django.test import TestCase
+import base64
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import User
-from .models import CustomerProfile
+from .authentication import UserCache, user_cache
+from .models import Address, CustomerProfile, RevokedToken
+from .revocation import BloomFilter, RevocationList, purge_revoked_tokens, revocation_list
+from .tokens import RevocableRefreshToken
 
 
 class AccountsAPITestCase(TestCase):
@@ -125,7 +138,7 @@ class AccountsAPITestCase(TestCase):
         Test that an unauthenticated user cannot access the profile endpoint.
         """
         response = self.client.get(self.profile_url)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_duplicate_username_registration(self):
         """
@@ -421,3 +434,349 @@ class AccountsAPITestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 0)
         self.assertNotIn('123 Main St', response.data)
+
+
+class JWTAuthenticationTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword123",
+                                             email="testuser@example.com")
+        self.addresses_url = reverse('user-address')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_warm_request_resolves_user_without_query(self):
+        self.assertEqual(self.client.get(self.addresses_url).status_code, status.HTTP_200_OK)
+        # Listing addresses is the only query left
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.addresses_url).status_code, status.HTTP_200_OK)
+
+    def test_cached_users_are_fresh_instances(self):
+        self.client.get(self.addresses_url)
+        first = user_cache.get(self.user.id)
+        first.first_name = "Changed"
+        second = user_cache.get(self.user.id)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.first_name, "")
+        self.assertEqual(second.pk, self.user.pk)
+        self.assertFalse(second._state.adding)
+
+    def test_deactivation_invalidates_cached_user(self):
+        self.assertEqual(self.client.get(self.addresses_url).status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get(self.addresses_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_session_and_basic_auth_are_not_accepted_by_the_api(self):
+        client = APIClient()
+        client.login(username="testuser", password="testpassword123")
+        self.assertEqual(client.get(self.addresses_url).status_code, status.HTTP_401_UNAUTHORIZED)
+        credentials = base64.b64encode(b"testuser:testpassword123").decode()
+        client = APIClient(HTTP_AUTHORIZATION=f'Basic {credentials}')
+        self.assertEqual(client.get(self.addresses_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f"user{number}") for number in range(3)]
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UserCache(maxsize=2, ttl=60)
+        cache.set(self.users[0].id, self.users[0])
+        cache.set(self.users[1].id, self.users[1])
+        cache.get(self.users[0].id)
+        cache.set(self.users[2].id, self.users[2])
+        self.assertIsNone(cache.get(self.users[1].id))
+        self.assertIsNotNone(cache.get(self.users[0].id))
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire(self):
+        cache = UserCache(maxsize=2, ttl=60)
+        cache.set(self.users[0].id, self.users[0])
+        with patch('accounts.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.get(self.users[0].id))
+        self.assertEqual(len(cache), 0)
+
+
+class RegistrationTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user_data = {
+            "username": "testuser",
+            "email": "testuser@example.com",
+            "password": "testpassword123",
+            "profile": {"phone_number": "1234567890", "date_of_birth": "1990-01-01"},
+        }
+
+    def profile_queries(self, queries):
+        return [query['sql'] for query in queries if CustomerProfile._meta.db_table in query['sql']]
+
+    def test_registration_inserts_profile_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('user-register'), self.user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        profile_queries = self.profile_queries(queries)
+        self.assertEqual(len(profile_queries), 1)
+        self.assertTrue(profile_queries[0].startswith('INSERT'))
+        profile = CustomerProfile.objects.get(user__username="testuser")
+        self.assertEqual(profile.phone_number, "1234567890")
+        self.assertEqual(str(profile.date_of_birth), "1990-01-01")
+
+    def test_users_created_elsewhere_get_an_empty_profile(self):
+        user = User.objects.create_user(username="other")
+        profile = CustomerProfile.objects.get(user=user)
+        self.assertEqual(profile.phone_number, "")
+        self.assertIsNone(profile.date_of_birth)
+
+    def test_saving_user_does_not_save_profile(self):
+        user = User.objects.create_user(username="other")
+        user.first_name = "Changed"
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_fixture_loading_does_not_create_profile(self):
+        user = User(username="raw")
+        post_save.send(sender=User, instance=user, created=True, raw=True)
+        self.assertFalse(CustomerProfile.objects.filter(user__username="raw").exists())
+
+
+class PasswordHasherTestCase(TestCase):
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_iterations_follow_settings(self):
+        encoded = make_password("testpassword123")
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(check_password("testpassword123", encoded))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(get_hasher().must_update(encoded))
+
+    @override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10)
+    def test_scrypt_parameters_follow_settings(self):
+        encoded = make_password("testpassword123", hasher='scrypt')
+        self.assertEqual(get_hasher('scrypt').decode(encoded)['work_factor'], 2 ** 10)
+        self.assertTrue(check_password("testpassword123", encoded))
+
+
+class UserDetailQueryTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword123",
+                                             email="testuser@example.com")
+        CustomerProfile.objects.filter(user=self.user).update(phone_number="1234567890")
+        self.profile_url = reverse('user-profile')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        # Warm the authentication cache
+        self.client.get(self.profile_url)
+
+    def writes(self, queries):
+        return [query['sql'] for query in queries if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+    def test_get_loads_user_and_profile_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.profile_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['profile']['phone_number'], "1234567890")
+
+    def test_patch_writes_only_changed_columns(self):
+        # Loading the user with its profile, the savepoint around the writes and one UPDATE
+        with self.assertNumQueries(4), CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.profile_url, {"profile": {"phone_number": "0987654321"}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        writes = self.writes(queries)
+        self.assertEqual(len(writes), 1)
+        self.assertIn(CustomerProfile._meta.db_table, writes[0])
+        self.assertIn('"phone_number"', writes[0])
+        self.assertNotIn('"date_of_birth"', writes[0])
+        self.assertEqual(CustomerProfile.objects.get(user=self.user).phone_number, "0987654321")
+
+    def test_patch_without_changes_writes_nothing(self):
+        data = {"username": "testuser", "profile": {"phone_number": "1234567890"}}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.profile_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.writes(queries), [])
+
+    def test_patch_user_field_updates_user_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.profile_url, {"email": "changed@example.com"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        writes = self.writes(queries)
+        self.assertEqual(len(writes), 1)
+        self.assertIn('SET "email"', writes[0])
+        self.assertNotIn('"password"', writes[0])
+
+
+class DefaultAddressTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword123")
+        self.client.force_authenticate(self.user)
+        self.home = Address.objects.create(customer=self.user, street="1 Main St", city="Springfield",
+                                           zip_code="12345", is_default=True, address_type="Home")
+        self.work = Address.objects.create(customer=self.user, street="2 Elm St", city="Springfield",
+                                           zip_code="12345", address_type="Work")
+        self.address_data = {"street": "3 Oak St", "city": "Rivertown", "zip_code": "54321", "is_default": True,
+                             "address_type": "Other"}
+
+    def defaults(self):
+        return list(Address.objects.filter(customer=self.user, is_default=True).values_list('id', flat=True))
+
+    def test_database_allows_one_default_per_customer(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Address.objects.create(customer=self.user, street="3 Oak St", city="Rivertown", zip_code="54321",
+                                   is_default=True, address_type="Other")
+        other = User.objects.create_user(username="other")
+        Address.objects.create(customer=other, street="3 Oak St", city="Rivertown", zip_code="54321",
+                               is_default=True, address_type="Other")
+
+    def test_creating_default_address_replaces_default(self):
+        response = self.client.post(reverse('user-address'), self.address_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.defaults(), [response.data['id']])
+
+    def test_switching_default_writes_two_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(reverse('user-address-detail', args=[self.work.id]), {"is_default": True},
+                                         format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(self.defaults(), [self.work.id])
+
+    def test_saving_default_address_keeps_it_default(self):
+        response = self.client.put(reverse('user-address-detail', args=[self.home.id]), self.address_data,
+                                   format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.defaults(), [self.home.id])
+
+    def test_addresses_are_listed_default_first(self):
+        self.client.patch(reverse('user-address-detail', args=[self.work.id]), {"is_default": True}, format='json')
+        response = self.client.get(reverse('user-address'))
+        self.assertEqual([address['id'] for address in response.data], [self.work.id, self.home.id])
+
+    def test_admin_can_make_another_address_default(self):
+        admin_user = User.objects.create_superuser(username="admin", password="adminpassword123")
+        self.client.force_login(admin_user)
+        data = {"customer": self.user.id, "street": "2 Elm St", "city": "Springfield", "zip_code": "12345",
+                "is_default": "on", "address_type": "Work"}
+        response = self.client.post(reverse('admin:accounts_address_change', args=[self.work.id]), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.defaults(), [self.work.id])
+
+    def test_admin_searches_addresses_by_street_and_city(self):
+        admin_user = User.objects.create_superuser(username="admin", password="adminpassword123")
+        self.client.force_login(admin_user)
+        url = reverse('admin:accounts_address_changelist')
+        both = sorted([self.home.id, self.work.id])
+        # Street and city match anywhere, usernames and zip codes by prefix only
+        for term, expected in [("Elm", [self.work.id]), ("field", both), ("test", both), ("2345", []), ("tuser", [])]:
+            response = self.client.get(url, {'q': term})
+            self.assertEqual(sorted(address.id for address in response.context['cl'].result_list), expected, term)
+
+
+class TokenRevocationTestCase(TestCase):
+
+    def setUp(self):
+        revocation_list.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword123")
+        self.refresh = RevocableRefreshToken.for_user(self.user)
+        self.access = self.refresh.access_token
+        self.addresses_url = reverse('user-address')
+
+    def tearDown(self):
+        revocation_list.clear()
+
+    def revoke(self, **credentials):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('token_revoke'), {"refresh": str(self.refresh)}, format='json',
+                                    **credentials)
+
+    def test_revoked_tokens_are_rejected(self):
+        response = self.revoke(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(RevokedToken.objects.filter(user=self.user).count(), 2)
+        response = self.client.get(self.addresses_url, HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('token_refresh'), {"refresh": str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_other_tokens_stay_valid(self):
+        self.revoke()
+        other = RevocableRefreshToken.for_user(self.user)
+        response = self.client.get(self.addresses_url, HTTP_AUTHORIZATION=f'Bearer {other.access_token}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token_refresh'), {"refresh": str(other)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revoking_invalid_token_fails(self):
+        response = self.client.post(reverse('token_revoke'), {"refresh": str(self.access)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RevokedToken.objects.exists())
+
+    @override_settings(REVOKED_TOKEN_SYNC_INTERVAL=0)
+    def test_revocations_of_other_processes_are_synced(self):
+        self.assertEqual(self.client.get(self.addresses_url, HTTP_AUTHORIZATION=f'Bearer {self.access}').status_code,
+                         status.HTTP_200_OK)
+        # Written by another process, which does not mark it revoked in this one
+        RevokedToken.objects.create(jti=self.access['jti'], expires_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(self.client.get(self.addresses_url, HTTP_AUTHORIZATION=f'Bearer {self.access}').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_check_runs_no_query_between_syncs(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.client.get(self.addresses_url)
+        # Listing addresses is the only query left
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.addresses_url).status_code, status.HTTP_200_OK)
+
+    @override_settings(REVOKED_TOKEN_ERROR_RATE=0)
+    def test_exact_set_needs_no_confirmation(self):
+        self.revoke()
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation_list.is_revoked(self.refresh['jti']))
+            self.assertFalse(revocation_list.is_revoked(self.access['jti']))
+
+    def test_parameters_override_settings(self):
+        self.revoke()
+        revoked = RevocationList(capacity=10, error_rate=0, sync_interval=3600)
+        revoked.sync()
+        self.assertIsInstance(revoked.revoked, set)
+        self.assertTrue(revoked.is_revoked(self.refresh['jti']))
+
+    def test_expired_tokens_are_purged(self):
+        RevokedToken.objects.create(jti="expired", expires_at=timezone.now() - timedelta(seconds=1))
+        self.revoke()
+        self.assertEqual(purge_revoked_tokens(), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), [self.refresh['jti']])
+
+
+class BloomFilterTestCase(TestCase):
+
+    def test_added_keys_are_present(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = [f"key-{number}" for number in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        # A key whose bits were all set already, a false positive, is not counted
+        self.assertGreaterEqual(len(bloom), 990)
+        self.assertLessEqual(len(bloom), 1000)
+
+    def test_key_added_again_is_counted_once(self):
+        bloom = BloomFilter(1000, 0.01)
+        bloom.add("key")
+        bloom.add("key")
+        self.assertEqual(len(bloom), 1)
+
+    def test_false_positive_rate_is_bounded(self):
+        bloom = BloomFilter(1000, 0.01)
+        for number in range(1000):
+            bloom.add(f"key-{number}")
+        false_positives = sum(f"other-{number}" in bloom for number in range(10000))
+        self.assertLess(false_positives, 300)
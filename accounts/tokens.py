@@ -0,0 +1,27 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .revocation import revocation_list
+
+
+class RevocableTokenMixin:
+    """
+    Rejects tokens whose jti is in `revocation_list`, checked in memory when the token is verified.
+    """
+    revocation_list = revocation_list
+
+    def verify(self):
+        super().verify()
+        jti = self.payload.get(api_settings.JTI_CLAIM)
+        if jti is not None and self.revocation_list.is_revoked(jti):
+            raise TokenError(_("Token is revoked"))
+
+
+class RevocableAccessToken(RevocableTokenMixin, AccessToken):
+    pass
+
+
+class RevocableRefreshToken(RevocableTokenMixin, RefreshToken):
+    access_token_class = RevocableAccessToken
@@ -1,7 +1,8 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
 from django.contrib.auth.models import User
 from .models import Address
-from .serializers import UserSerializer, AddressSerializer
+from .serializers import UserSerializer, AddressSerializer, TokenRevokeSerializer
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -15,8 +16,12 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return User.objects.select_related('profile')
+
     def get_object(self):
-        return self.request.user
+        # request.user comes from the authentication cache without its profile; load both in one query
+        return self.get_queryset().get(pk=self.request.user.pk)
 
 
 class UserAddressView(generics.ListCreateAPIView):
@@ -24,7 +29,8 @@ class UserAddressView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Address.objects.filter(customer=self.request.user)
+        # Default first, read in the order of address_customer_default_idx
+        return Address.objects.filter(customer=self.request.user).order_by('-is_default', 'id')
 
 
 class UserAddressDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -33,3 +39,17 @@ class UserAddressDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_queryset(self):
         return Address.objects.filter(customer=self.request.user)
+
+
+class TokenRevokeView(generics.GenericAPIView):
+    """
+    Revoke a refresh token, and the access token the request carries, if any, until they expire.
+    """
+    serializer_class = TokenRevokeSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
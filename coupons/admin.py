@@ -1,9 +1,10 @@
 from django.contrib import admin
+from pizza_api.admin import LargeTableAdmin
 from .models import Coupon
 
 
 @admin.register(Coupon)
-class CouponAdmin(admin.ModelAdmin):
+class CouponAdmin(LargeTableAdmin):
     list_display = ['code', 'discount_value', 'expiration_date', 'is_active', 'used_count']
     list_filter = ['is_active', 'used_count']
-    search_fields = ['code']
+    search_fields = ['^code']
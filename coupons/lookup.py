@@ -0,0 +1,45 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Coupon
+
+# Stored for unknown codes so that guessing traffic does not reach the database
+UNKNOWN_CODE = 'unknown'
+
+
+def coupon_cache_key(code):
+    # Codes are user input; hashing keeps the key safe for every cache backend
+    return 'coupons:code:' + hashlib.sha256(str(code).encode('utf-8')).hexdigest()
+
+
+def get_coupon_by_code(code):
+    """
+    Return the coupon with the given code, or None if there is none.
+
+    Found coupons are cached for COUPON_CACHE_TIMEOUT seconds and unknown codes for
+    COUPON_NEGATIVE_CACHE_TIMEOUT seconds; saving or deleting a coupon drops its entry. Uses are counted with
+    conditional UPDATEs that bypass the cache, so `used_count` of a cached coupon may lag behind the database and
+    `Coupon.redeem()` stays the authority on whether a use is left.
+    """
+    # Codes come from request data, which may hold a number
+    code = str(code)
+    key = coupon_cache_key(code)
+    cached = cache.get(key)
+    if cached == UNKNOWN_CODE:
+        return None
+    if cached is not None:
+        return cached
+
+    try:
+        coupon = Coupon.objects.get(code=code)
+    except Coupon.DoesNotExist:
+        cache.set(key, UNKNOWN_CODE, getattr(settings, 'COUPON_NEGATIVE_CACHE_TIMEOUT', 300))
+        return None
+    cache.set(key, coupon, getattr(settings, 'COUPON_CACHE_TIMEOUT', 30))
+    return coupon
+
+
+def invalidate_coupon(code):
+    cache.delete(coupon_cache_key(code))
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+from pizza_api.db import search_index_operation
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("coupons", "0002_alter_coupon_expiration_date"),
+    ]
+
+    operations = [
+        search_index_operation("coupons_coupon", "code", "coupons_coupon_code_search_idx"),
+    ]
@@ -1,6 +1,7 @@
 from decimal import Decimal
 
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
 
@@ -34,6 +35,36 @@ class Coupon(models.Model):
             return False
         return True
 
+    def redeem(self):
+        """
+        Consume one use of the coupon.
+
+        The validity checks and the increment run as a single conditional UPDATE, so concurrent redemptions can
+        never push used_count past usage_limit and no row is locked before the write. Call it as late as possible
+        in the surrounding transaction: the coupon row stays locked until that transaction commits.
+
+        Returns:
+        bool: True if a use was consumed, False if the coupon is not valid (anymore).
+        """
+        redeemed = Coupon.objects.filter(
+            pk=self.pk,
+            is_active=True,
+            expiration_date__gte=timezone.now(),
+            used_count__lt=F('usage_limit'),
+        ).update(used_count=F('used_count') + 1)
+        if redeemed:
+            self.used_count += 1
+        return bool(redeemed)
+
+    def release(self):
+        """
+        Give back one use of the coupon, e.g. when it is removed from an order.
+        """
+        released = Coupon.objects.filter(pk=self.pk, used_count__gt=0).update(used_count=F('used_count') - 1)
+        if released:
+            self.used_count -= 1
+        return bool(released)
+
     def apply_discount(self, order_total):
         """
         Apply the discount to the given order total.
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .lookup import get_coupon_by_code
 from .models import Coupon
 
 
@@ -13,12 +14,17 @@ class CouponApplySerializer(serializers.Serializer):
     code = serializers.CharField()
 
     def validate_code(self, value):
-        try:
-            coupon = Coupon.objects.get(code=value)
-        except Coupon.DoesNotExist:
+        coupon = get_coupon_by_code(value)
+        if coupon is None:
             raise serializers.ValidationError("Invalid coupon code.")
 
         if not coupon.is_valid():
             raise serializers.ValidationError("This coupon is not valid.")
 
+        # Keep the fetched coupon so the view does not look it up again
+        self.coupon = coupon
         return value
+
+    def validate(self, attrs):
+        attrs['coupon'] = self.coupon
+        return attrs
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .lookup import invalidate_coupon
+from .models import Coupon
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon_lookup(sender, instance, **kwargs):
+    # Drop the entry now and again on commit, in case a concurrent lookup cached the row before the commit
+    invalidate_coupon(instance.code)
+    transaction.on_commit(lambda: invalidate_coupon(instance.code))
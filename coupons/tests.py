@@ -1,11 +1,18 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.utils import OperationalError
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
+from .lookup import get_coupon_by_code
 from .models import Coupon
 from django.contrib.auth.models import User
 import datetime
+import threading
+import time
 
 
 class CouponModelTestCase(TestCase):
@@ -81,7 +88,7 @@ class CouponAPITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(username="testuser", password="testpassword")
-        self.client.login(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
 
         self.coupon = Coupon.objects.create(
             code="SAVE20",
@@ -125,3 +132,126 @@ class CouponAPITestCase(TestCase):
         response = self.client.post(self.apply_coupon_url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("This coupon is not valid.", response.data["code"])
+
+
+class CouponRedemptionConcurrencyTestCase(TransactionTestCase):
+
+    def redeem_concurrently(self, coupon, workers, attempts_per_worker=1):
+        """
+        Redeem the coupon from many threads at once and return (successes, seconds per redemption).
+        """
+        barrier = threading.Barrier(workers)
+        results = []
+        timings = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(attempts_per_worker):
+                    started = time.perf_counter()
+                    # SQLite reports write contention as an error instead of waiting; retry like a client would
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                redeemed = Coupon(pk=coupon.pk).redeem()
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)
+                    timings.append(time.perf_counter() - started)
+                    results.append(redeemed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results.count(True), timings
+
+    def test_concurrent_redemptions_never_exceed_usage_limit(self):
+        """
+        Test that many threads racing for a popular coupon consume exactly usage_limit uses.
+        """
+        coupon = Coupon.objects.create(
+            code="VIRAL",
+            discount_type="amount",
+            discount_value=5,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            is_active=True,
+            usage_limit=40
+        )
+        successes, timings = self.redeem_concurrently(coupon, workers=16, attempts_per_worker=5)
+
+        coupon.refresh_from_db()
+        self.assertEqual(successes, 40)
+        self.assertEqual(coupon.used_count, 40)
+        self.assertEqual(len(timings), 80)
+        # Each redemption is one short statement, so nobody queues behind a long-held lock
+        self.assertLess(max(timings), 5)
+
+    def test_redemption_is_a_single_conditional_update(self):
+        coupon = Coupon.objects.create(
+            code="ONCE",
+            discount_type="amount",
+            discount_value=5,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            usage_limit=1
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(coupon.redeem())
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries.captured_queries[0]['sql'].startswith('UPDATE'))
+        self.assertFalse(coupon.redeem())
+        self.assertTrue(coupon.release())
+        self.assertTrue(coupon.redeem())
+
+
+class CouponLookupTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+        self.coupon = Coupon.objects.create(
+            code="SAVE20",
+            discount_type="amount",
+            discount_value=20,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            is_active=True,
+            usage_limit=3
+        )
+        self.apply_coupon_url = reverse('apply-coupon')
+
+    def test_apply_looks_coupon_up_once(self):
+        """
+        Test that validation and application share one lookup, and later requests are served from the cache.
+        """
+        with self.assertNumQueries(1):
+            response = self.client.post(self.apply_coupon_url, {"code": "SAVE20"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.apply_coupon_url, {"code": "SAVE20"}, format='json')
+        self.assertEqual(response.data["discount_value"], 20)
+
+    def test_unknown_code_is_negatively_cached(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_coupon_by_code("GUESS1"))
+        with self.assertNumQueries(0):
+            response = self.client.post(self.apply_coupon_url, {"code": "GUESS1"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid coupon code.", response.data["code"])
+
+        # Creating the coupon drops the negative entry
+        Coupon.objects.create(code="GUESS1", discount_type="amount", discount_value=1,
+                              expiration_date=timezone.now() + datetime.timedelta(days=1))
+        self.assertIsNotNone(get_coupon_by_code("GUESS1"))
+
+    def test_save_and_delete_invalidate_cached_coupon(self):
+        self.assertEqual(get_coupon_by_code("SAVE20").discount_value, 20)
+        self.coupon.discount_value = 25
+        self.coupon.save()
+        self.assertEqual(get_coupon_by_code("SAVE20").discount_value, 25)
+        self.coupon.delete()
+        self.assertIsNone(get_coupon_by_code("SAVE20"))
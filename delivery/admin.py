@@ -1,3 +1,15 @@
 from django.contrib import admin
+from pizza_api.admin import LargeTableAdmin
+from .models import Driver
 
-# Register your models here.
+
+@admin.register(Driver)
+class DriverAdmin(LargeTableAdmin):
+    list_display = ['first_name', 'last_name', 'phone_number', 'vehicle_info', 'is_active']
+    list_filter = ['is_active']
+    search_fields = ['^last_name', '^first_name', '=phone_number', '=license_number']
+    fieldsets = (
+        (None, {
+            'fields': ('first_name', 'last_name', 'phone_number', 'vehicle_info', 'license_number', 'is_active')
+        }),
+    )
@@ -15,6 +15,7 @@ class CategoryAdmin(admin.ModelAdmin):
 @admin.register(MenuItem)
 class MenuItemAdmin(admin.ModelAdmin):
     list_display = ['name', 'price', 'is_pizza', 'is_active', 'category']
+    list_select_related = ['category']
     search_fields = ['name']
     list_filter = ['is_pizza', 'is_active', 'category']
     fieldsets = (
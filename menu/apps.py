@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MenuConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "menu"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if getattr(settings, 'MENU_SNAPSHOT_WARM_START', None):
+            from django.core.signals import request_started
+            from .snapshot import WARM_START_DISPATCH_UID, warm_on_first_request
+            request_started.connect(warm_on_first_request, dispatch_uid=WARM_START_DISPATCH_UID)
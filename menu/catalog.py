@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .changes import CHANGE_SECTIONS, get_changed_models, get_sync_version
+from .models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from .response_cache import response_cache
+
+MENU_VERSION_CACHE_KEY = 'menu:version'
+MENU_MODIFIED_CACHE_KEY = 'menu:modified'
+
+# Tables that are read when validating and pricing an order
+CATALOG_MODELS = (MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping)
+
+# Recent versions produced by bump_menu_version() in this process
+_local_versions = deque(maxlen=4096)
+
+# Latest menu change log id seen by check_menu_changes(), and when it was read
+_seen_change = {'id': None, 'checked_at': None}
+_seen_change_lock = threading.Lock()
+
+# Menu version and the latest menu change id read for it by get_menu_sync_version()
+_sync_version = (None, 0)
+
+
+def check_menu_changes():
+    """
+    Bump the menu version and the cached responses of the changed models if the menu change log grew since the
+    last check.
+
+    Runs at most every MENU_VERSION_CHECK_INTERVAL seconds. A process-local cache does not see the versions and
+    response generations other processes bump, but every menu change is logged in the database, so the process
+    notices it within the interval.
+    """
+    interval = settings.MENU_VERSION_CHECK_INTERVAL
+    checked_at = _seen_change['checked_at']
+    now = time.monotonic()
+    if interval is None or (checked_at is not None and now - checked_at < interval):
+        return
+    change_id = get_sync_version()
+    with _seen_change_lock:
+        previous = _seen_change['id']
+        _seen_change.update(id=change_id, checked_at=now)
+    if previous is not None and previous != change_id:
+        # Changes of this process were applied already; bumping again only costs a reload. A log that shrank was
+        # reset, so any model may have changed
+        models = get_changed_models(previous, change_id) if previous < change_id else list(CHANGE_SECTIONS)
+        for model in models:
+            response_cache.invalidate(model)
+        bump_menu_version()
+
+
+def get_menu_version():
+    """
+    Return the current menu version.
+
+    The counter lives in the default cache, so processes sharing a cache backend also share invalidations; with a
+    process-local cache, check_menu_changes() notices the changes of other processes.
+    A missing counter is seeded from the clock, which keeps it ahead of any version a process may still hold.
+    """
+    check_menu_changes()
+    version = cache.get(MENU_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MENU_VERSION_CACHE_KEY)
+    return version
+
+
+def get_menu_sync_version():
+    """
+    Return the latest menu change id, read from the database once per menu version.
+
+    Unlike the menu version, which may be local to the process and is seeded from the clock, it is the same in
+    every process and across restarts, so it identifies the menu content to clients.
+    """
+    global _sync_version
+    version = get_menu_version()
+    read_version, sync_version = _sync_version
+    if read_version != version:
+        sync_version = get_sync_version()
+        _sync_version = (version, sync_version)
+    return sync_version
+
+
+def set_menu_sync_version(version, sync_version):
+    """
+    Record the latest menu change id as of menu `version`, e.g. one stored with a menu snapshot.
+    """
+    global _sync_version
+    _sync_version = (version, sync_version)
+
+
+def get_menu_last_modified():
+    """
+    Return the POSIX timestamp of the last menu change seen by the cache.
+    """
+    modified = cache.get(MENU_MODIFIED_CACHE_KEY)
+    if modified is None:
+        cache.add(MENU_MODIFIED_CACHE_KEY, int(time.time()), timeout=None)
+        modified = cache.get(MENU_MODIFIED_CACHE_KEY)
+    return modified
+
+
+def bump_menu_version():
+    """
+    Increment the menu version, invalidating every catalog built for an older version.
+    """
+    cache.set(MENU_MODIFIED_CACHE_KEY, int(time.time()), timeout=None)
+    try:
+        version = cache.incr(MENU_VERSION_CACHE_KEY)
+    except ValueError:
+        get_menu_version()
+        version = cache.incr(MENU_VERSION_CACHE_KEY)
+    _local_versions.append(version)
+    return version
+
+
+def is_local_change(since, until):
+    """
+    Return whether every menu version after `since` up to `until` was produced by this process.
+
+    In-process structures that apply this process's changes incrementally use it to tell whether another process
+    changed the menu in between.
+    """
+    if not isinstance(since, int) or not 0 <= until - since <= _local_versions.maxlen:
+        return False
+    local = set(_local_versions)
+    return all(version in local for version in range(since + 1, until + 1))
+
+
+def availability_bitmap(pks):
+    """
+    Return a bitmap in which bit n is set for every primary key n given.
+    """
+    pks = list(pks)
+    bitmap = bytearray((max(pks) >> 3) + 1 if pks else 0)
+    for pk in pks:
+        bitmap[pk >> 3] |= 1 << (pk & 7)
+    return bytes(bitmap)
+
+
+class MenuCatalog:
+    """
+    Immutable snapshot of the menu tables for one menu version, indexed by primary key.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self._rows = rows
+        # Rows without an active flag can always be ordered
+        self._available = {
+            model: availability_bitmap(pk for pk, obj in model_rows.items() if getattr(obj, 'is_active', True))
+            for model, model_rows in rows.items()
+        }
+
+    @classmethod
+    def load(cls, version):
+        return cls(version, {model: {obj.pk: obj for obj in model.objects.all()} for model in CATALOG_MODELS})
+
+    @classmethod
+    def from_rows(cls, version, rows):
+        """
+        Build a catalog from instances already in memory, given as {model: {pk: instance}}.
+        """
+        return cls(version, {model: dict(rows[model]) for model in CATALOG_MODELS})
+
+    def get(self, model, pk):
+        """
+        Return the cached instance of `model` with the given primary key, or None.
+        """
+        return self._rows[model].get(pk)
+
+    def all(self, model):
+        return list(self._rows[model].values())
+
+    def is_available(self, model, pk):
+        """
+        Return whether the row of `model` with the given primary key exists and is active.
+        """
+        bitmap = self._available[model]
+        index = pk >> 3
+        return 0 <= index < len(bitmap) and bool(bitmap[index] >> (pk & 7) & 1)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Return the catalog for the current menu version, reloading it if the menu changed.
+    """
+    global _catalog
+    version = get_menu_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                # The version is read before loading, so a change made during the load triggers another reload
+                _catalog = MenuCatalog.load(version)
+            catalog = _catalog
+    return catalog
+
+
+def set_catalog(catalog):
+    """
+    Replace the process's catalog, e.g. with one built from a menu snapshot.
+    """
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog
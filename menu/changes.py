@@ -0,0 +1,107 @@
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models import Max, Subquery
+
+from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping, MenuChange
+
+# Logged models and the section of the change feed their rows are listed in
+CHANGE_SECTIONS = {
+    Category: 'categories',
+    MenuItem: 'menu_items',
+    PizzaSize: 'pizza_sizes',
+    CrustType: 'crust_types',
+    Sauce: 'sauces',
+    Cheese: 'cheeses',
+    Topping: 'toppings',
+}
+
+# Arbitrary key of the PostgreSQL advisory lock serializing writers of the change log
+CHANGE_LOG_LOCK_KEY = 0x6D656E75
+
+RECORD_BATCH_SIZE = 1000
+
+
+def lock_change_log(using=DEFAULT_DB_ALIAS):
+    """
+    Serialize writers of the change log until the current transaction ends.
+
+    Change ids must become visible in increasing order, or a client syncing between two commits would skip the
+    lower id for good. SQLite allows one writer at a time anyway; PostgreSQL takes a transaction-level advisory
+    lock, which only menu writes wait for.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CHANGE_LOG_LOCK_KEY])
+
+
+def record_changes(model, pks, deleted=False, using=DEFAULT_DB_ALIAS):
+    """
+    Log menu rows as saved or deleted, in the transaction that changed them.
+
+    Model signals call this for saves and deletes; queryset `update()` and bulk writes must call it themselves.
+    """
+    section = CHANGE_SECTIONS[model]
+    with transaction.atomic(using=using):
+        lock_change_log(using)
+        MenuChange.objects.using(using).bulk_create(
+            (MenuChange(section=section, object_id=pk, deleted=deleted) for pk in pks), batch_size=RECORD_BATCH_SIZE
+        )
+
+
+def get_sync_version():
+    """
+    Return the id of the latest logged change, 0 if nothing was logged.
+    """
+    return MenuChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def get_changed_models(since, until):
+    """
+    Return the logged models with a row changed after version `since` up to version `until`.
+    """
+    sections = set(
+        MenuChange.objects.filter(id__gt=since, id__lte=until).values_list('section', flat=True).distinct()
+    )
+    return [model for model, section in CHANGE_SECTIONS.items() if section in sections]
+
+
+def get_changes(since):
+    """
+    Return the rows changed and deleted after version `since`.
+
+    Returns:
+    tuple: (version, {model: [pk, ...]} of changed rows, {model: [pk, ...]} of deleted rows). Only the latest
+    change of a row counts, so a row changed and then deleted is only listed as deleted.
+    """
+    version = since
+    latest = {}
+    changes = (
+        MenuChange.objects.filter(id__gt=since).order_by('id')
+        .values_list('id', 'section', 'object_id', 'deleted')
+    )
+    for change_id, section, object_id, deleted in changes.iterator(chunk_size=2000):
+        latest[section, object_id] = deleted
+        version = change_id
+
+    models = {section: model for model, section in CHANGE_SECTIONS.items()}
+    changed, removed = {}, {}
+    for (section, object_id), deleted in latest.items():
+        model = models.get(section)
+        if model is not None:
+            (removed if deleted else changed).setdefault(model, []).append(object_id)
+    return version, changed, removed
+
+
+def compact_changes():
+    """
+    Delete every change superseded by a later change of the same row.
+
+    A client syncing from any version still receives the latest change of every row changed since, so the log
+    shrinks to one entry per row, including a tombstone per deleted row.
+
+    Returns:
+    int: The number of changes deleted.
+    """
+    latest = MenuChange.objects.values('section', 'object_id').annotate(latest=Max('id')).values('latest')
+    deleted, _ = MenuChange.objects.exclude(id__in=Subquery(latest)).delete()
+    return deleted
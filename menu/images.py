@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .catalog import bump_menu_version
+from .changes import record_changes
+from .models import MenuItem
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, file extension and encoder options of every variant format
+VARIANT_FORMATS = (
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+VARIANT_DIRECTORY = 'menu_images/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_variant_sizes():
+    """
+    Return the variant names and the edge in pixels of the square box each variant is fitted into.
+    """
+    return getattr(settings, 'MENU_IMAGE_VARIANT_SIZES', {'thumb': 120, 'small': 320, 'medium': 640})
+
+
+def render_variants(image_file):
+    """
+    Render every variant of an uploaded image.
+
+    Returns:
+    dict: {variant name: {'width', 'height', file extension: (encoded bytes)}}.
+    """
+    with Image.open(image_file) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode != 'RGB':
+            # Neither JPEG nor the lossy variants need transparency; flatten it onto white
+            background = Image.new('RGB', source.size, (255, 255, 255))
+            rgba = source.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            source = background
+
+        rendered = {}
+        for name, edge in get_variant_sizes().items():
+            variant = source.copy()
+            variant.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            rendered[name] = {'width': variant.width, 'height': variant.height}
+            for image_format, extension, options in VARIANT_FORMATS:
+                buffer = BytesIO()
+                variant.save(buffer, image_format, **options)
+                rendered[name][extension] = buffer.getvalue()
+        return rendered
+
+
+def variant_name(source_name, variant, extension, content):
+    """
+    Return the storage name of a variant, including a hash of its content so that the file can be cached forever.
+    """
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    return f'{VARIANT_DIRECTORY}/{stem}.{variant}.{digest}.{extension}'
+
+
+def generate_variants(menu_item_id):
+    """
+    Generate the variants of a menu item's image and record them in `image_variants`.
+
+    The record is only written if the item still has the image the variants were made from, so a newer upload
+    is never overwritten by an older, slower run.
+    """
+    menu_item = MenuItem.objects.filter(pk=menu_item_id).only('image', 'image_variants').first()
+    if menu_item is None:
+        return
+    source_name = menu_item.image.name if menu_item.image else ''
+
+    variants = {}
+    if source_name:
+        variants['source'] = source_name
+        with menu_item.image.open('rb') as image_file:
+            rendered = render_variants(image_file)
+        for name, files in rendered.items():
+            variants[name] = {'width': files.pop('width'), 'height': files.pop('height')}
+            for extension, content in files.items():
+                storage_name = variant_name(source_name, name, extension, content)
+                # Equal names mean equal content, so an existing file is already the right one
+                if not default_storage.exists(storage_name):
+                    storage_name = default_storage.save(storage_name, ContentFile(content))
+                variants[name][extension] = storage_name
+
+    if source_name:
+        current = MenuItem.objects.filter(pk=menu_item_id, image=source_name)
+    else:
+        current = MenuItem.objects.filter(Q(image='') | Q(image__isnull=True), pk=menu_item_id)
+    with transaction.atomic():
+        updated = current.update(image_variants=variants, updated_at=timezone.now())
+        if updated:
+            record_changes(MenuItem, [menu_item_id])
+    if updated:
+        # update() sends no signals, so retire what was rendered from the old variants here
+        bump_menu_version()
+        response_cache.invalidate(MenuItem)
+        delete_unused_variants(menu_item.image_variants, variants)
+
+
+def delete_unused_variants(old_variants, new_variants):
+    keep = set(variant_files(new_variants))
+    for storage_name in variant_files(old_variants):
+        if storage_name not in keep:
+            default_storage.delete(storage_name)
+
+
+def variant_files(variants):
+    for name, files in variants.items():
+        if name == 'source':
+            continue
+        for extension, storage_name in files.items():
+            if extension not in ('width', 'height'):
+                yield storage_name
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MENU_IMAGE_WORKERS', 2), thread_name_prefix='menu-images'
+                )
+    return _executor
+
+
+def run_in_worker(menu_item_id):
+    try:
+        generate_variants(menu_item_id)
+    except Exception:
+        logger.exception("Generating image variants of menu item %s failed", menu_item_id)
+    finally:
+        # Worker threads have their own database connection, which Django's request cycle never closes
+        connection.close()
+
+
+def schedule_variants(menu_item_id):
+    """
+    Generate the image variants of a menu item once the current transaction commits.
+
+    The work runs in a background thread pool, or inline when MENU_IMAGE_EAGER is set (as in tests).
+    """
+    def submit():
+        if getattr(settings, 'MENU_IMAGE_EAGER', False):
+            generate_variants(menu_item_id)
+        else:
+            get_executor().submit(run_in_worker, menu_item_id)
+
+    transaction.on_commit(submit)
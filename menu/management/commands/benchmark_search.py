@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from menu.search import SearchIndex
+
+BRANDS = ['Napoli', 'Roma', 'Brooklyn', 'Chicago', 'Detroit', 'Sicilia', 'Firenze', 'Milano', 'Bella', 'Luigi']
+INGREDIENTS = [
+    'margherita', 'pepperoni', 'mushroom', 'olive', 'anchovy', 'prosciutto', 'salami', 'artichoke', 'spinach',
+    'jalapeno', 'pineapple', 'chicken', 'bacon', 'sausage', 'onion', 'pepper', 'tomato', 'basil', 'garlic',
+    'ricotta', 'gorgonzola', 'mozzarella', 'parmesan', 'truffle', 'arugula', 'eggplant', 'zucchini', 'chorizo',
+    'meatball', 'pesto', 'buffalo', 'barbecue', 'hawaiian', 'capricciosa', 'quattro', 'formaggi', 'diavola',
+]
+DISHES = ['pizza', 'calzone', 'stromboli', 'flatbread', 'salad', 'pasta', 'sandwich', 'wings', 'bread', 'soda']
+STYLES = ['classic', 'deluxe', 'spicy', 'vegan', 'thin', 'deep', 'stuffed', 'family', 'mini', 'gluten', 'free']
+DESCRIPTION_WORDS = [
+    'fresh', 'baked', 'wood', 'fired', 'oven', 'hand', 'tossed', 'dough', 'sauce', 'cheese', 'crispy', 'crust',
+    'topped', 'with', 'house', 'made', 'local', 'organic', 'aged', 'smoked', 'roasted', 'sweet', 'hot', 'honey',
+]
+
+# Search-as-you-type prefixes, whole words, misspellings and multi-word queries
+QUERIES = [
+    'p', 'pe', 'pep', 'pepp', 'pepperoni', 'marg', 'margherita', 'mozarella', 'peperoni', 'gorgonzolla',
+    'spicy pep', 'napoli margherita', 'vegan pizza', 'truffle calz', 'deep dish chicago', 'bbq', 'roasted garlic',
+    'brooklyn salami pizza', 'capriciosa', 'hawaian',
+]
+
+
+def synthetic_menu(items, rng):
+    """
+    Build search documents of a multi-brand menu with the given number of items, plus toppings and categories.
+    """
+    documents = []
+    for pk in range(1, items + 1):
+        name = ' '.join([rng.choice(BRANDS), rng.choice(STYLES), *rng.sample(INGREDIENTS, rng.randint(1, 3)),
+                         rng.choice(DISHES)])
+        description = ' '.join(rng.choices(DESCRIPTION_WORDS + INGREDIENTS, k=rng.randint(6, 16)))
+        documents.append(('menu_item', pk, name, [(name, 2), (description, 1)]))
+    for pk, ingredient in enumerate(INGREDIENTS, start=1):
+        documents.append(('topping', pk, ingredient.title(), [(ingredient, 2)]))
+    for pk, dish in enumerate(DISHES, start=1):
+        documents.append(('category', pk, dish.title(), [(dish, 2)]))
+    return documents
+
+
+class Command(BaseCommand):
+    help = "Benchmark menu search latency on a synthetic in-memory menu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=50000, help="Number of synthetic menu items.")
+        parser.add_argument('--repeat', type=int, default=200, help="Timed runs of every query.")
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        documents = synthetic_menu(options['items'], rng)
+
+        started = time.perf_counter()
+        index = SearchIndex.build(documents)
+        self.stdout.write(f"Indexed {len(index)} documents in {time.perf_counter() - started:.2f}s")
+
+        # The first run of a query finds the terms its words match, which later runs reuse until the index changes
+        self.stdout.write(f"{'query':<24} {'results':>7} {'first (us)':>11} {'median (us)':>12} {'p99 (us)':>9}")
+        medians = []
+        for query in QUERIES:
+            started = time.perf_counter()
+            index.search(query, limit=options['limit'])
+            first = time.perf_counter() - started
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                results = index.search(query, limit=options['limit'])
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            median = statistics.median(timings)
+            medians.append(median)
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(
+                f"{query:<24} {len(results):>7} {first * 1e6:>11.1f} {median * 1e6:>12.1f} {p99 * 1e6:>9.1f}"
+            )
+        self.stdout.write(f"Median of query medians: {statistics.median(medians) * 1e6:.1f} us")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from menu.changes import compact_changes, get_sync_version
+
+
+class Command(BaseCommand):
+    help = "Delete menu change log entries superseded by a later change of the same row."
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(f"Deleted {deleted} superseded menu changes; menu version is {get_sync_version()}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from menu.snapshot import dump_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write the whole menu to a JSON Lines snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="Snapshot file to write; standard output if omitted.")
+
+    def handle(self, *args, **options):
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                count = dump_snapshot(stream)
+            self.stderr.write(f"Wrote {count} menu rows to {options['output']}")
+        else:
+            # The snapshot is written in pieces; do not end each of them with a newline
+            self.stdout.ending = ''
+            count = dump_snapshot(self.stdout)
+            self.stderr.write(f"Wrote {count} menu rows")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+
+from menu.snapshot import load_snapshot, read_snapshot, snapshot_digest
+
+
+class Command(BaseCommand):
+    help = "Insert or update the menu from a JSON Lines snapshot written by dump_menu, in one transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', help="Snapshot file to load.")
+
+    def handle(self, *args, **options):
+        path = options['snapshot']
+        started = time.perf_counter()
+        try:
+            digest = snapshot_digest(path)
+            with open(path, encoding='utf-8') as stream:
+                rows = read_snapshot(stream)
+        except (OSError, DeserializationError) as error:
+            raise CommandError(f"Cannot read menu snapshot {path}: {error}")
+
+        count = load_snapshot(rows, digest=digest)
+        self.stdout.write(f"Loaded {count} menu rows in {time.perf_counter() - started:.2f}s")
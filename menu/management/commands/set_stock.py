@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.models import MenuItem, Topping
+from menu.stock import clear_stock, get_stock, set_stock
+
+STOCK_TYPES = {'menu_item': MenuItem, 'topping': Topping}
+
+
+class Command(BaseCommand):
+    help = "Set, show or stop tracking the stock of a menu item or topping."
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=sorted(STOCK_TYPES))
+        parser.add_argument('id', type=int)
+        parser.add_argument('quantity', type=int, nargs='?',
+                            help="Units in stock; omit to show the current stock.")
+        parser.add_argument('--shards', type=int, default=None,
+                            help="Rows to split the stock over (default: MENU_STOCK_SHARDS).")
+        parser.add_argument('--clear', action='store_true', help="Stop tracking the stock.")
+
+    def handle(self, *args, **options):
+        model = STOCK_TYPES[options['type']]
+        try:
+            instance = model.objects.get(pk=options['id'])
+        except model.DoesNotExist:
+            raise CommandError(f"{model._meta.verbose_name} {options['id']} does not exist.")
+
+        if options['clear']:
+            clear_stock(instance)
+            self.stdout.write(f"Stopped tracking the stock of {instance}")
+            return
+        if options['quantity'] is not None:
+            if options['quantity'] < 0 or (options['shards'] is not None and options['shards'] < 1):
+                raise CommandError("The quantity must not be negative and the shard count must be positive.")
+            set_stock(instance, options['quantity'], shards=options['shards'])
+
+        stock = get_stock(instance)
+        self.stdout.write(f"{instance}: {'not tracked' if stock is None else stock}")
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["id"],
+                name="menuitem_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["category", "id"],
+                name="menuitem_active_category_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="menuitem",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["is_pizza", "id"],
+                name="menuitem_active_pizza_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="topping",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["id"],
+                name="topping_active_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0002_menu_active_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuitem",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0003_menuitem_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuItemStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "menu_item",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_shards",
+                        to="menu.menuitem",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("menu_item", "shard"), name="menuitemstock_unique_shard"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ToppingStock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                (
+                    "topping",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_shards",
+                        to="menu.topping",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("topping", "shard"), name="toppingstock_unique_shard"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+# Sections of the change feed, as in menu.changes.CHANGE_SECTIONS
+SECTIONS = (
+    ("Category", "categories"),
+    ("MenuItem", "menu_items"),
+    ("PizzaSize", "pizza_sizes"),
+    ("CrustType", "crust_types"),
+    ("Sauce", "sauces"),
+    ("Cheese", "cheeses"),
+    ("Topping", "toppings"),
+)
+
+
+def record_existing_rows(apps, schema_editor):
+    """
+    Log every existing row as changed, so a client syncing from version 0 receives the whole menu.
+    """
+    MenuChange = apps.get_model("menu", "MenuChange")
+    db_alias = schema_editor.connection.alias
+    for model_name, section in SECTIONS:
+        model = apps.get_model("menu", model_name)
+        pks = model.objects.using(db_alias).order_by("pk").values_list("pk", flat=True)
+        MenuChange.objects.using(db_alias).bulk_create(
+            (MenuChange(section=section, object_id=pk) for pk in pks.iterator()), batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("menu", "0004_stock_shards"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="cheese",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="crusttype",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="menuitem",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="pizzasize",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="sauce",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="topping",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name="MenuChange",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("section", models.CharField(max_length=32)),
+                ("object_id", models.PositiveBigIntegerField()),
+                ("deleted", models.BooleanField(default=False)),
+                ("changed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["section", "object_id"], name="menuchange_row_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(record_existing_rows, migrations.RunPython.noop),
+    ]
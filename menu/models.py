@@ -5,6 +5,7 @@ from django.db import models
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -19,6 +20,19 @@ class MenuItem(models.Model):
     is_active = models.BooleanField(default=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     image = models.ImageField(upload_to='menu_images/', blank=True, null=True)
+    # Storage names of the resized copies of `image`, written by menu.images after each upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Clients list active items, by category or pizza flag, in primary key order
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='menuitem_active_idx'),
+            models.Index(fields=['category', 'id'], condition=models.Q(is_active=True),
+                         name='menuitem_active_category_idx'),
+            models.Index(fields=['is_pizza', 'id'], condition=models.Q(is_active=True),
+                         name='menuitem_active_pizza_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -29,6 +43,7 @@ class PizzaSize(models.Model):
     name = models.CharField(max_length=50)
     diameter = models.DecimalField(max_digits=5, decimal_places=2, help_text='Diameter in inches')
     base_price = models.DecimalField(max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} ({self.diameter}\" inches)"
@@ -38,6 +53,7 @@ class PizzaSize(models.Model):
 class CrustType(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -47,6 +63,7 @@ class CrustType(models.Model):
 class Sauce(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -56,6 +73,7 @@ class Sauce(models.Model):
 class Cheese(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -69,6 +87,71 @@ class Topping(models.Model):
     is_vegan = models.BooleanField(default=False)
     is_meat = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='topping_active_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+
+# Stock counters
+class StockShard(models.Model):
+    """
+    One of several counters that together hold the stock of a menu item or topping.
+
+    Concurrent orders decrement different shards, so they do not queue on a single row lock. Items without shards
+    are not stock-tracked.
+    """
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class MenuItemStock(StockShard):
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='stock_shards')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'shard'], name='menuitemstock_unique_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item} stock shard {self.shard}"
+
+
+class ToppingStock(StockShard):
+    topping = models.ForeignKey(Topping, on_delete=models.CASCADE, related_name='stock_shards')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['topping', 'shard'], name='toppingstock_unique_shard'),
+        ]
+
+    def __str__(self):
+        return f"{self.topping} stock shard {self.shard}"
+
+
+# Change log
+class MenuChange(models.Model):
+    """
+    One saved or deleted menu row. The id of the latest change is the menu version clients sync from.
+    """
+    id = models.BigAutoField(primary_key=True)
+    section = models.CharField(max_length=32)
+    object_id = models.PositiveBigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['section', 'object_id'], name='menuchange_row_idx'),
+        ]
+
+    def __str__(self):
+        return f"{'Deleted' if self.deleted else 'Changed'} {self.section} {self.object_id} (version {self.id})"
@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class MenuCursorPagination(CursorPagination):
+    """
+    Opt-in keyset pagination of menu lists by primary key.
+
+    Lists stay unpaginated unless the client sends ?page_size=, so existing clients keep receiving the whole list.
+    A page is read with a single `id >` condition, so its cost does not depend on how large the menu is or how
+    deep into it the page lies.
+    """
+    ordering = 'id'
+    page_size = None
+    page_size_query_param = 'page_size'
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'MENU_LIST_MAX_PAGE_SIZE', 500)
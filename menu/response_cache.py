@@ -0,0 +1,78 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class MenuResponseCache:
+    """
+    Stores rendered menu responses as bytes, per view and full path.
+
+    Every model has a generation number in the cache backend. Cache keys include the generations of the models a
+    view renders, so bumping a model's generation on save or delete retires exactly the responses built from it,
+    on every process sharing the backend. A missing generation is seeded from the clock, so after an eviction no
+    key of an earlier generation is built again. Hit and miss counters are kept per process.
+    """
+
+    def __init__(self):
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'MENU_RESPONSE_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def generation_key(model):
+        return f'menu:responses:generation:{model._meta.label_lower}'
+
+    def seed_generation(self, key):
+        """
+        Store a generation for `key` unless there is one. Returns whether it was stored.
+        """
+        return self.backend.add(key, time.time_ns(), timeout=None)
+
+    def make_key(self, view_name, path, models):
+        generation_keys = [self.generation_key(model) for model in models]
+        generations = self.backend.get_many(generation_keys)
+        missing = [key for key in generation_keys if key not in generations]
+        if missing:
+            for key in missing:
+                self.seed_generation(key)
+            generations.update(self.backend.get_many(missing))
+        # A generation evicted again right away gets a key no response is stored under
+        parts = [view_name, path] + [str(generations.get(key, time.time_ns())) for key in generation_keys]
+        return 'menu:responses:' + hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, view_name, key):
+        content = self.backend.get(key)
+        with self._lock:
+            self._counters[view_name, 'hits' if content is not None else 'misses'] += 1
+        return content
+
+    def set(self, key, content):
+        self.backend.set(key, content, getattr(settings, 'MENU_RESPONSE_CACHE_TIMEOUT', None))
+
+    def invalidate(self, model):
+        key = self.generation_key(model)
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            # A fresh seed differs from any generation a key was built with. It loses against a concurrent seed,
+            # which is fine: the generation moved either way
+            if not self.seed_generation(key):
+                self.backend.incr(key)
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset_counters(self):
+        with self._lock:
+            self._counters.clear()
+
+
+response_cache = MenuResponseCache()
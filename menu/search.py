@@ -0,0 +1,328 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter, namedtuple
+from itertools import islice
+
+from .catalog import get_menu_version, is_local_change
+from .models import Category, MenuItem, Topping
+
+# Indexed models: result type, and the text fields with the weight a match in them carries
+SEARCH_FIELDS = {
+    MenuItem: ('menu_item', (('name', 2), ('description', 1))),
+    Topping: ('topping', (('name', 2),)),
+    Category: ('category', (('name', 2),)),
+}
+
+# Scores of a query token matching a term exactly, as the start of a term, and at most (scaled by similarity) with
+# a typo
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+TYPO_SCORE = 0.6
+
+# Query tokens shorter than this only match exactly or as a prefix, and a term must share at least this Jaccard
+# fraction of its trigrams with the token to count as a typo
+MIN_TYPO_LENGTH = 4
+MIN_TYPO_SIMILARITY = 0.35
+MAX_QUERY_TOKENS = 8
+
+# Combinations of posting groups a multi-word query intersects before it settles for the results found so far
+MAX_COMBINATIONS = 1000
+
+# Query tokens whose matching postings are kept between searches
+MAX_CACHED_PLANS = 10000
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+SearchDocument = namedtuple('SearchDocument', ['type', 'id', 'name', 'terms'])
+
+
+def tokenize(text):
+    """
+    Split text into lowercase, accent-free word tokens.
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return TOKEN_RE.findall(text)
+
+
+def trigrams(term, prefix=False):
+    """
+    Return the trigrams of a term padded with two leading spaces and, unless it is a prefix, one trailing space.
+
+    The padding makes the trigrams of a prefix a subset of those of every term starting with it.
+    """
+    padded = f'  {term}' if prefix else f'  {term} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def document_fields(instance):
+    """
+    Return the result type and the (text, weight) pairs indexed for a menu row.
+    """
+    result_type, fields = SEARCH_FIELDS[type(instance)]
+    return result_type, [(getattr(instance, name), weight) for name, weight in fields]
+
+
+def is_searchable(instance):
+    # Categories have no active flag; inactive items and toppings cannot be ordered and are left out
+    return getattr(instance, 'is_active', True)
+
+
+class SearchIndex:
+    """
+    Inverted index over the names and descriptions of the menu, held in process memory.
+
+    Terms map to the documents containing them, grouped by the weight of the best field they appear in. Trigrams
+    map to the terms containing them, which finds terms by prefix and terms close to a misspelled query token
+    without scanning the vocabulary. A query matches the documents that match every token; documents are
+    visited in descending score order of one token, so a search stops as soon as no unvisited document can
+    enter the top results.
+    """
+
+    def __init__(self, version=None):
+        self.version = version
+        self._documents = {}
+        self._postings = {}
+        self._trigrams = {}
+        self._plans = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, documents, version=None):
+        """
+        Build an index from (type, id, name, [(text, weight), ...]) tuples.
+        """
+        index = cls(version)
+        for document in documents:
+            index.add(*document)
+        return index
+
+    @classmethod
+    def load(cls, version=None):
+        """
+        Build an index of the searchable rows of every indexed model.
+        """
+        return cls.from_instances((model.objects.all() for model in SEARCH_FIELDS), version)
+
+    @classmethod
+    def from_instances(cls, querysets, version=None):
+        """
+        Build an index of the searchable rows among iterables of menu model instances.
+        """
+        def documents():
+            for instances in querysets:
+                for instance in instances:
+                    if is_searchable(instance):
+                        result_type, fields = document_fields(instance)
+                        yield result_type, instance.pk, instance.name, fields
+
+        return cls.build(documents(), version)
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, result_type, pk, name, fields):
+        """
+        Add a document, replacing any earlier version of it.
+        """
+        key = (result_type, pk)
+        terms = {}
+        for text, weight in fields:
+            for term in tokenize(text):
+                if weight > terms.get(term, 0):
+                    terms[term] = weight
+
+        with self._lock:
+            self._remove(key)
+            self._documents[key] = SearchDocument(result_type, pk, name, terms)
+            for term, weight in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    for trigram in trigrams(term):
+                        self._trigrams.setdefault(trigram, set()).add(term)
+                postings.setdefault(weight, set()).add(key)
+            self._plans.clear()
+
+    def remove(self, result_type, pk):
+        with self._lock:
+            self._remove((result_type, pk))
+            self._plans.clear()
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        for term, weight in document.terms.items():
+            postings = self._postings[term]
+            keys = postings[weight]
+            keys.discard(key)
+            if not keys:
+                del postings[weight]
+            if not postings:
+                del self._postings[term]
+                for trigram in trigrams(term):
+                    terms = self._trigrams[trigram]
+                    terms.discard(term)
+                    if not terms:
+                        del self._trigrams[trigram]
+
+    def match_terms(self, token):
+        """
+        Return the indexed terms a query token matches, with their scores.
+        """
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_SCORE
+
+        # Every term starting with the token holds all of the token's prefix trigrams
+        term_sets = sorted((self._trigrams.get(trigram, ()) for trigram in trigrams(token, prefix=True)), key=len)
+        for term in term_sets[0].intersection(*term_sets[1:]) if term_sets[0] else ():
+            if term != token and term.startswith(token):
+                matches[term] = PREFIX_SCORE
+
+        if len(token) >= MIN_TYPO_LENGTH:
+            token_trigrams = trigrams(token)
+            shared = Counter()
+            for trigram in token_trigrams:
+                shared.update(self._trigrams.get(trigram, ()))
+            for term, count in shared.items():
+                # A padded term of n characters has at most n + 1 distinct trigrams
+                similarity = count / (len(token_trigrams) + len(term) + 1 - count)
+                if similarity >= MIN_TYPO_SIMILARITY and term not in matches:
+                    matches[term] = TYPO_SCORE * similarity
+        return matches
+
+    def plan(self, token):
+        """
+        Return the postings of the terms a token matches, grouped as (score, document keys), best first.
+
+        Plans are kept until the index changes, which makes repeated and search-as-you-type queries cheap.
+        """
+        plan = self._plans.get(token)
+        if plan is None:
+            matches = self.match_terms(token)
+            groups = sorted(
+                ((score * weight, keys) for term, score in matches.items()
+                 for weight, keys in self._postings[term].items()),
+                key=lambda group: group[0], reverse=True,
+            )
+            if len(self._plans) >= MAX_CACHED_PLANS:
+                self._plans.clear()
+            plan = self._plans[token] = groups
+        return plan
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` (document, score) pairs matching every token of the query, best first.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+        if not tokens:
+            return []
+
+        with self._lock:
+            plans = [self.plan(token) for token in tokens]
+            if not all(plans):
+                return []
+            if len(plans) == 1:
+                return self._top_documents(plans[0], limit)
+            return self._top_combinations(plans, limit)
+
+    def _top_documents(self, groups, limit):
+        """
+        Return the best documents of a single token's posting groups.
+        """
+        top = []
+        seen = set()
+        for score, keys in groups:
+            for key in keys:
+                if key not in seen:
+                    seen.add(key)
+                    top.append((self._documents[key], score))
+                    if len(top) == limit:
+                        return top
+        return top
+
+    def _top_combinations(self, plans, limit):
+        """
+        Return the best documents matching one posting group of every token.
+
+        Combinations of groups are visited best-first by their total score, each one intersecting its groups, so
+        the documents found first are the best ones and the search ends as soon as `limit` are found. At most
+        MAX_COMBINATIONS are visited, which bounds the cost of queries that match little.
+        """
+        def total(coordinates):
+            return sum(plans[token][group][0] for token, group in enumerate(coordinates))
+
+        start = (0,) * len(plans)
+        queue = [(-total(start), start)]
+        queued = {start}
+        seen = set()
+        top = []
+        visited = 0
+        while queue and len(top) < limit and visited < MAX_COMBINATIONS:
+            negated_score, coordinates = heapq.heappop(queue)
+            visited += 1
+            groups = sorted((plans[token][group][1] for token, group in enumerate(coordinates)), key=len)
+            hits = groups[0].intersection(*groups[1:])
+            if hits and seen:
+                hits -= seen
+            if hits:
+                seen |= hits
+                top.extend((self._documents[key], -negated_score) for key in islice(hits, limit - len(top)))
+
+            for token, group in enumerate(coordinates):
+                if group + 1 < len(plans[token]):
+                    following = coordinates[:token] + (group + 1,) + coordinates[token + 1:]
+                    if following not in queued:
+                        queued.add(following)
+                        heapq.heappush(queue, (-total(following), following))
+        return top
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Return the process's menu search index, loading it on first use.
+
+    Changes saved in this process are applied incrementally by menu.signals. If the menu version moved because
+    another process changed the menu, the index is reloaded.
+    """
+    global _index
+    version = get_menu_version()
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            if _index is not None and is_local_change(_index.version, version):
+                _index.version = version
+            elif _index is None or _index.version != version:
+                _index = SearchIndex.load(version)
+            index = _index
+    return index
+
+
+def set_search_index(index):
+    """
+    Replace the process's search index, e.g. with one built from a menu snapshot; None reloads it on next use.
+    """
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def update_search_index(result_type, pk, name, fields):
+    """
+    Apply a committed change of one menu row to the loaded index; `fields` is None when the row left the index.
+    """
+    index = _index
+    if index is None:
+        return
+    if fields is None:
+        index.remove(result_type, pk)
+    else:
+        index.add(result_type, pk, name, fields)
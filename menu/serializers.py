@@ -1,4 +1,7 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .catalog import get_catalog
 from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
 
 
@@ -9,9 +12,30 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class MenuItemSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = MenuItem
-        fields = ['id', 'name', 'description', 'price', 'is_pizza', 'is_active', 'category', 'image']
+        fields = ['id', 'name', 'description', 'price', 'is_pizza', 'is_active', 'category', 'image',
+                  'image_variants']
+
+    def get_image_variants(self, obj):
+        """
+        Return the URL of every image variant by variant name and format, with its dimensions.
+        """
+        request = self.context.get('request')
+        variants = {}
+        for name, files in obj.image_variants.items():
+            if name == 'source':
+                continue
+            variants[name] = {}
+            for key, value in files.items():
+                if key in ('width', 'height'):
+                    variants[name][key] = value
+                else:
+                    url = default_storage.url(value)
+                    variants[name][key] = request.build_absolute_uri(url) if request is not None else url
+        return variants
 
 
 class PizzaSizeSerializer(serializers.ModelSerializer):
@@ -42,3 +66,71 @@ class ToppingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Topping
         fields = ['id', 'name', 'price', 'is_vegetarian', 'is_vegan', 'is_meat', 'is_active']
+
+
+class MenuItemFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the menu item list endpoint.
+    """
+    is_active = serializers.BooleanField(required=False)
+    is_pizza = serializers.BooleanField(required=False)
+    category = serializers.IntegerField(required=False, min_value=1, source='category_id')
+
+
+class ToppingFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the topping list endpoint.
+    """
+    is_active = serializers.BooleanField(required=False)
+    is_vegetarian = serializers.BooleanField(required=False)
+    is_vegan = serializers.BooleanField(required=False)
+    is_meat = serializers.BooleanField(required=False)
+
+
+class MenuSearchQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the menu search endpoint.
+    """
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class MenuChangesQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the menu change feed.
+    """
+    since = serializers.IntegerField(min_value=0, default=0)
+
+
+class CatalogPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that resolves menu rows through the in-process menu catalog instead of the database.
+
+    With `require_available`, inactive rows are rejected using the catalog's availability bitmap.
+    """
+    default_error_messages = {
+        'unavailable': 'Invalid pk "{pk_value}" - object is not available.',
+    }
+
+    def __init__(self, model, require_available=False, **kwargs):
+        self.model = model
+        self.require_available = require_available
+        kwargs.setdefault('queryset', model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        catalog = get_catalog()
+        instance = catalog.get(self.model, pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        if self.require_available and not catalog.is_available(self.model, pk):
+            self.fail('unavailable', pk_value=data)
+        return instance
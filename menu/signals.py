@@ -0,0 +1,89 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.utils import timezone
+
+from .catalog import bump_menu_version
+from .changes import CHANGE_SECTIONS, record_changes
+from .images import schedule_variants
+from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from .response_cache import response_cache
+from .search import SEARCH_FIELDS, document_fields, is_searchable, update_search_index
+
+MENU_MODELS = (Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping)
+
+
+def invalidate_menu(sender, **kwargs):
+    """
+    Bump the menu version and the cached responses of the changed model when a menu row is saved or deleted.
+
+    Both are bumped right away so this connection sees its own change, and again on commit so that a
+    catalog or response another thread built before the commit is not kept. Queryset `update()` calls do not
+    send signals and must call `bump_menu_version()` and `response_cache.invalidate()` themselves, and
+    `update_search_index()` if they change searchable text or the active flag.
+    """
+    bump_menu_version()
+    response_cache.invalidate(sender)
+    transaction.on_commit(bump_menu_version)
+    transaction.on_commit(lambda: response_cache.invalidate(sender))
+
+
+for model in MENU_MODELS:
+    post_save.connect(invalidate_menu, sender=model, dispatch_uid=f'invalidate_menu_{model.__name__}_save')
+    post_delete.connect(invalidate_menu, sender=model, dispatch_uid=f'invalidate_menu_{model.__name__}_delete')
+
+
+def refresh_image_variants(sender, instance, raw=False, **kwargs):
+    """
+    Regenerate the image variants of a menu item whose image is not the one its variants were made from.
+    """
+    if raw:
+        return
+    source_name = instance.image.name if instance.image else ''
+    if source_name != instance.image_variants.get('source', ''):
+        schedule_variants(instance.pk)
+
+
+post_save.connect(refresh_image_variants, sender=MenuItem, dispatch_uid='refresh_menu_item_image_variants')
+
+
+def update_search(sender, instance, signal, **kwargs):
+    """
+    Apply a saved or deleted row to the in-process search index once the change commits.
+    """
+    result_type, fields = document_fields(instance)
+    if signal is post_delete or not is_searchable(instance):
+        fields = None
+    transaction.on_commit(partial(update_search_index, result_type, instance.pk, instance.name, fields))
+
+
+for model in SEARCH_FIELDS:
+    post_save.connect(update_search, sender=model, dispatch_uid=f'update_search_{model.__name__}_save')
+    post_delete.connect(update_search, sender=model, dispatch_uid=f'update_search_{model.__name__}_delete')
+
+
+def log_menu_change(sender, instance, signal, using, **kwargs):
+    """
+    Log a saved or deleted row in the change feed clients sync from.
+    """
+    record_changes(sender, [instance.pk], deleted=signal is post_delete, using=using)
+
+
+for model in CHANGE_SECTIONS:
+    post_save.connect(log_menu_change, sender=model, dispatch_uid=f'log_menu_change_{model.__name__}_save')
+    post_delete.connect(log_menu_change, sender=model, dispatch_uid=f'log_menu_change_{model.__name__}_delete')
+
+
+def log_uncategorized_items(sender, instance, using, **kwargs):
+    """
+    Log the items of a category about to be deleted, which lose their category in an UPDATE sending no signals.
+    """
+    items = MenuItem.objects.using(using).filter(category=instance)
+    pks = list(items.values_list('pk', flat=True))
+    if pks:
+        items.update(updated_at=timezone.now())
+        record_changes(MenuItem, pks, using=using)
+
+
+pre_delete.connect(log_uncategorized_items, sender=Category, dispatch_uid='log_uncategorized_menu_items')
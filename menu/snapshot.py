@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.core.signals import request_started
+from django.db import connections, transaction, DatabaseError, DEFAULT_DB_ALIAS
+
+from .catalog import MenuCatalog, bump_menu_version, get_menu_version, set_catalog, set_menu_sync_version
+from .changes import get_sync_version, record_changes
+from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from .response_cache import response_cache
+from .search import SearchIndex, SEARCH_FIELDS, set_search_index
+
+logger = logging.getLogger(__name__)
+
+# Models in a snapshot, referenced models first
+SNAPSHOT_MODELS = (Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping)
+
+# Digest of the snapshot last loaded into the database and the menu version right after the load
+SNAPSHOT_CACHE_KEY = 'menu:snapshot'
+
+LOAD_BATCH_SIZE = 500
+
+WARM_START_DISPATCH_UID = 'menu_snapshot_warm_start'
+
+
+def snapshot_digest(path):
+    with open(path, 'rb') as snapshot:
+        return hashlib.file_digest(snapshot, 'sha256').hexdigest()
+
+
+def dump_snapshot(stream):
+    """
+    Write every menu row to `stream` as JSON Lines, one object per row, in primary key order.
+
+    Returns:
+    int: The number of rows written.
+    """
+    count = 0
+
+    def counted(instances):
+        nonlocal count
+        for instance in instances:
+            count += 1
+            yield instance
+
+    for model in SNAPSHOT_MODELS:
+        serializers.serialize('jsonl', counted(model.objects.order_by('pk').iterator(chunk_size=2000)), stream=stream)
+    return count
+
+
+def read_snapshot(stream):
+    """
+    Read a snapshot into unsaved instances.
+
+    Returns:
+    dict: {model: {pk: instance}} for every snapshot model, in file order.
+    """
+    rows = {model: {} for model in SNAPSHOT_MODELS}
+    for deserialized in serializers.deserialize('jsonl', stream):
+        instance = deserialized.object
+        rows[type(instance)][instance.pk] = instance
+    return rows
+
+
+def load_snapshot(rows, digest=None, using=DEFAULT_DB_ALIAS):
+    """
+    Insert or update every row of a snapshot in one transaction.
+
+    Rows are written with one bulk upsert per batch and model; rows missing from the snapshot are left alone.
+    Bulk writes send no model signals, so the rows are logged for the change feed and the menu caches are
+    invalidated here, and the snapshot digest is
+    recorded for warm starts once the transaction commits.
+
+    Returns:
+    int: The number of rows written.
+    """
+    count = 0
+    with transaction.atomic(using=using):
+        for model in SNAPSHOT_MODELS:
+            instances = list(rows[model].values())
+            if not instances:
+                continue
+            update_fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+            model.objects.using(using).bulk_create(
+                instances, batch_size=LOAD_BATCH_SIZE, update_conflicts=True, unique_fields=['id'],
+                update_fields=update_fields,
+            )
+            record_changes(model, rows[model].keys(), using=using)
+            count += len(instances)
+
+        # Explicit primary keys do not advance PostgreSQL sequences; reset them as loaddata does
+        connection = connections[using]
+        statements = connection.ops.sequence_reset_sql(no_style(), SNAPSHOT_MODELS)
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+        invalidate_menu_caches()
+        transaction.on_commit(invalidate_menu_caches, using=using)
+        if digest is not None:
+            transaction.on_commit(
+                lambda: cache.set(SNAPSHOT_CACHE_KEY, {
+                    'digest': digest, 'version': get_menu_version(), 'sync_version': get_sync_version(),
+                }, None),
+                using=using,
+            )
+    return count
+
+
+def invalidate_menu_caches():
+    bump_menu_version()
+    for model in SNAPSHOT_MODELS:
+        response_cache.invalidate(model)
+    # The search index cannot tell bulk writes from its own incremental updates; drop it
+    set_search_index(None)
+
+
+def warm_from_snapshot(path):
+    """
+    Fill the in-process menu catalog, search index and full menu document from a snapshot file.
+
+    The snapshot is only trusted if it is the one last loaded with load_menu and the menu has not changed since,
+    as recorded in the shared cache; otherwise the caches fill from the database on first use as usual.
+
+    Returns:
+    bool: Whether the caches were warmed.
+    """
+    from .views import render_full_menu
+
+    try:
+        digest = snapshot_digest(path)
+    except OSError as error:
+        logger.warning("Cannot read menu snapshot %s: %s", path, error)
+        return False
+    # The marker is checked first, so a snapshot that was never loaded costs no query
+    marker = cache.get(SNAPSHOT_CACHE_KEY)
+    if not marker or marker['digest'] != digest or 'sync_version' not in marker:
+        logger.info("Menu snapshot %s is not the one last loaded; not warming menu caches from it", path)
+        return False
+    try:
+        version = get_menu_version()
+    except DatabaseError as error:
+        logger.warning("Cannot check menu snapshot %s against the database: %s", path, error)
+        return False
+    if marker['version'] != version:
+        logger.info("Menu snapshot %s does not match the database; not warming menu caches from it", path)
+        return False
+
+    with open(path, encoding='utf-8') as snapshot:
+        rows = read_snapshot(snapshot)
+    set_catalog(MenuCatalog.from_rows(version, rows))
+    set_search_index(SearchIndex.from_instances((rows[model].values() for model in SEARCH_FIELDS), version))
+    set_menu_sync_version(version, marker['sync_version'])
+    render_full_menu(rows)
+    logger.info("Warmed menu caches from snapshot %s", path)
+    return True
+
+
+_warm_start_lock = threading.Lock()
+
+
+def warm_on_first_request(sender, **kwargs):
+    """
+    Warm the menu caches from MENU_SNAPSHOT_WARM_START when the process starts its first request.
+
+    Connected to `request_started` by the menu app. Warming while apps load would query the database during every
+    management command, including a `migrate` that has not created the tables yet.
+    """
+    with _warm_start_lock:
+        # Only the first request to get the lock still finds the receiver connected
+        if request_started.disconnect(dispatch_uid=WARM_START_DISPATCH_UID):
+            warm_from_snapshot(settings.MENU_SNAPSHOT_WARM_START)
@@ -0,0 +1,191 @@
+import random
+import threading
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .catalog import bump_menu_version, get_menu_version
+from .changes import record_changes
+from .models import MenuItem, Topping, MenuItemStock, ToppingStock
+from .response_cache import response_cache
+from .search import SEARCH_FIELDS, update_search_index
+
+# Stock-tracked models: shard model and the name of its foreign key to the tracked row
+STOCK_MODELS = {
+    MenuItem: (MenuItemStock, 'menu_item'),
+    Topping: (ToppingStock, 'topping'),
+}
+
+# Stock units a topping portion uses
+STOCK_PORTION_UNITS = {'Normal': 1, 'Extra': 2}
+
+
+class OutOfStock(Exception):
+    def __init__(self, model, pks):
+        self.model = model
+        self.pks = sorted(pks)
+        names = ', '.join(str(pk) for pk in self.pks)
+        super().__init__(f"Not enough stock of {model._meta.verbose_name} {names}.")
+
+
+def get_shard_count():
+    return getattr(settings, 'MENU_STOCK_SHARDS', 8)
+
+
+_tracked = (None, {})
+_tracked_lock = threading.Lock()
+
+
+def get_tracked_ids():
+    """
+    Return the primary keys of the stock-tracked rows of every stock model, reloaded when the menu version moves.
+    """
+    global _tracked
+    version = get_menu_version()
+    tracked_version, tracked = _tracked
+    if tracked_version != version:
+        with _tracked_lock:
+            tracked_version, tracked = _tracked
+            if tracked_version != version:
+                tracked = {
+                    model: frozenset(shard_model.objects.values_list(f'{field}_id', flat=True).distinct())
+                    for model, (shard_model, field) in STOCK_MODELS.items()
+                }
+                _tracked = (version, tracked)
+    return tracked
+
+
+@transaction.atomic
+def set_stock(instance, quantity, shards=None):
+    """
+    Start tracking the stock of a menu item or topping, spreading `quantity` over its shards.
+
+    A row restocked above zero is made available again.
+    """
+    shard_model, field = STOCK_MODELS[type(instance)]
+    shards = shards or get_shard_count()
+    shard_model.objects.filter(**{field: instance}).delete()
+    base, remainder = divmod(quantity, shards)
+    shard_model.objects.bulk_create([
+        shard_model(**{field: instance}, shard=shard, quantity=base + (shard < remainder)) for shard in range(shards)
+    ])
+    if quantity > 0 and not instance.is_active:
+        instance.is_active = True
+        instance.save(update_fields=['is_active', 'updated_at'])
+    # The set of tracked rows is cached per menu version
+    bump_menu_version()
+    transaction.on_commit(bump_menu_version)
+
+
+@transaction.atomic
+def clear_stock(instance):
+    """
+    Stop tracking the stock of a menu item or topping.
+    """
+    shard_model, field = STOCK_MODELS[type(instance)]
+    shard_model.objects.filter(**{field: instance}).delete()
+    bump_menu_version()
+    transaction.on_commit(bump_menu_version)
+
+
+def get_stock(instance):
+    """
+    Return the stock of a menu item or topping, or None if it is not tracked.
+    """
+    shard_model, field = STOCK_MODELS[type(instance)]
+    return shard_model.objects.filter(**{field: instance}).aggregate(total=Sum('quantity'))['total']
+
+
+@transaction.atomic
+def consume_stock(demands):
+    """
+    Take the units an order needs from the stock of every tracked row, deactivating rows that run out.
+
+    `demands` maps stock models to {pk: units}; untracked rows are ignored. Each row's units are first taken from
+    one randomly chosen shard per row, all rows of a model in one conditional UPDATE, which holds no lock other
+    orders are likely to wait for. If a chosen shard runs short, the row's shards are locked and drained in order.
+
+    Raises:
+    OutOfStock: If the shards of a row together hold fewer units than demanded; nothing is taken then.
+    """
+    tracked = get_tracked_ids()
+    for model, (shard_model, field) in STOCK_MODELS.items():
+        quantities = {pk: units for pk, units in demands.get(model, {}).items() if units > 0 and pk in tracked[model]}
+        if not quantities:
+            continue
+        if not decrement_random_shards(shard_model, field, quantities):
+            decrement_locked_shards(model, shard_model, field, quantities)
+
+        exhausted = list(
+            shard_model.objects.filter(**{f'{field}_id__in': quantities})
+            .values(f'{field}_id').annotate(total=Sum('quantity')).filter(total=0)
+            .values_list(f'{field}_id', flat=True)
+        )
+        if exhausted:
+            deactivate(model, exhausted)
+
+
+def decrement_random_shards(shard_model, field, quantities):
+    """
+    Take every row's units from one random shard in a single UPDATE.
+
+    Returns:
+    bool: Whether every chosen shard held enough; otherwise nothing is taken.
+    """
+    column = f'{field}_id'
+    shard_count = get_shard_count()
+    condition = reduce(or_, (Q(**{column: pk, 'shard': random.randrange(shard_count)}) for pk in quantities))
+    units = Case(*(When(**{column: pk}, then=Value(amount)) for pk, amount in quantities.items()),
+                 output_field=PositiveIntegerField())
+    with transaction.atomic():
+        updated = shard_model.objects.filter(condition, quantity__gte=units).update(quantity=F('quantity') - units)
+        if updated != len(quantities):
+            transaction.set_rollback(True)
+            return False
+    return True
+
+
+def decrement_locked_shards(model, shard_model, field, quantities):
+    """
+    Lock the shards of every row, in a fixed order so concurrent orders cannot deadlock, and drain them in turn.
+    """
+    column = f'{field}_id'
+    shards = list(
+        shard_model.objects.select_for_update().filter(**{f'{column}__in': quantities}).order_by(column, 'shard')
+    )
+    available = {}
+    for shard in shards:
+        available[getattr(shard, column)] = available.get(getattr(shard, column), 0) + shard.quantity
+    short = [pk for pk, amount in quantities.items() if available.get(pk, 0) < amount]
+    if short:
+        raise OutOfStock(model, short)
+
+    remaining = dict(quantities)
+    changed = []
+    for shard in shards:
+        pk = getattr(shard, column)
+        taken = min(shard.quantity, remaining[pk])
+        if taken:
+            shard.quantity -= taken
+            remaining[pk] -= taken
+            changed.append(shard)
+    shard_model.objects.bulk_update(changed, ['quantity'])
+
+
+def deactivate(model, pks):
+    """
+    Mark sold-out rows inactive and invalidate everything built from them, as menu.signals does for saves.
+    """
+    model.objects.filter(pk__in=pks, is_active=True).update(is_active=False, updated_at=timezone.now())
+    record_changes(model, pks)
+    bump_menu_version()
+    response_cache.invalidate(model)
+    transaction.on_commit(bump_menu_version)
+    transaction.on_commit(lambda: response_cache.invalidate(model))
+    result_type = SEARCH_FIELDS[model][0]
+    for pk in pks:
+        transaction.on_commit(partial(update_search_index, result_type, pk, None, None))
@@ -1,5 +1,29 @@
-from django.test import TestCase
-from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.signals import request_started
+from django.db import connection, DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from pizza_api.media import serve_media
+from . import catalog, search
+from .catalog import MENU_VERSION_CACHE_KEY, get_catalog, get_menu_sync_version, get_menu_version
+from .changes import compact_changes, get_sync_version
+from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping, MenuChange
+from .response_cache import response_cache
+from .snapshot import WARM_START_DISPATCH_UID, warm_from_snapshot, warm_on_first_request
 
 
 class CategoryModelTest(TestCase):
@@ -97,3 +121,632 @@ class ToppingModelTest(TestCase):
             is_active=False,
         )
         self.assertFalse(topping.is_active)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class MenuCatalogTest(TestCase):
+    def setUp(self):
+        self.topping = Topping.objects.create(name="Pepperoni", price=1.50)
+
+    def test_catalog_serves_rows_without_queries(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            catalog = get_catalog()
+            self.assertEqual(catalog.get(Topping, self.topping.pk).name, "Pepperoni")
+            self.assertIsNone(catalog.get(Topping, self.topping.pk + 1))
+
+    def test_catalog_reloads_after_save(self):
+        version = get_catalog().version
+        self.topping.price = Decimal('2.25')
+        self.topping.save()
+        catalog = get_catalog()
+        self.assertNotEqual(catalog.version, version)
+        self.assertEqual(catalog.get(Topping, self.topping.pk).price, Decimal('2.25'))
+
+    def test_catalog_reloads_after_delete(self):
+        pk = self.topping.pk
+        get_catalog()
+        self.topping.delete()
+        self.assertIsNone(get_catalog().get(Topping, pk))
+
+    @override_settings(MENU_VERSION_CHECK_INTERVAL=0)
+    def test_catalog_reloads_after_change_of_other_process(self):
+        get_catalog()
+        # Another process changes the price and logs it, bumping the version in its own cache only
+        Topping.objects.filter(pk=self.topping.pk).update(price=Decimal('2.25'))
+        MenuChange.objects.create(section='toppings', object_id=self.topping.pk)
+        self.assertEqual(get_catalog().get(Topping, self.topping.pk).price, Decimal('2.25'))
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class FullMenuViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Pizzas")
+        MenuItem.objects.create(name="Margherita", price=10.99, is_pizza=True, category=self.category)
+        PizzaSize.objects.create(name="Medium", diameter=12.0, base_price=15.00)
+        CrustType.objects.create(name="Thin Crust", price=2.50)
+        Sauce.objects.create(name="Tomato Sauce", price=1.00)
+        Cheese.objects.create(name="Mozzarella", price=2.00)
+        self.topping = Topping.objects.create(name="Pepperoni", price=1.50)
+        self.url = reverse('menu-full')
+
+    def test_full_menu_contains_every_section(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        document = response.json()
+        for section in ('categories', 'menu_items', 'pizza_sizes', 'crust_types', 'sauces', 'cheeses', 'toppings'):
+            self.assertEqual(len(document[section]), 1, section)
+        self.assertEqual(document['menu_items'][0]['name'], "Margherita")
+        self.assertEqual(document['version'], get_sync_version())
+
+    def test_full_menu_version_starts_change_feed(self):
+        version = self.client.get(self.url).json()['version']
+        response = self.client.get(reverse('menu-changes'), {'since': version})
+        self.assertEqual(response.json(), {'version': version, 'reset': False, 'changes': {}, 'deleted': {}})
+
+        self.topping.price = Decimal('1.75')
+        self.topping.save()
+        response = self.client.get(reverse('menu-changes'), {'since': version})
+        self.assertEqual([row['price'] for row in response.json()['changes']['toppings']], ['1.75'])
+
+    def test_full_menu_is_served_from_memory(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_none_match_returns_304_until_menu_changes(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.topping.price = Decimal('1.75')
+        self.topping.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['toppings'][0]['price'], '1.75')
+
+    def test_etag_is_the_same_in_other_processes(self):
+        etag = self.client.get(self.url)['ETag']
+        # A restarted process, or another one with a cache of its own, seeds its menu version from the clock
+        cache.delete(MENU_VERSION_CACHE_KEY)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_views_answer_conditional_requests(self):
+        url = reverse('topping-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Other resources and query strings are different representations
+        self.assertNotEqual(self.client.get(reverse('sauce-list'))['ETag'], etag)
+        self.assertNotEqual(self.client.get(url + '?format=json')['ETag'], etag)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class MenuResponseCacheTest(TestCase):
+    def setUp(self):
+        caches['menu-responses'].clear()
+        response_cache.reset_counters()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Pizzas")
+        self.menu_item = MenuItem.objects.create(name="Margherita", price=10.99, is_pizza=True,
+                                                 category=self.category)
+        self.topping = Topping.objects.create(name="Pepperoni", price=1.50)
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse('topping-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(second.json()[0]['name'], "Pepperoni")
+        self.assertEqual(response_cache.counters(), {('ToppingListView', 'misses'): 1, ('ToppingListView', 'hits'): 1})
+
+    def test_query_strings_are_cached_separately(self):
+        url = reverse('topping-list')
+        self.client.get(url)
+        self.client.get(f'{url}?is_meat=true&is_active=true')
+        # The same parameters in another order share the entry
+        self.client.get(f'{url}?is_active=true&is_meat=true')
+        self.assertEqual(response_cache.counters(), {('ToppingListView', 'misses'): 2, ('ToppingListView', 'hits'): 1})
+
+    def test_unknown_query_parameters_bypass_cache(self):
+        url = reverse('topping-list')
+        response = self.client.get(url, {'unused': '1'})
+        self.assertEqual(response.json()[0]['name'], "Pepperoni")
+        self.assertEqual(response_cache.counters(), {})
+
+    def test_evicted_generation_does_not_revive_old_responses(self):
+        url = reverse('topping-list')
+        self.client.get(url)
+        self.topping.price = Decimal('1.75')
+        self.topping.save()
+        # The generation entry is evicted while a response of its first generation is still cached
+        response_cache.backend.delete(response_cache.generation_key(Topping))
+        self.assertEqual(self.client.get(url).json()[0]['price'], '1.75')
+
+    def test_save_invalidates_only_dependent_views(self):
+        toppings_url = reverse('topping-list')
+        items_url = reverse('menu-item-list')
+        self.client.get(toppings_url)
+        self.client.get(items_url)
+
+        self.topping.price = Decimal('1.75')
+        self.topping.save()
+        self.assertEqual(self.client.get(toppings_url).json()[0]['price'], '1.75')
+        with self.assertNumQueries(0):
+            self.client.get(items_url)
+
+        counters = response_cache.counters()
+        self.assertEqual(counters['ToppingListView', 'misses'], 2)
+        self.assertEqual(counters['MenuItemListView', 'hits'], 1)
+
+    @override_settings(MENU_VERSION_CHECK_INTERVAL=0)
+    def test_change_of_other_process_invalidates_dependent_views(self):
+        toppings_url = reverse('topping-list')
+        items_url = reverse('menu-item-list')
+        self.client.get(toppings_url)
+        self.client.get(items_url)
+        # Another process changes the price and logs it, bumping the generation in its own cache only
+        Topping.objects.filter(pk=self.topping.pk).update(price=Decimal('2.25'))
+        MenuChange.objects.create(section='toppings', object_id=self.topping.pk)
+
+        self.assertEqual(self.client.get(toppings_url).json()[0]['price'], '2.25')
+        self.client.get(items_url)
+        counters = response_cache.counters()
+        self.assertEqual(counters['ToppingListView', 'misses'], 2)
+        self.assertEqual(counters['MenuItemListView', 'hits'], 1)
+
+    def test_category_delete_invalidates_menu_items(self):
+        url = reverse('menu-item-list')
+        self.assertEqual(self.client.get(url).json()[0]['category'], self.category.id)
+        self.category.delete()
+        self.assertIsNone(self.client.get(url).json()[0]['category'])
+
+    @override_settings(METRICS_TOKEN="scraper-token")
+    def test_metrics_are_exposed_in_text_format(self):
+        self.client.get(reverse('topping-list'))
+        self.client.get(reverse('topping-list'))
+        response = self.client.get(reverse('menu-response-cache-metrics'), HTTP_X_METRICS_TOKEN="scraper-token")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('menu_response_cache_hits_total{view="ToppingListView"} 1', body)
+        self.assertIn('menu_response_cache_misses_total{view="ToppingListView"} 1', body)
+
+    @override_settings(METRICS_TOKEN="scraper-token")
+    def test_metrics_require_staff_or_token(self):
+        url = reverse('menu-response-cache-metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_X_METRICS_TOKEN="wrong").status_code, 401)
+        self.client.force_authenticate(User.objects.create_user(username="customer"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(User.objects.create_user(username="staff", is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class MenuFilterTest(TestCase):
+    def setUp(self):
+        caches['menu-responses'].clear()
+        self.client = APIClient()
+        self.pizzas = Category.objects.create(name="Pizzas")
+        self.drinks = Category.objects.create(name="Drinks")
+        self.margherita = MenuItem.objects.create(name="Margherita", price=10.99, is_pizza=True, category=self.pizzas)
+        self.cola = MenuItem.objects.create(name="Cola", price=1.99, category=self.drinks)
+        self.retired = MenuItem.objects.create(name="Hawaii", price=9.99, is_pizza=True, is_active=False,
+                                               category=self.pizzas)
+        self.pepperoni = Topping.objects.create(name="Pepperoni", price=1.50, is_meat=True)
+        self.basil = Topping.objects.create(name="Basil", price=0.50, is_vegetarian=True, is_vegan=True)
+        self.olives = Topping.objects.create(name="Olives", price=0.75, is_vegetarian=True, is_vegan=True,
+                                             is_active=False)
+
+    def names(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.json())
+
+    def test_unfiltered_lists_are_unchanged(self):
+        self.assertEqual(self.names(reverse('menu-item-list')), ["Cola", "Hawaii", "Margherita"])
+        self.assertEqual(self.names(reverse('topping-list')), ["Basil", "Olives", "Pepperoni"])
+
+    def test_menu_item_filters(self):
+        url = reverse('menu-item-list')
+        self.assertEqual(self.names(url, {'is_active': 'true'}), ["Cola", "Margherita"])
+        self.assertEqual(self.names(url, {'is_active': 'true', 'is_pizza': 'true'}), ["Margherita"])
+        self.assertEqual(self.names(url, {'category': self.pizzas.id}), ["Hawaii", "Margherita"])
+        self.assertEqual(self.names(url, {'is_active': 'false'}), ["Hawaii"])
+
+    def test_topping_filters(self):
+        url = reverse('topping-list')
+        self.assertEqual(self.names(url, {'is_active': 'true', 'is_vegan': 'true'}), ["Basil"])
+        self.assertEqual(self.names(url, {'is_vegetarian': 'true'}), ["Basil", "Olives"])
+        self.assertEqual(self.names(url, {'is_meat': 'true'}), ["Pepperoni"])
+
+    def test_invalid_filter_returns_400(self):
+        response = self.client.get(reverse('menu-item-list'), {'is_pizza': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('menu-item-list'), {'category': 'pizzas'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_size_paginates_by_id(self):
+        url = reverse('menu-item-list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual([row['id'] for row in page['results']], [self.margherita.id, self.cola.id])
+        self.assertIsNone(page['previous'])
+
+        page = self.client.get(page['next']).json()
+        self.assertEqual([row['id'] for row in page['results']], [self.retired.id])
+        self.assertIsNone(page['next'])
+
+    def test_filtered_page_uses_a_single_query(self):
+        # The ETag's change id is read once per menu version
+        get_menu_sync_version()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('menu-item-list'), {'is_active': 'true', 'page_size': 1})
+        self.assertEqual([row['name'] for row in response.json()['results']], ["Margherita"])
+
+
+@override_settings(MENU_IMAGE_EAGER=True, MENU_IMAGE_VARIANT_SIZES={'thumb': 120, 'small': 320})
+class MenuImageVariantTest(TestCase):
+    def setUp(self):
+        caches['menu-responses'].clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.client = APIClient()
+
+    def upload(self, name, size=(800, 600), mode='RGB'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_item(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item = MenuItem.objects.create(name="Margherita", price=10.99, **kwargs)
+        menu_item.refresh_from_db()
+        return menu_item
+
+    def test_upload_generates_hashed_variants(self):
+        menu_item = self.create_item(image=self.upload('margherita.png'))
+        variants = menu_item.image_variants
+        self.assertEqual(variants['source'], menu_item.image.name)
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (120, 90))
+        self.assertEqual(variants['small']['width'], 320)
+        for name in ('thumb', 'small'):
+            for extension in ('webp', 'jpg'):
+                storage_name = variants[name][extension]
+                pattern = rf'^menu_images/variants/margherita\.{name}\.[0-9a-f]{{16}}\.{extension}$'
+                self.assertRegex(storage_name, pattern)
+                self.assertTrue(default_storage.exists(storage_name))
+        with default_storage.open(variants['thumb']['webp']) as variant:
+            self.assertEqual(Image.open(variant).format, 'WEBP')
+
+    def test_transparent_images_are_flattened(self):
+        menu_item = self.create_item(image=self.upload('logo.png', mode='RGBA'))
+        with default_storage.open(menu_item.image_variants['thumb']['jpg']) as variant:
+            self.assertEqual(Image.open(variant).mode, 'RGB')
+
+    def test_saving_without_image_change_does_not_regenerate(self):
+        menu_item = self.create_item(image=self.upload('margherita.png'))
+        menu_item.price = Decimal('11.99')
+        with patch('menu.signals.schedule_variants') as schedule_variants:
+            menu_item.save()
+        schedule_variants.assert_not_called()
+
+    def test_removing_image_clears_variants(self):
+        menu_item = self.create_item(image=self.upload('margherita.png'))
+        old_variant = menu_item.image_variants['thumb']['webp']
+        menu_item.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.save()
+        menu_item.refresh_from_db()
+        self.assertEqual(menu_item.image_variants, {})
+        self.assertFalse(default_storage.exists(old_variant))
+
+    def test_serializer_exposes_variant_urls(self):
+        self.create_item(image=self.upload('margherita.png'))
+        row = self.client.get(reverse('menu-item-list')).json()[0]
+        thumb = row['image_variants']['thumb']
+        self.assertEqual(thumb['width'], 120)
+        self.assertTrue(thumb['webp'].startswith('http://testserver/media/menu_images/variants/margherita.thumb.'))
+        self.assertTrue(thumb['jpg'].endswith('.jpg'))
+
+    def test_media_cache_headers(self):
+        menu_item = self.create_item(image=self.upload('margherita.png'))
+        factory = RequestFactory()
+
+        variant_path = menu_item.image_variants['thumb']['webp']
+        response = serve_media(factory.get(f'/media/{variant_path}'), variant_path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        response = serve_media(factory.get(f'/media/{menu_item.image.name}'), menu_item.image.name)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class MenuSearchTest(TestCase):
+    def setUp(self):
+        # The index is process-wide; start every test from the rows it creates
+        index_patch = patch.object(search, '_index', None)
+        index_patch.start()
+        self.addCleanup(index_patch.stop)
+        self.client = APIClient()
+        self.url = reverse('menu-search')
+        self.pizzas = Category.objects.create(name="Pizzas")
+        self.margherita = MenuItem.objects.create(name="Margherita", description="Tomato, mozzarella and basil",
+                                                  price=10.99, is_pizza=True, category=self.pizzas)
+        self.pepperoni_pizza = MenuItem.objects.create(name="Pepperoni Pizza", price=12.99, is_pizza=True,
+                                                       category=self.pizzas)
+        self.pepperoni = Topping.objects.create(name="Pepperoni", price=1.50, is_meat=True)
+        Topping.objects.create(name="Anchovies", price=1.50, is_active=False)
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['type'], row['id']) for row in response.json()['results']]
+
+    def test_exact_and_prefix_matches(self):
+        self.assertEqual(self.search("margherita"), [('menu_item', self.margherita.id)])
+        self.assertEqual(self.search("marg"), [('menu_item', self.margherita.id)])
+        self.assertEqual(set(self.search("pep")), {('menu_item', self.pepperoni_pizza.id),
+                                                  ('topping', self.pepperoni.id)})
+        self.assertEqual(set(self.search("Pizz")), {('category', self.pizzas.id),
+                                                   ('menu_item', self.pepperoni_pizza.id)})
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.search("pepperoni piz"), [('menu_item', self.pepperoni_pizza.id)])
+        self.assertEqual(self.search("pepperoni basil"), [])
+
+    def test_typos_match(self):
+        self.assertEqual(self.search("margarita"), [('menu_item', self.margherita.id)])
+        self.assertIn(('topping', self.pepperoni.id), self.search("peperoni"))
+
+    def test_names_rank_above_descriptions(self):
+        MenuItem.objects.create(name="Caprese Salad", description="Basil and tomato", price=7.50)
+        basil = Topping.objects.create(name="Basil", price=0.50)
+        self.assertEqual(self.search("basil")[0], ('topping', basil.id))
+
+    def test_inactive_rows_are_not_found(self):
+        self.assertEqual(self.search("anchovies"), [])
+
+    def test_index_follows_committed_changes(self):
+        self.assertEqual(self.search("calzone"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            calzone = MenuItem.objects.create(name="Calzone", price=11.50)
+        self.assertEqual(self.search("calzone"), [('menu_item', calzone.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.margherita.is_active = False
+            self.margherita.save()
+        self.assertEqual(self.search("margherita"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pepperoni.delete()
+        self.assertEqual(self.search("pepperoni"), [('menu_item', self.pepperoni_pizza.id)])
+
+    def test_index_reloads_after_changes_from_other_processes(self):
+        self.search("margherita")
+        MenuItem.objects.filter(pk=self.margherita.pk).update(name="Marinara")
+        # Another process bumping the shared version
+        cache.incr(MENU_VERSION_CACHE_KEY)
+        self.assertEqual(self.search("marinara"), [('menu_item', self.margherita.id)])
+
+    def test_query_is_validated(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'pizza', 'limit': 0}).status_code, 400)
+        self.assertEqual(len(self.search("p", limit=1)), 1)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class MenuSnapshotTest(TestCase):
+    def setUp(self):
+        for module, name in ((search, '_index'), (catalog, '_catalog')):
+            state_patch = patch.object(module, name, None)
+            state_patch.start()
+            self.addCleanup(state_patch.stop)
+        self.category = Category.objects.create(name="Pizzas")
+        self.margherita = MenuItem.objects.create(name="Margherita", price=10.99, is_pizza=True,
+                                                  category=self.category)
+        PizzaSize.objects.create(name="Medium", diameter=12.0, base_price=15.00)
+        CrustType.objects.create(name="Thin Crust", price=2.50)
+        Sauce.objects.create(name="Tomato Sauce", price=1.00)
+        Cheese.objects.create(name="Mozzarella", price=2.00)
+        self.topping = Topping.objects.create(name="Pepperoni", price=1.50, is_meat=True)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f'{directory}/menu.jsonl'
+
+    def dump(self):
+        call_command('dump_menu', output=self.path, stderr=StringIO())
+
+    def load(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_menu', self.path, stdout=StringIO())
+
+    def test_dump_writes_one_line_per_row(self):
+        out = StringIO()
+        call_command('dump_menu', stdout=out, stderr=StringIO())
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[0]['model'], 'menu.category')
+        self.assertEqual(lines[1]['fields']['category'], self.category.id)
+
+    def test_load_upserts_rows(self):
+        self.dump()
+        self.margherita.price = Decimal('99.00')
+        self.margherita.save()
+        topping_id = self.topping.pk
+        self.topping.delete()
+        extra = Topping.objects.create(name="Olives", price=0.75)
+
+        self.load()
+        self.margherita.refresh_from_db()
+        self.assertEqual(self.margherita.price, Decimal('10.99'))
+        self.assertEqual(Topping.objects.get(pk=topping_id).name, "Pepperoni")
+        # Rows missing from the snapshot are kept
+        self.assertTrue(Topping.objects.filter(pk=extra.pk).exists())
+        self.assertEqual(MenuItem.objects.count(), 1)
+
+    def test_load_uses_bulk_statements(self):
+        self.dump()
+        for model in (Topping, Cheese, Sauce, CrustType, PizzaSize, MenuItem, Category):
+            model.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.load()
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        # One upsert per model, and one insert per model into the change log
+        self.assertEqual(len(inserts), 14)
+        self.assertEqual(MenuItem.objects.get().category_id, self.category.id)
+
+    def test_load_invalidates_menu_caches(self):
+        self.dump()
+        version = get_menu_version()
+        self.load()
+        self.assertGreater(get_menu_version(), version)
+
+    def test_load_reports_unreadable_snapshots(self):
+        with self.assertRaises(CommandError):
+            call_command('load_menu', f'{self.path}.missing', stdout=StringIO())
+
+    def test_warm_start_fills_caches_without_queries(self):
+        self.dump()
+        self.load()
+        catalog.set_catalog(None)
+        search.set_search_index(None)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(warm_from_snapshot(self.path))
+            self.assertEqual(get_catalog().get(Topping, self.topping.pk).name, "Pepperoni")
+            results = search.get_search_index().search("marg")
+            self.assertEqual([(document.type, document.id) for document, score in results],
+                             [('menu_item', self.margherita.id)])
+            response = APIClient().get(reverse('menu-full'))
+        self.assertEqual(response.json()['toppings'][0]['name'], "Pepperoni")
+
+    def test_warm_start_ignores_outdated_snapshots(self):
+        self.dump()
+        self.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topping.price = Decimal('1.75')
+            self.topping.save()
+        self.assertFalse(warm_from_snapshot(self.path))
+        with self.assertLogs('menu.snapshot', 'WARNING'):
+            self.assertFalse(warm_from_snapshot(f'{self.path}.missing'))
+
+    def test_warm_start_checks_marker_before_database(self):
+        self.dump()
+        with self.assertNumQueries(0):
+            self.assertFalse(warm_from_snapshot(self.path))
+
+        self.load()
+        with patch('menu.snapshot.get_menu_version', side_effect=DatabaseError("no such table: menu_menuchange")):
+            with self.assertLogs('menu.snapshot', 'WARNING'):
+                self.assertFalse(warm_from_snapshot(self.path))
+
+    def test_warm_start_runs_on_first_request(self):
+        self.dump()
+        self.load()
+        catalog.set_catalog(None)
+        search.set_search_index(None)
+        request_started.connect(warm_on_first_request, dispatch_uid=WARM_START_DISPATCH_UID)
+        self.addCleanup(request_started.disconnect, dispatch_uid=WARM_START_DISPATCH_UID)
+
+        with override_settings(MENU_SNAPSHOT_WARM_START=self.path), self.assertNumQueries(0):
+            response = APIClient().get(reverse('menu-full'))
+        self.assertEqual(response.json()['toppings'][0]['name'], "Pepperoni")
+        self.assertFalse(request_started.disconnect(dispatch_uid=WARM_START_DISPATCH_UID))
+
+
+class MenuChangesTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('menu-changes')
+        self.category = Category.objects.create(name="Pizzas")
+        self.pizza = MenuItem.objects.create(name="Margherita", price=Decimal('9.99'), category=self.category)
+        self.topping = Topping.objects.create(name="Pepperoni", price=Decimal('1.50'))
+
+    def sync(self, since):
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sync_from_zero_returns_whole_menu(self):
+        body = self.sync(0)
+        self.assertEqual(body['version'], get_sync_version())
+        self.assertFalse(body['reset'])
+        self.assertEqual([row['name'] for row in body['changes']['menu_items']], ["Margherita"])
+        self.assertEqual([row['id'] for row in body['changes']['categories']], [self.category.id])
+        self.assertEqual(body['deleted'], {})
+
+    def test_sync_returns_only_changes_and_tombstones(self):
+        version = self.sync(0)['version']
+        self.assertEqual(self.sync(version), {'version': version, 'reset': False, 'changes': {}, 'deleted': {}})
+
+        self.pizza.price = Decimal('10.99')
+        self.pizza.save()
+        topping_id = self.topping.id
+        self.topping.delete()
+        body = self.sync(version)
+        self.assertGreater(body['version'], version)
+        self.assertEqual(list(body['changes']), ['menu_items'])
+        self.assertEqual(body['changes']['menu_items'][0]['price'], "10.99")
+        self.assertEqual(body['deleted'], {'toppings': [topping_id]})
+
+    def test_row_changed_then_deleted_is_only_a_tombstone(self):
+        version = self.sync(0)['version']
+        self.pizza.name = "Marinara"
+        self.pizza.save()
+        pizza_id = self.pizza.id
+        self.pizza.delete()
+        body = self.sync(version)
+        self.assertEqual(body['changes'], {})
+        self.assertEqual(body['deleted'], {'menu_items': [pizza_id]})
+
+    def test_updates_without_signals_are_logged(self):
+        version = self.sync(0)['version']
+        # Deleting a category nulls the category of its items without MenuItem signals
+        self.category.delete()
+        body = self.sync(version)
+        self.assertIsNone(body['changes']['menu_items'][0]['category'])
+        self.pizza.refresh_from_db()
+        self.assertGreater(self.pizza.updated_at, self.topping.updated_at)
+
+    def test_unknown_version_resets(self):
+        body = self.sync(get_sync_version() + 100)
+        self.assertTrue(body['reset'])
+        self.assertEqual(len(body['changes']['menu_items']), 1)
+
+    def test_invalid_since_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'since': -1}).status_code, 400)
+
+    def test_compaction_keeps_latest_change_of_every_row(self):
+        version = self.sync(0)['version']
+        for price in ('10.99', '11.99'):
+            self.pizza.price = Decimal(price)
+            self.pizza.save()
+        before = self.sync(version)
+        self.assertGreater(compact_changes(), 0)
+        self.assertEqual(MenuChange.objects.filter(section='menu_items', object_id=self.pizza.id).count(), 1)
+        self.assertEqual(self.sync(version), before)
+        self.assertEqual(self.sync(0)['version'], before['version'])
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import CategoryListView, MenuItemListView, PizzaSizeListView, CrustTypeListView, SauceListView, \
-    CheeseListView, ToppingListView
+    CheeseListView, ToppingListView, FullMenuView, MenuResponseCacheMetricsView, MenuSearchView, MenuChangesView
 
 router = DefaultRouter()
 
@@ -13,5 +13,9 @@ urlpatterns = [
     path('sauces/', SauceListView.as_view(), name='sauce-list'),
     path('cheeses/', CheeseListView.as_view(), name='cheese-list'),
     path('toppings/', ToppingListView.as_view(), name='topping-list'),
+    path('full/', FullMenuView.as_view(), name='menu-full'),
+    path('changes/', MenuChangesView.as_view(), name='menu-changes'),
+    path('search/', MenuSearchView.as_view(), name='menu-search'),
+    path('cache-metrics/', MenuResponseCacheMetricsView.as_view(), name='menu-response-cache-metrics'),
     path('', include(router.urls)),
 ]
@@ -1,46 +1,288 @@
+import hashlib
+import threading
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, urlencode
 from rest_framework import generics, permissions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from pizza_api.permissions import IsStaffOrMetricsScraper
+from .catalog import get_menu_version, get_menu_last_modified, get_menu_sync_version
+from .changes import get_changes, get_sync_version
+from .pagination import MenuCursorPagination
+from .response_cache import response_cache
+from .search import get_search_index
 from .models import Category, MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
 from .serializers import CategorySerializer, MenuItemSerializer, PizzaSizeSerializer, CrustTypeSerializer, \
-    SauceSerializer, CheeseSerializer, ToppingSerializer
+    SauceSerializer, CheeseSerializer, ToppingSerializer, MenuItemFilterSerializer, ToppingFilterSerializer, \
+    MenuSearchQuerySerializer, MenuChangesQuerySerializer
+
+
+class MenuConditionalMixin:
+    """
+    Adds a strong ETag derived from the latest menu change id and a Last-Modified header, and answers matching
+    If-None-Match / If-Modified-Since requests with 304 Not Modified before touching the database. The change id
+    is read once per menu version, and is the same in every process and across restarts.
+    """
+
+    def get_etag(self, request):
+        # The representation depends on the path, the query string and the negotiated format
+        variant = f'{request.get_full_path()}|{request.accepted_renderer.format}'
+        return f'"{get_menu_sync_version()}-{hashlib.sha256(variant.encode("utf-8")).hexdigest()[:16]}"'
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = get_menu_last_modified()
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.render_menu(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def render_menu(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+
+class MenuResponseCacheMixin:
+    """
+    Serves JSON list responses from the menu response cache, keyed by view, path and query parameters.
+
+    `cache_models` lists every model the rendered rows depend on; a save or delete of any of them retires the
+    cached responses of the view. Only the filter and pagination parameters the view reads are part of the key,
+    in a canonical order; requests with other parameters, and other renderers such as the browsable API, are not
+    cached, so clients cannot fill the cache with arbitrary query strings.
+    """
+    cache_models = ()
+
+    def get_cache_query_params(self):
+        params = set()
+        filter_serializer_class = getattr(self, 'filter_serializer_class', None)
+        if filter_serializer_class is not None:
+            params.update(filter_serializer_class().fields)
+        for attribute in ('cursor_query_param', 'page_size_query_param'):
+            param = getattr(self.paginator, attribute, None)
+            if param:
+                params.add(param)
+        return params
+
+    def get_cache_path(self, request):
+        """
+        Return the path with its query parameters in a canonical order, or None if a parameter is not cacheable.
+        """
+        params = request.query_params
+        if not set(params) <= self.get_cache_query_params():
+            return None
+        query = urlencode(sorted((name, value) for name in params for value in params.getlist(name)))
+        return f'{request.path}?{query}' if query else request.path
 
+    def render_menu(self, request, *args, **kwargs):
+        path = self.get_cache_path(request)
+        if path is None or not isinstance(request.accepted_renderer, JSONRenderer):
+            return super().render_menu(request, *args, **kwargs)
 
-class CategoryListView(generics.ListAPIView):
+        view_name = type(self).__name__
+        key = response_cache.make_key(view_name, path, self.cache_models)
+        content = response_cache.get(view_name, key)
+        if content is None:
+            response = super().render_menu(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type, self.get_renderer_context()
+            )
+            response_cache.set(key, content)
+        return HttpResponse(content, content_type=request.accepted_renderer.media_type)
+
+
+class MenuFilterMixin:
+    """
+    Filters a menu list by the query parameters declared on `filter_serializer_class`, whose validated data are
+    field lookups on the model.
+    """
+    filter_serializer_class = None
+
+    def filter_queryset(self, queryset):
+        # A plain dict, because BooleanField reads a parameter missing from a QueryDict as False
+        filters = self.filter_serializer_class(data=self.request.query_params.dict())
+        filters.is_valid(raise_exception=True)
+        return queryset.filter(**filters.validated_data)
+
+
+class CategoryListView(MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Category,)
 
 
-class MenuItemListView(generics.ListAPIView):
+class MenuItemListView(MenuFilterMixin, MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.AllowAny]
+    filter_serializer_class = MenuItemFilterSerializer
+    pagination_class = MenuCursorPagination
+    # Deleting a category nulls the category of its items with an UPDATE that sends no MenuItem signals
+    cache_models = (MenuItem, Category)
 
 
-class PizzaSizeListView(generics.ListAPIView):
+class PizzaSizeListView(MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = PizzaSize.objects.all()
     serializer_class = PizzaSizeSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (PizzaSize,)
 
 
-class CrustTypeListView(generics.ListAPIView):
+class CrustTypeListView(MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = CrustType.objects.all()
     serializer_class = CrustTypeSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (CrustType,)
 
 
-class SauceListView(generics.ListAPIView):
+class SauceListView(MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = Sauce.objects.all()
     serializer_class = SauceSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Sauce,)
 
 
-class CheeseListView(generics.ListAPIView):
+class CheeseListView(MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = Cheese.objects.all()
     serializer_class = CheeseSerializer
     permission_classes = [permissions.AllowAny]
+    cache_models = (Cheese,)
 
 
-class ToppingListView(generics.ListAPIView):
+class ToppingListView(MenuFilterMixin, MenuResponseCacheMixin, MenuConditionalMixin, generics.ListAPIView):
     queryset = Topping.objects.all()
     serializer_class = ToppingSerializer
     permission_classes = [permissions.AllowAny]
+    filter_serializer_class = ToppingFilterSerializer
+    pagination_class = MenuCursorPagination
+    cache_models = (Topping,)
+
+
+# Sections of the aggregated menu document, in the order they are rendered
+FULL_MENU_SECTIONS = (
+    ('categories', Category, CategorySerializer),
+    ('menu_items', MenuItem, MenuItemSerializer),
+    ('pizza_sizes', PizzaSize, PizzaSizeSerializer),
+    ('crust_types', CrustType, CrustTypeSerializer),
+    ('sauces', Sauce, SauceSerializer),
+    ('cheeses', Cheese, CheeseSerializer),
+    ('toppings', Topping, ToppingSerializer),
+)
+
+_full_menu = (None, b'')
+_full_menu_lock = threading.Lock()
+
+
+def render_full_menu(rows=None):
+    """
+    Return the whole menu as a JSON document, rendered once per menu version and kept as bytes.
+
+    Its `version` is the latest menu change id, which clients pass as `since` to the change feed. It is read before
+    the rows, so a change made during the render is listed by the feed again rather than missed.
+
+    `rows` ({model: {pk: instance}}) renders instances already in memory instead of querying the tables.
+    """
+    global _full_menu
+    version = get_menu_version()
+    rendered_version, content = _full_menu
+    if rendered_version != version:
+        with _full_menu_lock:
+            rendered_version, content = _full_menu
+            if rendered_version != version:
+                document = {'version': get_menu_sync_version()}
+                for name, model, serializer_class in FULL_MENU_SECTIONS:
+                    instances = model.objects.all() if rows is None else list(rows[model].values())
+                    document[name] = serializer_class(instances, many=True).data
+                content = JSONRenderer().render(document)
+                _full_menu = (version, content)
+    return content
+
+
+class FullMenuView(MenuConditionalMixin, APIView):
+    permission_classes = [permissions.AllowAny]
+    renderer_classes = [JSONRenderer]
+
+    def render_menu(self, request, *args, **kwargs):
+        return HttpResponse(render_full_menu(), content_type='application/json')
+
+
+class MenuChangesView(APIView):
+    """
+    Lists the menu rows changed since a menu version, so clients keeping a copy of the menu sync only the difference.
+
+    `version` is the version to pass as `since` next time; `since=0` returns the whole menu. Changed rows are
+    listed in full per section, deleted rows as primary keys under `deleted`. `reset` is true when `since` is not
+    a version of this server's log, in which case the response holds the whole menu and the client must drop rows
+    it does not list.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        query = MenuChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data['since']
+        version, changed, removed = get_changes(since)
+        reset = version == since and since > get_sync_version()
+        if reset:
+            version, changed, removed = get_changes(0)
+
+        document = {'version': version, 'reset': reset, 'changes': {}, 'deleted': {}}
+        for name, model, serializer_class in FULL_MENU_SECTIONS:
+            if model in changed:
+                rows = model.objects.in_bulk(changed[model])
+                instances = [rows[pk] for pk in sorted(rows)]
+                document['changes'][name] = serializer_class(instances, many=True, context={'request': request}).data
+            if model in removed:
+                document['deleted'][name] = sorted(removed[model])
+        return Response(document)
+
+
+class MenuSearchView(APIView):
+    """
+    Searches active menu items, toppings and categories by name, and menu items by description.
+
+    Every word of `q` must match a word of the result exactly, as its beginning, or with a small typo.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        query = MenuSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        results = get_search_index().search(query.validated_data['q'], limit=query.validated_data['limit'])
+        return Response({
+            'query': query.validated_data['q'],
+            'results': [
+                {'type': document.type, 'id': document.id, 'name': document.name, 'score': round(score, 3)}
+                for document, score in results
+            ],
+        })
+
+
+class MenuResponseCacheMetricsView(APIView):
+    """
+    Hit and miss counters of the menu response cache in the Prometheus text format.
+
+    The counters belong to the process answering the request. Staff users and scrapers sending METRICS_TOKEN may
+    read them.
+    """
+    permission_classes = [IsStaffOrMetricsScraper]
+
+    def get(self, request, *args, **kwargs):
+        counters = response_cache.counters()
+        lines = []
+        for outcome, description in (('hits', 'found in'), ('misses', 'rendered and stored in')):
+            metric = f'menu_response_cache_{outcome}_total'
+            lines.append(f'# HELP {metric} Menu list responses {description} the response cache.')
+            lines.append(f'# TYPE {metric} counter')
+            for (view_name, counted), value in sorted(counters.items()):
+                if counted == outcome:
+                    lines.append(f'{metric}{{view="{view_name}"}} {value}')
+        return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,3 +1,105 @@
 from django.contrib import admin
+from django.db.models import Prefetch
+from pizza_api.admin import CachedChoicesMixin, LargeTableAdmin
+from .models import Order, OrderItem, OrderItemPizza, OrderItemPizzaTopping
 
-# Register your models here.
+
+class OrderItemInline(admin.TabularInline):
+    """
+    The items of an order, read-only: their prices were set by the pricing engine when the order was placed.
+
+    Django cannot nest inlines, so each row summarizes its pizza and links to the item's own change page, where
+    the pizza and its toppings are edited.
+    """
+    model = OrderItem
+    fields = ['menu_item', 'quantity', 'unit_price', 'total_price', 'pizza_summary', 'instructions']
+    readonly_fields = ['menu_item', 'quantity', 'unit_price', 'total_price', 'pizza_summary', 'instructions']
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def get_queryset(self, request):
+        # Three queries for any number of items: items with their menu item and pizza, and pizza toppings
+        return super().get_queryset(request).select_related(
+            'menu_item', 'pizza__size', 'pizza__crust_type', 'pizza__sauce', 'pizza__cheese',
+        ).prefetch_related(
+            Prefetch('pizza__toppings', queryset=OrderItemPizzaTopping.objects.select_related('topping')),
+        )
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Pizza')
+    def pizza_summary(self, obj):
+        try:
+            pizza = obj.pizza
+        except OrderItemPizza.DoesNotExist:
+            return '-'
+        parts = [str(part) for part in (pizza.size, pizza.crust_type, pizza.sauce, pizza.cheese) if part]
+        parts += [f"{topping.topping.name} ({topping.portion}, {topping.side})" for topping in pizza.toppings.all()]
+        return ', '.join(parts)
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+    list_display = ['id', 'customer', 'order_datetime', 'status', 'netto_total', 'driver']
+    list_select_related = ['customer', 'driver']
+    list_filter = ['status']
+    date_hierarchy = 'order_datetime'
+    search_fields = ['^customer__username']
+    search_id_fields = ['id']
+    # Customers and addresses are too many for a select box or a search; coupons and drivers are searchable
+    raw_id_fields = ['customer', 'delivery_address']
+    autocomplete_fields = ['coupon', 'driver']
+    readonly_fields = ['order_datetime', 'total_amount', 'discount_amount', 'tax_amount', 'netto_total']
+    fieldsets = (
+        (None, {
+            'fields': ('customer', 'order_datetime', 'status', 'delivery_address', 'driver', 'estimated_delivery_time')
+        }),
+        ('Amounts', {
+            'fields': ('coupon', 'total_amount', 'discount_amount', 'tax_amount', 'netto_total')
+        }),
+    )
+    inlines = [OrderItemInline]
+
+    def has_add_permission(self, request):
+        # Orders are placed through the API, which prices them
+        return False
+
+
+class OrderItemPizzaInline(CachedChoicesMixin, admin.StackedInline):
+    model = OrderItemPizza
+    cached_choice_fields = ['size', 'crust_type', 'sauce', 'cheese']
+    show_change_link = True
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ['id', 'order', 'menu_item', 'quantity', 'total_price', 'is_pizza']
+    # Order.__str__ renders the customer's username
+    list_select_related = ['order__customer', 'menu_item']
+    list_filter = ['is_pizza']
+    search_fields = ['^order__customer__username']
+    search_id_fields = ['order_id']
+    raw_id_fields = ['order', 'menu_item']
+    inlines = [OrderItemPizzaInline]
+
+
+class OrderItemPizzaToppingInline(CachedChoicesMixin, admin.TabularInline):
+    model = OrderItemPizzaTopping
+    cached_choice_fields = ['topping']
+    extra = 0
+
+    def get_queryset(self, request):
+        # OrderItemPizzaTopping.__str__, shown on every row, renders the topping's name
+        return super().get_queryset(request).select_related('topping')
+
+
+@admin.register(OrderItemPizza)
+class OrderItemPizzaAdmin(CachedChoicesMixin, LargeTableAdmin):
+    list_display = ['id', 'order_item', 'size', 'crust_type', 'sauce', 'cheese']
+    list_select_related = ['order_item', 'size', 'crust_type', 'sauce', 'cheese']
+    search_id_fields = ['order_item__order_id']
+    raw_id_fields = ['order_item']
+    cached_choice_fields = ['size', 'crust_type', 'sauce', 'cheese']
+    inlines = [OrderItemPizzaToppingInline]
@@ -0,0 +1,98 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.utils import OperationalError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from menu.models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = ("Benchmark concurrent writers against POST /api/v1/orders/ on the configured database. "
+            "Run it with and without SQLITE_PERFORMANCE=1 against the same SQLITE_PATH to compare.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Number of concurrent writer threads.")
+        parser.add_argument('--orders', type=int, default=50, help="Orders posted by each writer.")
+
+    def handle(self, *args, **options):
+        # Rows created for the run, deleted by primary key afterwards so that no other row is touched
+        self.menu_rows = []
+        self.user = User.objects.create_user(username=f"benchmark-{time.time_ns()}")
+        try:
+            self.run(options)
+        finally:
+            self.clean_up()
+
+    def create(self, model, **fields):
+        row = model.objects.create(**fields)
+        self.menu_rows.append(row)
+        return row
+
+    def run(self, options):
+        user = self.user
+        menu_item = self.create(MenuItem, name="Benchmark pizza", price=Decimal('20.00'))
+        pizza = {
+            "size": self.create(PizzaSize, name="Benchmark", diameter=12, base_price=Decimal('2.00')).id,
+            "crust_type": self.create(CrustType, name="Benchmark", price=Decimal('1.00')).id,
+            "sauce": self.create(Sauce, name="Benchmark", price=Decimal('0.50')).id,
+            "cheese": self.create(Cheese, name="Benchmark", price=Decimal('1.50')).id,
+            "toppings": [
+                {"topping": self.create(Topping, name=f"Benchmark {index}", price=Decimal('1.25')).id,
+                 "portion": "Normal", "side": "Whole"}
+                for index in range(3)
+            ],
+        }
+        payload = {
+            "customer": user.id,
+            "items": [{"menu_item": menu_item.id, "quantity": 1, "is_pizza": True, "pizza": pizza}] * 3,
+        }
+
+        created = []
+        failed = []
+        latencies = []
+        barrier = threading.Barrier(options['writers'])
+
+        def writer():
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(user=user)
+            try:
+                barrier.wait()
+                for _ in range(options['orders']):
+                    started = time.perf_counter()
+                    try:
+                        response = client.post(reverse('order-list'), payload, format='json')
+                        (created if response.status_code == 201 else failed).append(response.status_code)
+                    except OperationalError as exc:
+                        failed.append(str(exc))
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        self.stdout.write(f"database: {connection.settings_dict['NAME']} {connection.settings_dict['OPTIONS']}")
+        self.stdout.write(f"writers: {options['writers']}, orders attempted: {len(latencies)}")
+        self.stdout.write(f"created: {len(created)}, failed: {len(failed)}")
+        self.stdout.write(f"throughput: {len(created) / elapsed:.1f} orders/s")
+        self.stdout.write(f"latency p50: {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+                          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+
+    def clean_up(self):
+        Order.objects.filter(customer=self.user).delete()
+        self.user.delete()
+        for row in reversed(self.menu_rows):
+            row.delete()
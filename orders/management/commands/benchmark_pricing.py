@@ -0,0 +1,85 @@
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from menu.models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from orders.pricing import price_items
+
+
+def legacy_price_items(items):
+    """
+    The per-topping Decimal loop that priced order items before orders.pricing.
+    """
+    lines = []
+    total_amount = Decimal(0.0)
+    for item in items:
+        unit_price = item['menu_item'].price
+        pizza = item.get('pizza')
+        if item.get('is_pizza') and pizza:
+            unit_price += (pizza['size'].base_price + pizza['crust_type'].price + pizza['sauce'].price +
+                           pizza['cheese'].price)
+            for topping_data in pizza.get('toppings', []):
+                topping = topping_data['topping']
+                portion = topping_data.get('portion', 'Normal')
+                unit_price += topping.price * Decimal(1.5) if portion == 'Extra' else topping.price
+        total_price = unit_price * item.get('quantity', 1)
+        lines.append((unit_price, total_price))
+        total_amount += total_price
+    return lines, total_amount
+
+
+def synthetic_cart(lines, rng):
+    """
+    Build a cart of validated order items from unsaved menu rows; three out of four lines are pizzas.
+    """
+    def price():
+        return Decimal(rng.randint(50, 2500)) / 100
+
+    menu_items = [MenuItem(pk=pk, price=price()) for pk in range(1, 21)]
+    sizes = [PizzaSize(pk=pk, base_price=price()) for pk in range(1, 5)]
+    crust_types = [CrustType(pk=pk, price=price()) for pk in range(1, 5)]
+    sauces = [Sauce(pk=pk, price=price()) for pk in range(1, 5)]
+    cheeses = [Cheese(pk=pk, price=price()) for pk in range(1, 5)]
+    toppings = [Topping(pk=pk, price=price()) for pk in range(1, 41)]
+
+    items = []
+    for index in range(lines):
+        item = {'menu_item': rng.choice(menu_items), 'quantity': rng.randint(1, 4), 'is_pizza': index % 4 != 3}
+        if item['is_pizza']:
+            item['pizza'] = {
+                'size': rng.choice(sizes),
+                'crust_type': rng.choice(crust_types),
+                'sauce': rng.choice(sauces),
+                'cheese': rng.choice(cheeses),
+                'toppings': [
+                    {'topping': topping, 'portion': rng.choice(['Normal', 'Extra']),
+                     'side': rng.choice(['Whole', 'Left Half', 'Right Half'])}
+                    for topping in rng.sample(toppings, rng.randint(0, 6))
+                ],
+            }
+        items.append(item)
+    return items
+
+
+class Command(BaseCommand):
+    help = "Benchmark cart pricing with orders.pricing against the per-topping Decimal loop it replaced."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 1000],
+                            help="Numbers of line items per cart.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'lines':>6} {'legacy (us)':>12} {'pricing (us)':>13} {'per line (us)':>14}")
+        for lines in options['sizes']:
+            items = synthetic_cart(lines, rng)
+            if price_items(items) != legacy_price_items(items):
+                raise AssertionError(f"Pricing mismatch for a {lines}-line cart.")
+
+            number = max(1, 20000 // lines)
+            legacy = min(timeit.repeat(lambda: legacy_price_items(items), number=number, repeat=5)) / number
+            pricing = min(timeit.repeat(lambda: price_items(items), number=number, repeat=5)) / number
+            self.stdout.write(f"{lines:>6} {legacy * 1e6:>12.2f} {pricing * 1e6:>13.2f} {pricing / lines * 1e6:>14.2f}")
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("coupons", "0002_alter_coupon_expiration_date"),
+        ("delivery", "0001_initial"),
+        ("orders", "0004_rename_grand_total_order_netto_total"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["customer", "order_datetime"],
+                name="order_customer_datetime_idx",
+            ),
+        ),
+    ]
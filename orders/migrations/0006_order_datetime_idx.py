@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 05:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_admin_search_indexes"),
+        ("coupons", "0003_admin_search_indexes"),
+        ("delivery", "0001_initial"),
+        ("orders", "0005_order_customer_datetime_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["order_datetime"], name="order_datetime_idx"),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 06:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("coupons", "0003_admin_search_indexes"),
+        ("orders", "0006_order_datetime_idx"),
+    ]
+
+    # Existing orders keep redeemed_coupon empty: their coupon uses were never counted in used_count, so removing
+    # the coupon must not give one back
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="redeemed_coupon",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="coupons.coupon",
+            ),
+        ),
+    ]
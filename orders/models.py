@@ -1,5 +1,5 @@
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 from accounts.models import Address
@@ -18,12 +18,27 @@ ORDER_STATUS_CHOICES = (
 )
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_details(self):
+        """
+        Prefetch the items, pizzas and toppings rendered by OrderSerializer in a fixed number of queries.
+        """
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=OrderItem.objects.select_related('pizza')),
+            'items__pizza__toppings',
+        )
+
+
 class Order(models.Model):
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     order_datetime = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES, default='Pending')
     delivery_address = models.ForeignKey(Address, on_delete=models.SET_NULL, null=True, blank=True)
     coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True)
+    # The coupon a use was redeemed of for this order, which removing the coupon gives back. A coupon assigned
+    # without redeeming it, e.g. in the admin, leaves it empty, as do orders placed before uses were counted.
+    redeemed_coupon = models.ForeignKey(Coupon, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+                                        related_name='+')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.00)])
     discount_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, validators=[MinValueValidator(0.00)])
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, validators=[MinValueValidator(0.00)])
@@ -31,20 +46,51 @@ class Order(models.Model):
     driver = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True, blank=True)
     estimated_delivery_time = models.DateTimeField(null=True, blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Serves the customer's order history, newest first
+            models.Index(fields=['customer', 'order_datetime'], name='order_customer_datetime_idx'),
+            # Serves the admin's date hierarchy and its drill-down by year, month and day
+            models.Index(fields=['order_datetime'], name='order_datetime_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.customer.username}"
 
     def apply_coupon(self):
-        if self.coupon and self.coupon.is_valid():
+        """
+        Redeem the order's coupon and apply its discount.
+
+        Returns:
+        bool: True if the coupon was redeemed and applied.
+        """
+        if not (self.coupon and self.coupon.is_valid()):
+            return False
+        with transaction.atomic():
+            if not self.coupon.redeem():
+                return False
+            self.redeemed_coupon = self.coupon
             discount = self.coupon.apply_discount(self.total_amount)
             self.discount_amount = discount
             self.netto_total, self.tax_amount = calculate_net_and_tax(self.total_amount - discount)
             self.save()
+        return True
 
     def unapply_coupon(self):
-        self.discount_amount = 0.00
-        self.netto_total, self.tax_amount = calculate_net_and_tax(self.total_amount)
-        self.save()
+        """
+        Remove the order's coupon and its discount, giving back the use redeemed for the order, if any.
+        """
+        with transaction.atomic():
+            if self.redeemed_coupon_id:
+                redeemed = self.coupon if self.coupon_id == self.redeemed_coupon_id else self.redeemed_coupon
+                redeemed.release()
+                self.redeemed_coupon = None
+            self.coupon = None
+            self.discount_amount = 0.00
+            self.netto_total, self.tax_amount = calculate_net_and_tax(self.total_amount)
+            self.save()
 
     def total_price_with_discount(self):
         return self.total_amount - self.discount_amount
@@ -60,7 +106,7 @@ class OrderItem(models.Model):
     instructions = models.TextField(blank=True)
 
     def __str__(self):
-        return f"Item #{self.id} of Order #{self.order.id}"
+        return f"Item #{self.id} of Order #{self.order_id}"
 
 
 class OrderItemPizza(models.Model):
@@ -72,7 +118,7 @@ class OrderItemPizza(models.Model):
     instructions = models.TextField(blank=True)
 
     def __str__(self):
-        return f"Pizza for Item #{self.order_item.id}"
+        return f"Pizza for Item #{self.order_item_id}"
 
 
 class OrderItemPizzaTopping(models.Model):
@@ -83,4 +129,4 @@ class OrderItemPizzaTopping(models.Model):
                             choices=[('Whole', 'Whole'), ('Left Half', 'Left Half'), ('Right Half', 'Right Half')])
 
     def __str__(self):
-        return f"{self.topping.name} on {self.side} of Pizza #{self.order_item_pizza.id}"
+        return f"{self.topping.name} on {self.side} of Pizza #{self.order_item_pizza_id}"
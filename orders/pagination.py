@@ -0,0 +1,115 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class OrderCursorPagination(BasePagination):
+    """
+    Keyset pagination over (order_datetime, id), newest first.
+
+    Each page is read with a single range condition on the ordering columns, so the cost of a page does not depend
+    on how deep into the order history it is.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'ORDER_LIST_PAGE_SIZE', 20)
+        max_page_size = getattr(settings, 'ORDER_LIST_MAX_PAGE_SIZE', 100)
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True, cutoff=max_page_size)
+        except (KeyError, ValueError):
+            return page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by('-order_datetime', '-id')
+        if self.cursor is not None:
+            reverse, order_datetime, pk = self.cursor
+            if reverse:
+                condition = Q(order_datetime__gt=order_datetime) | Q(order_datetime=order_datetime, id__gt=pk)
+                queryset = queryset.filter(condition).order_by('order_datetime', 'id')
+            else:
+                condition = Q(order_datetime__lt=order_datetime) | Q(order_datetime=order_datetime, id__lt=pk)
+                queryset = queryset.filter(condition)
+
+        # Fetch one extra row to find out whether there is another page in the direction of travel
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        reverse = self.cursor is not None and self.cursor[0]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            last = self.page[-1]
+            return self.encode_cursor(False, last.order_datetime, last.pk)
+        # An empty page reached by going backwards starts right before its own cursor
+        return self.encode_cursor(False, self.cursor[1], self.cursor[2] + 1)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            first = self.page[0]
+            return self.encode_cursor(True, first.order_datetime, first.pk)
+        return self.encode_cursor(True, self.cursor[1], self.cursor[2] - 1)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens['r'][0]))
+            order_datetime = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+        except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if order_datetime is None:
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, order_datetime, pk
+
+    def encode_cursor(self, reverse, order_datetime, pk):
+        querystring = parse.urlencode({'r': int(reverse), 't': order_datetime.isoformat(), 'i': pk}, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
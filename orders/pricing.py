@@ -0,0 +1,78 @@
+import hashlib
+import json
+from collections import namedtuple
+from collections.abc import Mapping
+from decimal import Decimal
+
+from menu.catalog import get_menu_version
+from .helpers import calculate_net_and_tax
+
+TAX_RATE = 0.08
+
+# Topping price multipliers; a half-pizza topping is currently charged like a whole one
+PORTION_MULTIPLIERS = {'Normal': Decimal(1), 'Extra': Decimal('1.5')}
+SIDE_MULTIPLIERS = {'Whole': Decimal(1), 'Left Half': Decimal(1), 'Right Half': Decimal(1)}
+TOPPING_MULTIPLIERS = {
+    (portion, side): portion_multiplier * side_multiplier
+    for portion, portion_multiplier in PORTION_MULTIPLIERS.items()
+    for side, side_multiplier in SIDE_MULTIPLIERS.items()
+}
+
+LinePrice = namedtuple('LinePrice', ['unit_price', 'total_price'])
+OrderPrice = namedtuple('OrderPrice', ['lines', 'total_amount', 'discount_amount', 'tax_amount', 'netto_total'])
+
+
+def price_items(items):
+    """
+    Price validated order items in one pass.
+
+    Returns:
+    tuple: A list of LinePrice tuples in item order and the total amount.
+    """
+    lines = []
+    total_amount = Decimal(0.0)
+    for item in items:
+        unit_price = item['menu_item'].price
+        pizza = item.get('pizza')
+        if pizza and item.get('is_pizza', False):
+            unit_price += (pizza['size'].base_price + pizza['crust_type'].price + pizza['sauce'].price +
+                           pizza['cheese'].price)
+            for topping in pizza.get('toppings', ()):
+                key = topping.get('portion', 'Normal'), topping.get('side', 'Whole')
+                unit_price += topping['topping'].price * TOPPING_MULTIPLIERS[key]
+        total_price = unit_price * item.get('quantity', 1)
+        lines.append(LinePrice(unit_price, total_price))
+        total_amount += total_price
+    return lines, total_amount
+
+
+def price_order(items, coupon=None):
+    """
+    Price validated order items and apply the coupon discount and tax.
+
+    Returns:
+    OrderPrice: The line prices and the order amounts.
+    """
+    lines, total_amount = price_items(items)
+
+    discount_amount = Decimal(0.0)
+    if coupon and coupon.is_valid():
+        discount_amount = coupon.apply_discount(total_amount)
+
+    netto_total, tax_amount = calculate_net_and_tax(total_amount - discount_amount, tax_rate=TAX_RATE)
+    return OrderPrice(lines, total_amount, discount_amount, tax_amount, netto_total)
+
+
+def quote_cache_key(payload):
+    """
+    Return the cache key of a price quote for an order payload, or None if the quote must not be memoized.
+
+    Only the fields that affect the price are hashed, in canonical JSON form, together with the menu version so
+    that a menu change never serves an outdated quote. Quotes with a coupon are not memoized: a coupon expires,
+    runs out of uses or is deactivated without changing the menu version.
+    """
+    if not isinstance(payload, Mapping) or payload.get('coupon') is not None:
+        return None
+    canonical = json.dumps({'items': payload.get('items')}, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f'orders:quote:{get_menu_version()}:{digest}'
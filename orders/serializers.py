@@ -1,16 +1,20 @@
+from collections import Counter
+
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderItem, OrderItemPizza, OrderItemPizzaTopping
+from .models import Order, OrderItem, OrderItemPizza, OrderItemPizzaTopping, ORDER_STATUS_CHOICES
 from menu.models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from menu.serializers import CatalogPrimaryKeyRelatedField
+from menu.stock import STOCK_PORTION_UNITS, OutOfStock, consume_stock
 from django.contrib.auth.models import User
 from accounts.models import Address
 from coupons.models import Coupon
 from delivery.models import Driver
-from decimal import Decimal
-from .helpers import calculate_net_and_tax
+from .pricing import price_items, price_order
 
 
 class OrderItemPizzaToppingSerializer(serializers.ModelSerializer):
-    topping = serializers.PrimaryKeyRelatedField(queryset=Topping.objects.all())
+    topping = CatalogPrimaryKeyRelatedField(Topping, require_available=True)
 
     class Meta:
         model = OrderItemPizzaTopping
@@ -18,10 +22,10 @@ class OrderItemPizzaToppingSerializer(serializers.ModelSerializer):
 
 
 class OrderItemPizzaSerializer(serializers.ModelSerializer):
-    size = serializers.PrimaryKeyRelatedField(queryset=PizzaSize.objects.all())
-    crust_type = serializers.PrimaryKeyRelatedField(queryset=CrustType.objects.all())
-    sauce = serializers.PrimaryKeyRelatedField(queryset=Sauce.objects.all())
-    cheese = serializers.PrimaryKeyRelatedField(queryset=Cheese.objects.all())
+    size = CatalogPrimaryKeyRelatedField(PizzaSize)
+    crust_type = CatalogPrimaryKeyRelatedField(CrustType)
+    sauce = CatalogPrimaryKeyRelatedField(Sauce)
+    cheese = CatalogPrimaryKeyRelatedField(Cheese)
     toppings = OrderItemPizzaToppingSerializer(many=True, required=False)
 
     class Meta:
@@ -31,78 +35,83 @@ class OrderItemPizzaSerializer(serializers.ModelSerializer):
 
 class OrderItemSerializer(serializers.ModelSerializer):
     pizza = OrderItemPizzaSerializer(required=False)
-    menu_item = serializers.PrimaryKeyRelatedField(queryset=MenuItem.objects.all())
+    menu_item = CatalogPrimaryKeyRelatedField(MenuItem, require_available=True)
 
     class Meta:
         model = OrderItem
         fields = ['menu_item', 'quantity', 'unit_price', 'total_price', 'is_pizza', 'pizza', 'instructions']
         read_only_fields = ['unit_price', 'total_price', 'id']
 
-    def create(self, validated_data):
-        # Remove 'id' if present
-        validated_data.pop('id', None)
-
-        pizza_data = validated_data.pop('pizza', None)
-        quantity = validated_data.get('quantity', 1)
-        is_pizza = validated_data.get('is_pizza', False)
-        menu_item = validated_data['menu_item']
-        unit_price = menu_item.price
-
-        # Calculate unit_price and total_price
-        if is_pizza and pizza_data:
-            size = pizza_data['size']
-            crust_type = pizza_data['crust_type']
-            sauce = pizza_data['sauce']
-            cheese = pizza_data['cheese']
-            pizza_from_menu = MenuItem.objects.get(pk=menu_item.id)
-            # Base price calculation
-            unit_price = pizza_from_menu.price + size.base_price + crust_type.price + sauce.price + cheese.price
-
-            # Toppings price calculation
-            toppings_data = pizza_data.get('toppings', [])
-            for topping_data in toppings_data:
-                topping = topping_data['topping']
-                portion = topping_data.get('portion', 'Normal')
-                topping_price = topping.price * Decimal(1.5) if portion == 'Extra' else topping.price
-                unit_price += topping_price
-
-        total_price = unit_price * quantity
-        validated_data['unit_price'] = unit_price
-        validated_data['total_price'] = total_price
+    @staticmethod
+    def calculate_prices(validated_data):
+        """
+        Calculate the unit and total price of a validated order item.
+
+        Returns:
+        tuple: (unit_price, total_price) as Decimals.
+        """
+        lines, _ = price_items([validated_data])
+        return lines[0]
+
+    @classmethod
+    def build_instances(cls, validated_data, order, line_price=None):
+        """
+        Build the unsaved OrderItem, OrderItemPizza and OrderItemPizzaTopping instances for a validated item.
+
+        Returns:
+        tuple: (order_item, order_item_pizza or None, list of toppings).
+        """
+        unit_price, total_price = line_price or cls.calculate_prices(validated_data)
+        item_data = {key: value for key, value in validated_data.items() if key not in ('id', 'pizza')}
+        order_item = OrderItem(order=order, unit_price=unit_price, total_price=total_price, **item_data)
+
+        pizza_data = validated_data.get('pizza')
+        if not (item_data.get('is_pizza', False) and pizza_data):
+            return order_item, None, []
+
+        order_item_pizza = OrderItemPizza(
+            order_item=order_item,
+            size=pizza_data['size'],
+            crust_type=pizza_data['crust_type'],
+            sauce=pizza_data['sauce'],
+            cheese=pizza_data['cheese'],
+            instructions=pizza_data.get('instructions', '')
+        )
+        toppings = [
+            OrderItemPizzaTopping(
+                order_item_pizza=order_item_pizza,
+                topping=topping_data['topping'],
+                portion=topping_data.get('portion', 'Normal'),
+                side=topping_data.get('side', 'Whole')
+            )
+            for topping_data in pizza_data.get('toppings', [])
+        ]
+        return order_item, order_item_pizza, toppings
 
-        # Associate the order with the order item
-        order = self.context.get('order')
-        validated_data['order'] = order
+    @transaction.atomic
+    def create(self, validated_data):
+        order_item, order_item_pizza, toppings = self.build_instances(validated_data, self.context.get('order'))
+        order_item.save()
+        if order_item_pizza is not None:
+            order_item_pizza.save()
+            OrderItemPizzaTopping.objects.bulk_create(toppings)
+        return order_item
 
-        # Remove 'id' from validated_data before creating the OrderItem
-        validated_data.pop('id', None)
-        order_item = OrderItem.objects.create(**validated_data)
-
-        # Handle pizza data if present
-        if is_pizza and pizza_data:
-            # Prepare data for OrderItemPizza
-            pizza_data_clean = {
-                'order_item': order_item,
-                'size': size,
-                'crust_type': crust_type,
-                'sauce': sauce,
-                'cheese': cheese,
-                'instructions': pizza_data.get('instructions', '')
-            }
-            order_item_pizza = OrderItemPizza.objects.create(**pizza_data_clean)
-
-            # Create toppings
-            for topping_data in toppings_data:
-                topping = topping_data['topping']
-                topping_data_clean = {
-                    'order_item_pizza': order_item_pizza,
-                    'topping': topping,
-                    'portion': topping_data.get('portion', 'Normal'),
-                    'side': topping_data.get('side', 'Whole')
-                }
-                OrderItemPizzaTopping.objects.create(**topping_data_clean)
 
-        return order_item
+def stock_demands(items_data):
+    """
+    Return the stock units of every menu item and topping that validated order items use, by model and primary key.
+    """
+    menu_items, toppings = Counter(), Counter()
+    for item_data in items_data:
+        quantity = item_data.get('quantity', 1)
+        menu_items[item_data['menu_item'].pk] += quantity
+        pizza_data = item_data.get('pizza')
+        if item_data.get('is_pizza', False) and pizza_data:
+            for topping_data in pizza_data.get('toppings', []):
+                portion = topping_data.get('portion', 'Normal')
+                toppings[topping_data['topping'].pk] += quantity * STOCK_PORTION_UNITS[portion]
+    return {MenuItem: menu_items, Topping: toppings}
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -122,62 +131,88 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['total_amount', 'discount_amount', 'tax_amount', 'netto_total', 'id']
 
+    @transaction.atomic
     def create(self, validated_data):
         # Remove 'id' if present
         validated_data.pop('id', None)
-
         items_data = validated_data.pop('items')
-        order = Order.objects.create(
-            **validated_data,
-            total_amount=0.0,
-            discount_amount=0.0,
-            tax_amount=0.0,
-            netto_total=0.0
-        )
-        total_amount = Decimal(0.0)
-
-        for item_data in items_data:
-            # Convert model instances to IDs if necessary
-            if isinstance(item_data.get('menu_item'), MenuItem):
-                item_data['menu_item'] = item_data['menu_item'].id
-
-            # Handle pizza data if present
-            pizza_data = item_data.get('pizza', None)
-            if pizza_data:
-                if isinstance(pizza_data.get('size'), PizzaSize):
-                    pizza_data['size'] = pizza_data['size'].id
-                if isinstance(pizza_data.get('crust_type'), CrustType):
-                    pizza_data['crust_type'] = pizza_data['crust_type'].id
-                if isinstance(pizza_data.get('sauce'), Sauce):
-                    pizza_data['sauce'] = pizza_data['sauce'].id
-                if isinstance(pizza_data.get('cheese'), Cheese):
-                    pizza_data['cheese'] = pizza_data['cheese'].id
-
-                # Convert topping instances to primary key values
-                toppings_data = pizza_data.get('toppings', [])
-                for topping_data in toppings_data:
-                    if isinstance(topping_data.get('topping'), Topping):
-                        topping_data['topping'] = topping_data['topping'].id
-
-            # Pass the order instance to the context of the OrderItemSerializer
-            order_item_serializer = OrderItemSerializer(data=item_data, context={'order': order})
-            order_item_serializer.is_valid(raise_exception=True)
-            order_item = order_item_serializer.save()
-            total_amount += order_item.total_price
-
-        # Apply coupon if available
-        discount_amount = Decimal(0.0)
-        if order.coupon and order.coupon.is_valid():
-            discount_amount = order.coupon.apply_discount(total_amount)
-
-        # Calculate tax and netto total
-        netto_total, tax_amount = calculate_net_and_tax(total_amount - discount_amount, tax_rate=0.08)
-
-        # Update the order with calculated amounts
-        order.total_amount = total_amount
-        order.discount_amount = discount_amount
-        order.tax_amount = tax_amount
-        order.netto_total = netto_total
+
+        # The nested payload was validated together with the order, so the rows can be built in memory
+        order = Order(**validated_data)
+        if order.coupon and not order.coupon.is_valid():
+            order.coupon = None
+        prices = price_order(items_data, coupon=order.coupon)
+        order_items, pizzas, toppings = [], [], []
+        for item_data, line_price in zip(items_data, prices.lines):
+            order_item, order_item_pizza, item_toppings = OrderItemSerializer.build_instances(
+                item_data, order, line_price
+            )
+            order_items.append(order_item)
+            if order_item_pizza is not None:
+                pizzas.append(order_item_pizza)
+                toppings.extend(item_toppings)
+
+        order.total_amount = prices.total_amount
+        order.discount_amount = prices.discount_amount
+        order.tax_amount = prices.tax_amount
+        order.netto_total = prices.netto_total
+        # Redeemed below, or reset with the coupon if that fails
+        order.redeemed_coupon = order.coupon
         order.save()
 
+        # One INSERT per table; bulk_create sets the primary keys the next level references
+        OrderItem.objects.bulk_create(order_items)
+        OrderItemPizza.objects.bulk_create(pizzas)
+        OrderItemPizzaTopping.objects.bulk_create(toppings)
+
+        # Stock is taken after the inserts, so its rows are locked for as short as possible; running out rolls the
+        # whole order back
+        try:
+            consume_stock(stock_demands(items_data))
+        except OutOfStock as error:
+            raise serializers.ValidationError({'items': [str(error)]})
+
+        # Redeem last, so the coupon row is only locked for the moment until this transaction commits
+        if order.coupon and not order.coupon.redeem():
+            # The last use was taken by a concurrent order; fall back to the undiscounted amounts
+            prices = price_order(items_data)
+            order.coupon = order.redeemed_coupon = None
+            order.discount_amount = prices.discount_amount
+            order.tax_amount = prices.tax_amount
+            order.netto_total = prices.netto_total
+            order.save(update_fields=['coupon', 'redeemed_coupon', 'discount_amount', 'tax_amount', 'netto_total'])
+
         return order
+
+
+class OrderFilterSerializer(serializers.Serializer):
+    """
+    Validates the query parameters accepted by the order list endpoint.
+    """
+    status = serializers.ChoiceField(choices=ORDER_STATUS_CHOICES, required=False)
+    placed_after = serializers.DateTimeField(required=False)
+    placed_before = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        placed_after = data.get('placed_after')
+        placed_before = data.get('placed_before')
+        if placed_after and placed_before and placed_after > placed_before:
+            raise serializers.ValidationError("placed_after must not be later than placed_before.")
+        return data
+
+
+class OrderQuoteSerializer(serializers.Serializer):
+    """
+    Accepts an order payload and renders its price without creating anything.
+    Fields of the order payload that do not affect the price are ignored.
+    """
+    items = OrderItemSerializer(many=True, write_only=True)
+    coupon = serializers.PrimaryKeyRelatedField(queryset=Coupon.objects.all(), allow_null=True, required=False,
+                                                write_only=True)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    tax_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    netto_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    def create(self, validated_data):
+        return price_order(validated_data['items'], coupon=validated_data.get('coupon'))
@@ -1,16 +1,27 @@
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from django.urls import reverse
 from django.contrib.auth.models import User
 from accounts.models import Address
-from orders.models import Order, OrderItem
-from menu.models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping
+from orders.models import Order, OrderItem, OrderItemPizza, OrderItemPizzaTopping
+from menu.catalog import get_catalog
+from menu.models import MenuItem, PizzaSize, CrustType, Sauce, Cheese, Topping, ToppingStock
+from menu.stock import get_stock, set_stock
+from orders.management.commands.benchmark_pricing import legacy_price_items, synthetic_cart
+from orders.pricing import price_items
+from orders.serializers import OrderItemSerializer
+from pizza_api.admin import EstimatedCountPaginator
 from coupons.models import Coupon
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 import datetime
+from unittest import mock
+import random
 
 
 class OrderAPITestCase(TestCase):
@@ -18,7 +29,7 @@ class OrderAPITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = User.objects.create_user(username="testuser", password="testpassword")
-        self.client.login(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
 
         # Create menu items and address
         self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
@@ -362,4 +373,755 @@ class OrderAPITestCase(TestCase):
         order.refresh_from_db()
         self.assertEqual(order.discount_amount, Decimal('0.00'))
         self.assertEqual(order.netto_total, netto_total)
-        self.assertEqual(order.tax_amount, tax_amount)
\ No newline at end of file
+        self.assertEqual(order.tax_amount, tax_amount)
+
+
+class OrderBulkCreateTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('2.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('1.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.50'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('1.50'))
+        self.toppings = [
+            Topping.objects.create(name=f"Topping {index}", price=Decimal('1.25')) for index in range(5)
+        ]
+
+    def party_order_payload(self, pizzas=6):
+        return {
+            "customer": self.user.id,
+            "items": [
+                {
+                    "menu_item": self.menu_item.id,
+                    "quantity": 1,
+                    "is_pizza": True,
+                    "pizza": {
+                        "size": self.size.id,
+                        "crust_type": self.crust_type.id,
+                        "sauce": self.sauce.id,
+                        "cheese": self.cheese.id,
+                        "toppings": [
+                            {"topping": topping.id, "portion": "Extra" if index % 2 else "Normal", "side": "Whole"}
+                            for index, topping in enumerate(self.toppings)
+                        ]
+                    }
+                }
+                for _ in range(pizzas)
+            ]
+        }
+
+    def test_party_order_uses_one_insert_per_table(self):
+        """
+        Test that a 6-pizza order with 5 toppings each is written with a single INSERT per table.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('order-list'), self.party_order_payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+        inserts = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 4)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.data['id']).count(), 6)
+        self.assertEqual(OrderItemPizza.objects.filter(order_item__order_id=response.data['id']).count(), 6)
+        self.assertEqual(
+            OrderItemPizzaTopping.objects.filter(order_item_pizza__order_item__order_id=response.data['id']).count(),
+            30
+        )
+
+    def test_party_order_totals(self):
+        """
+        Test that the batched write path stores the same prices as the per-item calculation.
+        """
+        response = self.client.post(reverse('order-list'), self.party_order_payload(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # 20 + 2 + 1 + 0.5 + 1.5 base, three normal toppings and two extra toppings
+        pizza_price = Decimal('25.00') + Decimal('1.25') * 3 + Decimal('1.25') * Decimal('1.5') * 2
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.total_amount, pizza_price * 6)
+        for order_item in order.items.all():
+            self.assertEqual(order_item.unit_price, pizza_price)
+            self.assertEqual(order_item.pizza.toppings.count(), 5)
+
+    def test_invalid_item_creates_nothing(self):
+        """
+        Test that an invalid nested item rejects the whole order before anything is written.
+        """
+        data = self.party_order_payload()
+        data["items"][3]["pizza"]["toppings"][0]["topping"] = 999999
+        response = self.client.post(reverse('order-list'), data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(OrderItem.objects.count(), 0)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class OrderItemCatalogTestCase(TestCase):
+
+    def setUp(self):
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('2.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('1.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.50'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('1.50'))
+        self.topping = Topping.objects.create(name="Pepperoni", price=Decimal('2.00'))
+        self.item_data = {
+            "menu_item": self.menu_item.id,
+            "quantity": 2,
+            "is_pizza": True,
+            "pizza": {
+                "size": self.size.id,
+                "crust_type": self.crust_type.id,
+                "sauce": self.sauce.id,
+                "cheese": self.cheese.id,
+                "toppings": [{"topping": self.topping.id, "portion": "Extra", "side": "Whole"}]
+            }
+        }
+
+    def test_pricing_a_pizza_costs_zero_queries(self):
+        """
+        Test that validating and pricing a pizza reads only from a warm menu catalog.
+        """
+        get_catalog()
+        with self.assertNumQueries(0):
+            serializer = OrderItemSerializer(data=self.item_data)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            unit_price, total_price = OrderItemSerializer.calculate_prices(serializer.validated_data)
+        self.assertEqual(unit_price, Decimal('28.00'))
+        self.assertEqual(total_price, Decimal('56.00'))
+
+    def test_unknown_topping_is_rejected(self):
+        self.item_data["pizza"]["toppings"][0]["topping"] = self.topping.id + 100
+        serializer = OrderItemSerializer(data=self.item_data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("toppings", serializer.errors["pizza"])
+
+    def test_price_change_is_picked_up(self):
+        """
+        Test that saving a menu row invalidates the catalog used for pricing.
+        """
+        get_catalog()
+        self.topping.price = Decimal('3.00')
+        self.topping.save()
+        serializer = OrderItemSerializer(data=self.item_data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        unit_price, _ = OrderItemSerializer.calculate_prices(serializer.validated_data)
+        self.assertEqual(unit_price, Decimal('29.50'))
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class OrderQueryCountTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+        self.cola = MenuItem.objects.create(name="Cola", price=Decimal('5.00'))
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('0.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('0.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.00'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('0.00'))
+        self.toppings = [
+            Topping.objects.create(name="Pepperoni", price=Decimal('2.00')),
+            Topping.objects.create(name="Mushrooms", price=Decimal('1.00')),
+        ]
+
+    def create_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.user, total_amount=Decimal('25.00'),
+                                         netto_total=Decimal('23.15'), tax_amount=Decimal('1.85'))
+            OrderItem.objects.create(order=order, menu_item=self.cola, unit_price=Decimal('5.00'),
+                                     total_price=Decimal('5.00'))
+            pizza_item = OrderItem.objects.create(order=order, menu_item=self.menu_item, is_pizza=True,
+                                                  unit_price=Decimal('20.00'), total_price=Decimal('20.00'))
+            pizza = OrderItemPizza.objects.create(order_item=pizza_item, size=self.size, crust_type=self.crust_type,
+                                                  sauce=self.sauce, cheese=self.cheese)
+            for topping in self.toppings:
+                OrderItemPizzaTopping.objects.create(order_item_pizza=pizza, topping=topping, portion='Normal',
+                                                     side='Whole')
+            yield order
+
+    def test_order_list_query_count_is_constant(self):
+        """
+        Test that listing orders costs the same number of queries for one order and for many.
+        """
+        list(self.create_orders(1))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(len(response.data["results"]), 1)
+
+        list(self.create_orders(9))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(len(response.data["results"]), 10)
+        pizza_items = [item for item in response.data["results"][0]["items"] if item["is_pizza"]]
+        self.assertEqual(len(pizza_items[0]["pizza"]["toppings"]), 2)
+
+    def test_order_detail_query_count(self):
+        order = list(self.create_orders(1))[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('order-detail', kwargs={'pk': order.id}))
+        self.assertEqual(response.status_code, 200)
+        items = {item["is_pizza"]: item for item in response.data["items"]}
+        self.assertIsNone(items[False]["pizza"])
+        self.assertEqual(len(items[True]["pizza"]["toppings"]), 2)
+
+
+class OrderListPaginationTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.other_user = User.objects.create_user(username="otheruser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+
+        now = timezone.now()
+        self.orders = []
+        for index in range(7):
+            order = Order.objects.create(customer=self.user, total_amount=Decimal('10.00'),
+                                         netto_total=Decimal('9.26'), tax_amount=Decimal('0.74'),
+                                         status='Delivered' if index % 2 else 'Pending')
+            # Two orders share a timestamp to exercise the id tie-breaker
+            order_datetime = now - datetime.timedelta(hours=index if index != 4 else 3)
+            Order.objects.filter(pk=order.pk).update(order_datetime=order_datetime)
+            order.order_datetime = order_datetime
+            self.orders.append(order)
+        self.foreign_order = Order.objects.create(customer=self.other_user, total_amount=Decimal('10.00'),
+                                                  netto_total=Decimal('9.26'), tax_amount=Decimal('0.74'))
+        self.expected_ids = [order.id for order in sorted(self.orders, key=lambda o: (o.order_datetime, o.id),
+                                                          reverse=True)]
+
+    def test_pages_walk_forward_and_back(self):
+        """
+        Test that following next and previous links returns every order of the customer exactly once, in order.
+        """
+        url = reverse('order-list') + '?page_size=3'
+        seen = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            seen.extend(order["id"] for order in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]["previous"])
+
+        response = self.client.get(pages[2]["previous"])
+        self.assertEqual([order["id"] for order in response.data["results"]], self.expected_ids[3:6])
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([order["id"] for order in response.data["results"]], self.expected_ids[:3])
+        self.assertIsNone(response.data["previous"])
+
+    def test_list_is_scoped_to_customer(self):
+        response = self.client.get(reverse('order-list'))
+        ids = [order["id"] for order in response.data["results"]]
+        self.assertNotIn(self.foreign_order.id, ids)
+        self.assertEqual(len(ids), 7)
+
+        response = self.client.get(reverse('order-detail', kwargs={'pk': self.foreign_order.id}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_sees_all_orders(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('order-list') + '?page_size=50')
+        self.assertEqual(len(response.data["results"]), 8)
+
+    def test_filter_by_status_and_date_range(self):
+        response = self.client.get(reverse('order-list'), {"status": "Delivered"})
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertTrue(all(order["status"] == "Delivered" for order in response.data["results"]))
+
+        placed_after = (timezone.now() - datetime.timedelta(hours=2, minutes=30)).isoformat()
+        response = self.client.get(reverse('order-list'), {"placed_after": placed_after})
+        self.assertEqual([order["id"] for order in response.data["results"]], self.expected_ids[:3])
+
+        placed_before = (timezone.now() - datetime.timedelta(hours=4, minutes=30)).isoformat()
+        response = self.client.get(reverse('order-list'), {"placed_before": placed_before})
+        self.assertEqual([order["id"] for order in response.data["results"]], self.expected_ids[-2:])
+
+    def test_invalid_filters_and_cursor(self):
+        response = self.client.get(reverse('order-list'), {"status": "Lost"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data)
+
+        response = self.client.get(reverse('order-list'), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class PricingEngineTestCase(SimpleTestCase):
+
+    def test_matches_legacy_decimal_pricing(self):
+        """
+        Test that the pricing multipliers give exactly the amounts of the legacy Decimal loop.
+        """
+        rng = random.Random(42)
+        for lines in (1, 10, 250):
+            items = synthetic_cart(lines, rng)
+            self.assertEqual(price_items(items), legacy_price_items(items))
+
+    def test_extra_topping_keeps_half_cents(self):
+        topping = Topping(pk=1, price=Decimal('1.25'))
+        item = {
+            'menu_item': MenuItem(pk=1, price=Decimal('10.00')),
+            'quantity': 3,
+            'is_pizza': True,
+            'pizza': {
+                'size': PizzaSize(pk=1, base_price=Decimal('2.00')),
+                'crust_type': CrustType(pk=1, price=Decimal('0.50')),
+                'sauce': Sauce(pk=1, price=Decimal('0.00')),
+                'cheese': Cheese(pk=1, price=Decimal('1.00')),
+                'toppings': [{'topping': topping, 'portion': 'Extra', 'side': 'Left Half'}],
+            },
+        }
+        lines, total_amount = price_items([item])
+        self.assertEqual(lines[0].unit_price, Decimal('15.375'))
+        self.assertEqual(lines[0].total_price, Decimal('46.125'))
+        self.assertEqual(total_amount, Decimal('46.125'))
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class OrderQuoteTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+        self.cola = MenuItem.objects.create(name="Cola", price=Decimal('5.00'))
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('2.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('1.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.50'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('1.50'))
+        self.topping = Topping.objects.create(name="Pepperoni", price=Decimal('1.25'))
+        self.coupon = Coupon.objects.create(
+            code="SAVE10",
+            discount_type="percentage",
+            discount_value=10,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            is_active=True
+        )
+        self.data = {
+            "customer": self.user.id,
+            "items": [
+                {
+                    "menu_item": self.menu_item.id,
+                    "quantity": 2,
+                    "is_pizza": True,
+                    "pizza": {
+                        "size": self.size.id,
+                        "crust_type": self.crust_type.id,
+                        "sauce": self.sauce.id,
+                        "cheese": self.cheese.id,
+                        "toppings": [{"topping": self.topping.id, "portion": "Extra", "side": "Whole"}]
+                    }
+                },
+                {"menu_item": self.cola.id, "quantity": 1}
+            ]
+        }
+
+    def test_quote_matches_created_order(self):
+        """
+        Test that a quote returns the amounts the order would be created with, without writing anything.
+        """
+        self.data["coupon"] = self.coupon.id
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 0)
+
+        response_order = self.client.post(reverse('order-list'), self.data, format='json')
+        self.assertEqual(response_order.status_code, 201)
+        for field in ("total_amount", "discount_amount", "tax_amount", "netto_total"):
+            self.assertEqual(response.data[field], response_order.data[field])
+        self.assertEqual(response.data["total_amount"], "58.75")
+
+    def test_quote_with_warm_menu_costs_zero_queries(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_identical_cart_is_memoized(self):
+        self.client.post(reverse('order-quote'), self.data, format='json')
+
+        # Fields that do not change the price and key order do not affect the memoized quote
+        data = {"delivery_address": None, **dict(reversed(list(self.data.items())))}
+        with mock.patch('orders.views.OrderQuoteSerializer.is_valid') as is_valid:
+            response = self.client.post(reverse('order-quote'), data, format='json')
+        is_valid.assert_not_called()
+        self.assertEqual(response.data["total_amount"], "58.75")
+
+    def test_coupon_change_is_quoted_right_away(self):
+        self.data["coupon"] = self.coupon.id
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.data["discount_amount"], "5.88")
+        Coupon.objects.filter(pk=self.coupon.pk).update(is_active=False)
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.data["discount_amount"], "0.00")
+
+    def test_non_object_payload_is_rejected(self):
+        response = self.client.post(reverse('order-quote'), [self.data], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_menu_change_invalidates_quote(self):
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.data["total_amount"], "58.75")
+        self.cola.price = Decimal('6.00')
+        self.cola.save()
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.data["total_amount"], "59.75")
+
+    def test_invalid_cart_is_rejected(self):
+        self.data["items"][0]["pizza"]["size"] = self.size.id + 100
+        response = self.client.post(reverse('order-quote'), self.data, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderCouponRedemptionTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+        self.coupon = Coupon.objects.create(
+            code="ONCE",
+            discount_type="amount",
+            discount_value=5,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            is_active=True,
+            usage_limit=1
+        )
+        self.other_coupon = Coupon.objects.create(
+            code="OTHER",
+            discount_type="amount",
+            discount_value=2,
+            expiration_date=timezone.now() + datetime.timedelta(days=7),
+            is_active=True,
+            usage_limit=1
+        )
+        self.data = {"customer": self.user.id, "coupon": self.coupon.id,
+                     "items": [{"menu_item": self.menu_item.id, "quantity": 1}]}
+
+    def test_order_creation_redeems_coupon_once(self):
+        response = self.client.post(reverse('order-list'), self.data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["discount_amount"], "5.00")
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+        # The only use is gone, so the next order is created without the coupon
+        response = self.client.post(reverse('order-list'), self.data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["discount_amount"], "0.00")
+        self.assertIsNone(response.data["coupon"])
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_lost_redemption_race_falls_back_to_full_price(self):
+        # The coupon passes the validity check but another checkout takes the last use before it is redeemed
+        with mock.patch.object(Coupon, 'redeem', return_value=False):
+            response = self.client.post(reverse('order-list'), self.data, format='json')
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertIsNone(order.coupon)
+        self.assertEqual(order.discount_amount, Decimal('0.00'))
+        self.assertEqual(order.netto_total + order.tax_amount, Decimal('20.00'))
+
+    def test_replacing_order_coupon_releases_previous_use(self):
+        self.data.pop("coupon")
+        order_id = self.client.post(reverse('order-list'), self.data, format='json').data["id"]
+        url = reverse('order-coupon', kwargs={'pk': order_id})
+
+        response = self.client.put(url, {"coupon": "ONCE"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Applying the same coupon again does not consume another use
+        response = self.client.put(url, {"coupon": "ONCE"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+        response = self.client.put(url, {"coupon": "OTHER"}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["discount_amount"], "2.00")
+        self.coupon.refresh_from_db()
+        self.other_coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+        self.assertEqual(self.other_coupon.used_count, 1)
+
+    def test_removing_unredeemed_coupon_releases_nothing(self):
+        order_id = self.client.post(reverse('order-list'), self.data, format='json').data["id"]
+        # Assigned like the admin does, without redeeming a use of it
+        Order.objects.filter(pk=order_id).update(coupon=self.other_coupon)
+        Coupon.objects.filter(pk=self.other_coupon.pk).update(used_count=1)
+
+        response = self.client.delete(reverse('order-coupon', kwargs={'pk': order_id}))
+        self.assertEqual(response.status_code, 200)
+        self.other_coupon.refresh_from_db()
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.other_coupon.used_count, 1)
+        # The use redeemed when the order was created is given back
+        self.assertEqual(self.coupon.used_count, 0)
+        self.assertIsNone(Order.objects.get(pk=order_id).redeemed_coupon)
+
+    def test_non_string_coupon_code_is_rejected(self):
+        self.data.pop("coupon")
+        order_id = self.client.post(reverse('order-list'), self.data, format='json').data["id"]
+        response = self.client.put(reverse('order-coupon', kwargs={'pk': order_id}), {"coupon": 123}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Invalid coupon code'})
+
+    def test_exhausted_coupon_is_rejected(self):
+        self.coupon.used_count = 1
+        self.coupon.save()
+        self.data.pop("coupon")
+        order_id = self.client.post(reverse('order-list'), self.data, format='json').data["id"]
+        response = self.client.put(reverse('order-coupon', kwargs={'pk': order_id}), {"coupon": "ONCE"},
+                                   format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Order.objects.get(pk=order_id).coupon)
+
+
+@override_settings(MENU_VERSION_CHECK_INTERVAL=None)
+class OrderStockTestCase(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="testpassword")
+        self.client.force_authenticate(user=self.user)
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'), is_pizza=True)
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('2.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('1.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.50'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('1.50'))
+        self.topping = Topping.objects.create(name="Pepperoni", price=Decimal('2.00'))
+
+    def order_data(self, quantity=1, portion="Normal"):
+        return {
+            "customer": self.user.id,
+            "items": [{
+                "menu_item": self.menu_item.id,
+                "quantity": quantity,
+                "is_pizza": True,
+                "pizza": {
+                    "size": self.size.id,
+                    "crust_type": self.crust_type.id,
+                    "sauce": self.sauce.id,
+                    "cheese": self.cheese.id,
+                    "toppings": [{"topping": self.topping.id, "portion": portion, "side": "Whole"}]
+                }
+            }]
+        }
+
+    def post_order(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('order-list'), data, format='json')
+
+    def test_order_takes_stock(self):
+        set_stock(self.topping, 10, shards=4)
+        set_stock(self.menu_item, 5)
+        response = self.post_order(self.order_data(quantity=2, portion="Extra"))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(get_stock(self.topping), 6)
+        self.assertEqual(get_stock(self.menu_item), 3)
+
+    def test_untracked_stock_is_unlimited(self):
+        response = self.post_order(self.order_data(quantity=50))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIsNone(get_stock(self.topping))
+
+    def test_stock_spread_over_shards_is_used_up(self):
+        # Every shard holds one unit, so taking all of them needs the locked fallback
+        set_stock(self.topping, 4, shards=4)
+        response = self.post_order(self.order_data(quantity=4))
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(list(ToppingStock.objects.values_list('quantity', flat=True)), [0, 0, 0, 0])
+
+    def test_topping_is_deactivated_at_zero(self):
+        set_stock(self.topping, 1)
+        self.assertEqual(self.post_order(self.order_data()).status_code, 201)
+        self.topping.refresh_from_db()
+        self.assertFalse(self.topping.is_active)
+        self.assertFalse(get_catalog().is_available(Topping, self.topping.id))
+
+        response = self.post_order(self.order_data())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 1)
+
+        set_stock(self.topping, 3)
+        self.topping.refresh_from_db()
+        self.assertTrue(self.topping.is_active)
+        self.assertEqual(self.post_order(self.order_data()).status_code, 201)
+
+    def test_insufficient_stock_rolls_back_the_order(self):
+        set_stock(self.menu_item, 10)
+        set_stock(self.topping, 3)
+        response = self.post_order(self.order_data(quantity=2, portion="Extra"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("items", response.data)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(get_stock(self.menu_item), 10)
+        self.assertEqual(get_stock(self.topping), 3)
+        self.topping.refresh_from_db()
+        self.assertTrue(self.topping.is_active)
+
+    def test_inactive_rows_are_rejected_from_the_catalog(self):
+        self.topping.is_active = False
+        self.topping.save()
+        item_data = self.order_data()["items"][0]
+        get_catalog()
+        with self.assertNumQueries(0):
+            serializer = OrderItemSerializer(data=item_data)
+            self.assertFalse(serializer.is_valid())
+        self.assertIn("toppings", serializer.errors["pizza"])
+
+        self.menu_item.is_active = False
+        self.menu_item.save()
+        serializer = OrderItemSerializer(data=item_data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("menu_item", serializer.errors)
+
+
+class OrderAdminTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="adminpassword", email="a@example.com")
+        self.client.force_login(self.admin)
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'))
+
+    def create_orders(self, count):
+        orders = []
+        for _ in range(count):
+            number = User.objects.count()
+            customer = User.objects.create_user(username=f"customer{number}", email=f"customer{number}@example.com")
+            order = Order.objects.create(customer=customer, total_amount=Decimal('20.00'),
+                                         netto_total=Decimal('16.81'), tax_amount=Decimal('3.19'))
+            OrderItem.objects.create(order=order, menu_item=self.menu_item, unit_price=Decimal('20.00'),
+                                     total_price=Decimal('20.00'))
+            orders.append(order)
+        return orders
+
+    def assert_constant_queries(self, url):
+        self.create_orders(1)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_orders(10)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(many), len(few))
+
+    def test_order_changelist_query_count_is_constant(self):
+        self.assert_constant_queries(reverse('admin:orders_order_changelist'))
+
+    def test_order_item_changelist_query_count_is_constant(self):
+        self.assert_constant_queries(reverse('admin:orders_orderitem_changelist'))
+
+    def test_changelist_skips_full_count(self):
+        self.create_orders(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:orders_order_changelist'), {'status': 'Pending'})
+        self.assertEqual(response.status_code, 200)
+        counts = [query for query in queries.captured_queries if 'COUNT(' in query['sql']]
+        self.assertEqual(len(counts), 1)
+
+    def test_search_by_order_id_and_username_prefix(self):
+        first, second = self.create_orders(2)
+        url = reverse('admin:orders_order_changelist')
+        response = self.client.get(url, {'q': str(second.id)})
+        self.assertEqual(list(response.context['cl'].result_list), [second])
+        response = self.client.get(url, {'q': first.customer.username})
+        self.assertEqual(list(response.context['cl'].result_list), [first])
+
+
+class OrderAdminChangeFormTestCase(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin", password="adminpassword", email="a@example.com")
+        self.client.force_login(self.admin)
+        self.customer = User.objects.create_user(username="customer", email="customer@example.com")
+        self.address = Address.objects.create(customer=self.customer, street="1 Main St", city="Springfield",
+                                              zip_code="12345", address_type="Home")
+        self.menu_item = MenuItem.objects.create(name="Pizza", price=Decimal('20.00'), is_pizza=True)
+        self.size = PizzaSize.objects.create(name="Large", diameter=14, base_price=Decimal('2.00'))
+        self.crust_type = CrustType.objects.create(name="Thin Crust", price=Decimal('1.00'))
+        self.sauce = Sauce.objects.create(name="Tomato Sauce", price=Decimal('0.50'))
+        self.cheese = Cheese.objects.create(name="Mozzarella", price=Decimal('1.50'))
+        self.toppings = [Topping.objects.create(name=f"Topping {number}", price=Decimal('1.00'))
+                         for number in range(3)]
+
+    def create_order(self, items):
+        order = Order.objects.create(customer=self.customer, delivery_address=self.address,
+                                     total_amount=Decimal('20.00'), netto_total=Decimal('16.81'))
+        for _ in range(items):
+            item = OrderItem.objects.create(order=order, menu_item=self.menu_item, unit_price=Decimal('20.00'),
+                                            total_price=Decimal('20.00'), is_pizza=True)
+            pizza = OrderItemPizza.objects.create(order_item=item, size=self.size, crust_type=self.crust_type,
+                                                  sauce=self.sauce, cheese=self.cheese)
+            OrderItemPizzaTopping.objects.bulk_create([
+                OrderItemPizzaTopping(order_item_pizza=pizza, topping=topping, portion="Normal", side="Whole")
+                for topping in self.toppings
+            ])
+        return order
+
+    def get_change_form(self, model, pk):
+        url = reverse(f'admin:orders_{model._meta.model_name}_change', args=[pk])
+        # Warm up what the admin loads once per process
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_catering_order_query_count_is_bounded(self):
+        _, single = self.get_change_form(Order, self.create_order(1).pk)
+        response, catering = self.get_change_form(Order, self.create_order(30).pk)
+        self.assertEqual(catering, single)
+        self.assertContains(response, "Topping 2 (Normal, Whole)", count=30)
+
+    def test_pizza_toppings_query_count_is_bounded(self):
+        few = self.create_order(1).items.get().pizza
+        _, single = self.get_change_form(OrderItemPizza, few.pk)
+        many = self.create_order(1).items.get().pizza
+        OrderItemPizzaTopping.objects.bulk_create([
+            OrderItemPizzaTopping(order_item_pizza=many, topping=self.toppings[0], portion="Extra", side="Left Half")
+            for _ in range(10)
+        ])
+        _, repeated = self.get_change_form(OrderItemPizza, many.pk)
+        self.assertEqual(repeated, single)
+
+    def test_pizza_changelist_query_count_is_constant(self):
+        url = reverse('admin:orders_orderitempizza_changelist')
+        self.create_order(2)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_order(10)
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 12)
+
+    def test_orders_are_not_added_in_the_admin(self):
+        self.assertEqual(self.client.get(reverse('admin:orders_order_add')).status_code, 403)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+
+    def test_count_is_capped(self):
+        user = User.objects.create_user(username="testuser")
+        Order.objects.bulk_create([
+            Order(customer=user, total_amount=Decimal('1.00'), netto_total=Decimal('1.00')) for _ in range(5)
+        ])
+        with override_settings(ADMIN_COUNT_LIMIT=3):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('pk'), 2).count, 3)
+        with override_settings(ADMIN_COUNT_LIMIT=10):
+            self.assertEqual(EstimatedCountPaginator(Order.objects.order_by('pk'), 2).count, 5)
+        self.assertEqual(EstimatedCountPaginator(list(range(7)), 2).count, 7)
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import OrderListView, OrderDetailView, OrderCouponView
+from .views import OrderListView, OrderDetailView, OrderCouponView, OrderQuoteView
 
 urlpatterns = [
     path('', OrderListView.as_view(), name='order-list'),
+    path('quote/', OrderQuoteView.as_view(), name='order-quote'),
     path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('<int:pk>/coupon/', OrderCouponView.as_view(), name='order-coupon'),
 ]
@@ -1,54 +1,107 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework import generics, status
 
 from .models import Order
-from .serializers import OrderSerializer
+from .pagination import OrderCursorPagination
+from .pricing import quote_cache_key
+from .serializers import OrderSerializer, OrderFilterSerializer, OrderQuoteSerializer
 from rest_framework.permissions import IsAuthenticated
-from .models import Coupon
+from coupons.lookup import get_coupon_by_code
 from rest_framework.response import Response
 
 
-class OrderListView(generics.ListCreateAPIView):
-    queryset = Order.objects.all()
+class CustomerOrderMixin:
+    """
+    Limits the order queryset to the requesting customer; staff users see every order.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(customer=self.request.user)
+        return queryset
+
+
+class OrderListView(CustomerOrderMixin, generics.ListCreateAPIView):
+    queryset = Order.objects.with_details()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
+    def filter_queryset(self, queryset):
+        filters = OrderFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        if 'status' in filters.validated_data:
+            queryset = queryset.filter(status=filters.validated_data['status'])
+        if 'placed_after' in filters.validated_data:
+            queryset = queryset.filter(order_datetime__gte=filters.validated_data['placed_after'])
+        if 'placed_before' in filters.validated_data:
+            queryset = queryset.filter(order_datetime__lt=filters.validated_data['placed_before'])
+        return queryset
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Order.objects.all()
+
+class OrderDetailView(CustomerOrderMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Order.objects.with_details()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
 
-class OrderCouponView(generics.UpdateAPIView):
-    queryset = Order.objects.all()
+class OrderCouponView(CustomerOrderMixin, generics.UpdateAPIView):
+    queryset = Order.objects.with_details()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
     def put(self, request, *args, **kwargs):
         order = self.get_object()
         coupon_code = request.data.get('coupon', None)
-        if coupon_code:
-            try:
-                # Fetch the coupon object
-                coupon = Coupon.objects.get(code=coupon_code)
-                # Apply the coupon to the order
-                order.coupon = coupon
-                order.apply_coupon()
-                order.save()
-            except Coupon.DoesNotExist:
-                return Response({'error': 'Invalid coupon code'}, status=status.HTTP_400_BAD_REQUEST)
-        else:
+        if not coupon_code:
             return Response({'error': 'Coupon code not provided'}, status=status.HTTP_400_BAD_REQUEST)
+        # Fetch the coupon object
+        coupon = get_coupon_by_code(coupon_code)
+        if coupon is None:
+            return Response({'error': 'Invalid coupon code'}, status=status.HTTP_400_BAD_REQUEST)
+        if order.coupon_id != coupon.id:
+            if not coupon.is_valid():
+                return Response({'error': 'Coupon is not valid'}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                # Lock the order so concurrent requests cannot redeem two coupons for it
+                order = self.get_queryset().select_for_update().get(pk=order.pk)
+                # Give back the use of a coupon the order already holds
+                if order.coupon and order.coupon_id != coupon.id:
+                    order.unapply_coupon()
+                # Apply the coupon to the order
+                if order.coupon_id != coupon.id:
+                    order.coupon = coupon
+                    if not order.apply_coupon():
+                        transaction.set_rollback(True)
+                        return Response({'error': 'Coupon is not valid'}, status=status.HTTP_400_BAD_REQUEST)
         # Serialize the updated order
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def delete(self, request, *args, **kwargs):
         order = self.get_object()
-        # Unapply the coupon from the order
+        # Unapply the coupon from the order and give back its use
         order.unapply_coupon()
-        order.coupon = None
-        order.save()
         # Serialize the updated order
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class OrderQuoteView(generics.GenericAPIView):
+    serializer_class = OrderQuoteSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        # Identical carts are answered from the cache without validating the payload again
+        cache_key = quote_cache_key(request.data)
+        quote = cache.get(cache_key) if cache_key else None
+        if quote is None:
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            quote = dict(self.get_serializer(serializer.save()).data)
+            if cache_key:
+                cache.set(cache_key, quote, getattr(settings, 'ORDER_QUOTE_CACHE_TIMEOUT', 60))
+        return Response(quote, status=status.HTTP_200_OK)
@@ -0,0 +1,87 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """
+    Return the planner's estimate of the rows of an unfiltered queryset's table, or None if there is none.
+
+    Only PostgreSQL keeps an estimate (refreshed by ANALYZE and autovacuum); other backends return None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that was never analyzed
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts more than ADMIN_COUNT_LIMIT rows.
+
+    An unfiltered changelist of a table estimated to hold more rows uses the estimate; any other changelist is
+    counted with a LIMIT, so pages past the limit are only reachable by filtering.
+    """
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        limit = settings.ADMIN_COUNT_LIMIT
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate > limit:
+            return estimate
+        return self.object_list.order_by()[:limit].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin defaults for tables that grow with orders and customers.
+
+    Changelists count with EstimatedCountPaginator and skip the unfiltered COUNT(*) Django runs next to every
+    filtered one. Subclasses should list the relations their list_display renders in list_select_related, and
+    use search fields with an index behind them: "^" prefix and "=" exact lookups, and `search_id_fields`,
+    which match a numeric search term exactly.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_id_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if self.search_id_fields and term.isdigit():
+            ids = queryset.filter(reduce(or_, (Q(**{field: int(term)}) for field in self.search_id_fields)))
+            results = results | ids if self.search_fields else ids
+        return results, may_have_duplicates
+
+
+class CachedChoicesMixin:
+    """
+    Builds the choices of the `cached_choice_fields` foreign keys once per request.
+
+    Every form of an inline formset otherwise runs the query behind each select box again.
+    """
+    cached_choice_fields = ()
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name in self.cached_choice_fields and formfield is not None:
+            choices = getattr(request, '_cached_admin_choices', None)
+            if choices is None:
+                choices = request._cached_admin_choices = {}
+            if db_field not in choices:
+                # iter() keeps list() from asking the choices for their length, which runs a COUNT query
+                choices[db_field] = list(iter(formfield.choices))
+            formfield.choices = choices[db_field]
+        return formfield
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def search_index_operation(table, column, name):
+    """
+    Return a migration operation adding an index for admin "^" and "=" searches on a text column.
+
+    Those searches run case-insensitive prefix and exact lookups, UPPER(column) LIKE / = UPPER(term), which only
+    a PostgreSQL expression index with the text_pattern_ops operator class can serve. Other backends are skipped.
+    """
+    def create_index(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            quote = schema_editor.quote_name
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} (UPPER({quote(column)}::text) '
+                f'text_pattern_ops)'
+            )
+
+    def drop_index(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+    return migrations.RunPython(create_index, drop_index)
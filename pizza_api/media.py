@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+from menu.images import VARIANT_DIRECTORY
+
+# Content-hashed files never change under their name
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def serve_media(request, path):
+    """
+    Serve an uploaded file from MEDIA_ROOT with cache headers.
+
+    Generated image variants have content-hashed names and are marked immutable; originals keep their upload name
+    and may be replaced, so they are only cached for MEDIA_CACHE_MAX_AGE seconds.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200:
+        if path.startswith(f'{VARIANT_DIRECTORY}/'):
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600))
+    return response
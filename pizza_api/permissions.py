@@ -0,0 +1,19 @@
+import hmac
+
+from django.conf import settings
+from rest_framework import permissions
+
+
+class IsStaffOrMetricsScraper(permissions.BasePermission):
+    """
+    Allows staff users, and requests whose X-Metrics-Token header holds METRICS_TOKEN.
+
+    The token has its own header because the Authorization header of API requests must hold a JWT.
+    """
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        token = settings.METRICS_TOKEN
+        sent = request.headers.get('X-Metrics-Token')
+        return bool(token and sent) and hmac.compare_digest(sent.encode(), token.encode())
@@ -10,12 +10,20 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
+def env_bool(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -47,15 +55,61 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.PrefixAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Authentication classes of API views by URL path prefix; the longest matching prefix wins. The API only accepts
+# JWTs, so a request never touches the session table or hashes a password. The admin is no REST framework view
+# and keeps Django's session login.
+API_AUTHENTICATION_CLASSES = {
+    '/api/v1/': ('accounts.authentication.CachedJWTAuthentication',),
+}
+
+# Users resolved from JWTs kept per process, and seconds a user is served from there before it is reloaded
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 60
+
+SIMPLE_JWT = {
+    # Both check accounts.revocation.revocation_list when a token is verified
+    'AUTH_TOKEN_CLASSES': ('accounts.tokens.RevocableAccessToken',),
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RevocableTokenRefreshSerializer',
+}
+
+# Revoked tokens kept per process: seconds between loads of new revocations, the tokens the structure is sized
+# for, and its false positive rate. A rate above 0 keeps a Bloom filter of REVOKED_TOKEN_CAPACITY * -ln(rate) /
+# ln(2)^2 bits and confirms hits with a query; 0 keeps a set of every jti.
+REVOKED_TOKEN_SYNC_INTERVAL = float(os.environ.get("REVOKED_TOKEN_SYNC_INTERVAL", 5))
+REVOKED_TOKEN_CAPACITY = int(os.environ.get("REVOKED_TOKEN_CAPACITY", 100000))
+REVOKED_TOKEN_ERROR_RATE = float(os.environ.get("REVOKED_TOKEN_ERROR_RATE", 0.001))
+
+# Page size of the order history endpoint; clients may ask for up to ORDER_LIST_MAX_PAGE_SIZE with ?page_size=
+ORDER_LIST_PAGE_SIZE = 20
+ORDER_LIST_MAX_PAGE_SIZE = 100
+
+# Largest ?page_size= accepted by the menu item and topping lists, which are unpaginated without it
+MENU_LIST_MAX_PAGE_SIZE = 500
+
+# Rows a tracked stock count is split over; orders decrement one at random, so concurrent orders rarely wait
+MENU_STOCK_SHARDS = int(os.environ.get("MENU_STOCK_SHARDS", 8))
+
+# Menu snapshot (see dump_menu / load_menu) to fill the in-process menu caches from at startup, if it is the
+# snapshot last loaded into the database
+MENU_SNAPSHOT_WARM_START = os.environ.get("MENU_SNAPSHOT_WARM_START")
+
+# Rows an admin changelist counts at most; larger unfiltered tables are counted from the PostgreSQL estimate
+ADMIN_COUNT_LIMIT = 10000
+
+# Seconds a price quote for an identical cart is served from the cache
+ORDER_QUOTE_CACHE_TIMEOUT = 60
+
+# Seconds a coupon looked up by code, or the fact that a code does not exist, is cached
+COUPON_CACHE_TIMEOUT = 30
+COUPON_NEGATIVE_CACHE_TIMEOUT = 300
+
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -91,17 +145,138 @@ WSGI_APPLICATION = "pizza_api.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# The database is configured through environment variables. Without any, a local SQLite file is used, so
+# development and tests need nothing external. Set DB_ENGINE=postgresql for production.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "pizza_api"),
+            "USER": os.environ.get("POSTGRES_USER", "pizza_api"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            # Persistent connections are checked before reuse, so a connection dropped by the server is replaced
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if env_bool("DB_POOL"):
+        # psycopg's connection pool (Django 5.1+); it manages connection reuse, so CONN_MAX_AGE must stay 0
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+    else:
+        DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+elif DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+        }
+    }
+    if env_bool("SQLITE_PERFORMANCE"):
+        # Opt-in profile for single-node deployments: readers do not block the writer under WAL, writers wait for
+        # each other instead of failing with "database is locked", and write transactions take the write lock
+        # up front (BEGIN IMMEDIATE) rather than failing when upgrading from a read lock.
+        DATABASES["default"]["OPTIONS"] = {
+            "transaction_mode": "IMMEDIATE",
+            "init_command": ";".join([
+                "PRAGMA journal_mode=WAL",
+                "PRAGMA synchronous=NORMAL",
+                f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))}",
+                f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 134217728))}",
+                f"PRAGMA busy_timeout={int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+            ]),
+        }
+else:
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE {DB_ENGINE!r}; use 'sqlite' or 'postgresql'.")
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+#
+# Process-local memory by default. Setting REDIS_URL shares both caches between processes, which needs the
+# `redis` package installed.
+
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+        "menu-responses": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "menu-responses",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "menu-responses": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "menu-responses",
+            "OPTIONS": {"MAX_ENTRIES": 1000},
+        },
     }
-}
+
+# Seconds between checks of the menu change log by each process, which notice menu changes other processes made
+# that a process-local cache does not share. None when REDIS_URL shares the menu version.
+MENU_VERSION_CHECK_INTERVAL = None if REDIS_URL else float(os.environ.get("MENU_VERSION_CHECK_INTERVAL", 5))
+
+# Cache alias holding rendered menu list responses, and seconds they are kept (None: until the menu changes)
+MENU_RESPONSE_CACHE_ALIAS = os.environ.get("MENU_RESPONSE_CACHE_ALIAS", "menu-responses")
+MENU_RESPONSE_CACHE_TIMEOUT = None
+
+# Token Prometheus sends in the X-Metrics-Token header to read /api/v1/menu/cache-metrics/; unset, only staff
+# users may read the metrics
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+
+# PASSWORD_HASHER ("pbkdf2", "scrypt" or "argon2", which needs argon2-cffi) hashes new passwords; the others
+# still verify existing hashes, which are rehashed with the selected one at the next login. Tune the cost
+# parameters with `python manage.py benchmark_hashers` on production hardware.
+TUNABLE_PASSWORD_HASHERS = {
+    "pbkdf2": "accounts.hashers.TunablePBKDF2PasswordHasher",
+    "scrypt": "accounts.hashers.TunableScryptPasswordHasher",
+    "argon2": "accounts.hashers.TunableArgon2PasswordHasher",
+}
+PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "pbkdf2")
+if PASSWORD_HASHER not in TUNABLE_PASSWORD_HASHERS:
+    raise ImproperlyConfigured(f"Unsupported PASSWORD_HASHER {PASSWORD_HASHER!r}; use 'pbkdf2', 'scrypt' or 'argon2'.")
+# Fail at startup rather than at the first login; argon2-cffi is not in requirements.txt
+if PASSWORD_HASHER == "argon2" and importlib.util.find_spec("argon2") is None:
+    raise ImproperlyConfigured(
+        "PASSWORD_HASHER 'argon2' needs the argon2-cffi package; install it or use 'pbkdf2' or 'scrypt'."
+    )
+PASSWORD_HASHERS = [TUNABLE_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in TUNABLE_PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", 870000))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get("PASSWORD_SCRYPT_WORK_FACTOR", 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get("PASSWORD_SCRYPT_BLOCK_SIZE", 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get("PASSWORD_SCRYPT_PARALLELISM", 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get("PASSWORD_ARGON2_TIME_COST", 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get("PASSWORD_ARGON2_MEMORY_COST", 102400))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get("PASSWORD_ARGON2_PARALLELISM", 8))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -135,6 +310,24 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files (menu images and their generated variants)
+
+MEDIA_URL = "media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# Serve MEDIA_URL from Django; in production a web server should serve MEDIA_ROOT with the same cache headers
+SERVE_MEDIA = env_bool("SERVE_MEDIA", DEBUG)
+
+# Seconds browsers may cache an uploaded original; content-hashed variants are cached for a year as immutable
+MEDIA_CACHE_MAX_AGE = 3600
+
+# Variants generated for every menu image: name -> edge in pixels of the square box the image is fitted into
+MENU_IMAGE_VARIANT_SIZES = {"thumb": 120, "small": 320, "medium": 640}
+
+# Threads generating image variants after an upload commits; MENU_IMAGE_EAGER generates them inline instead
+MENU_IMAGE_WORKERS = int(os.environ.get("MENU_IMAGE_WORKERS", 2))
+MENU_IMAGE_EAGER = env_bool("MENU_IMAGE_EAGER")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 